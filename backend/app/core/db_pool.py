@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+_RECENT_WAITS = 1000
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def pool_options(prefix: str, pool_size: int = 5, max_overflow: int = 10) -> Dict[str, Any]:
+    """create_engine pool arguments from <prefix>_POOL_SIZE, _MAX_OVERFLOW,
+    _POOL_TIMEOUT, _POOL_PRE_PING and _POOL_RECYCLE."""
+    return {
+        "pool_size": int(os.getenv(f"{prefix}_POOL_SIZE", str(pool_size))),
+        "max_overflow": int(os.getenv(f"{prefix}_MAX_OVERFLOW", str(max_overflow))),
+        "pool_timeout": float(os.getenv(f"{prefix}_POOL_TIMEOUT", "30")),
+        "pool_pre_ping": _env_bool(f"{prefix}_POOL_PRE_PING", True),
+        "pool_recycle": int(os.getenv(f"{prefix}_POOL_RECYCLE", "1800")),
+    }
+
+
+class PoolTelemetry:
+    """Counters and checkout wait times for one pool, fed by pool events."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._recent: deque = deque(maxlen=_RECENT_WAITS)
+
+    def attach(self, engine):
+        """Listens on a sync Engine (for async engines pass engine.sync_engine)."""
+        pool = engine.pool
+        self.pool = pool
+        pool._telemetry = self
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "invalidate", self._on_invalidate)
+        return self
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._recent.append(seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            recent: List[float] = sorted(self._recent)
+            stats = {
+                "name": self.name,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_ms": {
+                    "count": self.wait_count,
+                    "avg": round(self.wait_total / self.wait_count * 1000, 3) if self.wait_count else 0.0,
+                    "max": round(self.wait_max * 1000, 3),
+                    "p50_recent": _percentile_ms(recent, 0.50),
+                    "p99_recent": _percentile_ms(recent, 0.99),
+                },
+            }
+
+        pool = self.pool
+        if pool is not None and hasattr(pool, "checkedout"):
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "max_overflow": pool._max_overflow,
+                "timeout": pool.timeout(),
+            })
+        return stats
+
+
+def _percentile_ms(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 3)
+
+
+class _TimedGetMixin:
+    # There is no pool event for "started waiting", so time _do_get, the call
+    # that blocks when every connection is checked out.
+    def _do_get(self):
+        telemetry = getattr(self, "_telemetry", None)
+        if telemetry is None:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            telemetry.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        telemetry.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        telemetry = getattr(self, "_telemetry", None)
+        if telemetry is not None:
+            pool._telemetry = telemetry
+            telemetry.pool = pool
+        return pool
+
+
+class TimedQueuePool(_TimedGetMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedGetMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+pool_telemetry: Dict[str, PoolTelemetry] = {}
+
+
+def register_pool(name: str, engine) -> PoolTelemetry:
+    telemetry = PoolTelemetry(name).attach(engine)
+    pool_telemetry[name] = telemetry
+    return telemetry
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    return [telemetry.snapshot() for telemetry in pool_telemetry.values()]
@@ -0,0 +1,97 @@
+"""Prints the Postgres plans of the matching engine's and routers' hot queries.
+
+    python -m app.core.query_plans [--analyze]
+
+Sample ids come from the database (the first active policy and the newest
+borrower). --analyze runs the statements, deletes included, inside a
+transaction that is rolled back.
+"""
+import argparse
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects import postgresql
+
+from app.database import SessionLocal
+from app.matching_engine.columnar import fields_for_plan
+from app.matching_engine.compiler import get_compiled_policy
+from app.matching_engine.engine import CreditMatchingEngine
+from app.models.model import Borrower, LenderPolicy, LoanMatch
+from app.services.match_index import match_rows_query
+from app.services.match_store import _VALUE_COLUMNS
+
+
+def _sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def hot_queries(db):
+    """(label, statement) pairs for the sample lender and borrower."""
+    policy = db.query(LenderPolicy).filter(LenderPolicy.is_active == True).first()
+    borrower_id = db.query(func.max(Borrower.id)).scalar()
+    queries = []
+
+    if policy is not None:
+        lender_id = policy.lender_id
+        plan = get_compiled_policy(policy)
+        entities = [Borrower.id] + [getattr(Borrower, field) for field in fields_for_plan(plan)]
+        value_columns = [getattr(LoanMatch, column) for column in _VALUE_COLUMNS]
+        queries += [
+            ("lender rematch candidates", CreditMatchingEngine()._candidate_query(plan, db, *entities).statement),
+            ("active policy", db.query(LenderPolicy).filter(
+                LenderPolicy.lender_id == lender_id, LenderPolicy.is_active == True
+            ).limit(1).statement),
+            ("policy history", db.query(LenderPolicy).filter(
+                LenderPolicy.lender_id == lender_id
+            ).order_by(LenderPolicy.updated_at.desc()).statement),
+            ("lender match page", match_rows_query(db, lender_id).limit(51).statement),
+            ("lender match page after cursor", match_rows_query(db, lender_id, after=(50.0, 1000)).limit(51).statement),
+            ("lender stored matches", db.query(LoanMatch.borrower_id, *value_columns).filter(
+                LoanMatch.lender_id == lender_id
+            ).statement),
+            ("lender stale match delete", delete(LoanMatch).where(
+                LoanMatch.lender_id == lender_id, LoanMatch.borrower_id.in_([1, 2, 3])
+            )),
+        ]
+        if borrower_id is not None:
+            queries.append(("matched borrower check", db.query(LoanMatch).filter(
+                LoanMatch.lender_id == lender_id,
+                LoanMatch.borrower_id == borrower_id,
+                LoanMatch.is_active == True
+            ).limit(1).statement))
+
+    if borrower_id is not None:
+        email = db.query(Borrower.email).filter(Borrower.id == borrower_id).scalar()
+        queries += [
+            ("borrower stored matches", db.query(LoanMatch.lender_id, LoanMatch.match_score).filter(
+                LoanMatch.borrower_id == borrower_id
+            ).statement),
+            ("borrower stale match delete", delete(LoanMatch).where(LoanMatch.borrower_id == borrower_id)),
+            ("borrower by email", db.query(Borrower.id).filter(Borrower.email == email).statement),
+        ]
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--analyze", action="store_true", help="run the statements (rolled back afterwards)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        queries = hot_queries(db)
+        if not queries:
+            print("No active policy or borrower to sample; nothing to explain.")
+        explain = "EXPLAIN (ANALYZE, BUFFERS) " if args.analyze else "EXPLAIN "
+        for label, statement in queries:
+            sql = _sql(statement)
+            print(f"--- {label}\n{sql}\n")
+            for (line,) in db.connection().exec_driver_sql(explain + sql.replace("%", "%%")):
+                print(line)
+            print()
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
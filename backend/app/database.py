@@ -1,18 +1,48 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
+from app.core.db_pool import TimedAsyncQueuePool, TimedQueuePool, pool_options, register_pool
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+def _async_url(url: str) -> str:
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+# Pools are sized per role from DB_*, DB_BATCH_* and DB_ASYNC_* variables (see
+# core/db_pool.pool_options), so a rematch storm in the matching tasks can't
+# take the connections request handlers need.
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, **pool_options("DB"))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+batch_engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, **pool_options("DB_BATCH", pool_size=4, max_overflow=4))
+BatchSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=batch_engine)
+
+# Used by the async routes so DB round-trips don't block the event loop.
+# expire_on_commit=False: attributes can't lazy-load after commit in async code.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=TimedAsyncQueuePool, **pool_options("DB_ASYNC"))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+register_pool("requests", engine)
+register_pool("batch", batch_engine)
+register_pool("requests_async", async_engine.sync_engine)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
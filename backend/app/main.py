@@ -1,20 +1,46 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 from app.routers.Lender_router import router as lender_router
 from app.routers.Borrower_router import router as borrower_router
-from app.models import model
-from app.database import engine
+from app.routers.Internal_router import router as internal_router
+from app.core.metrics import CONTENT_TYPE, render
+from app.database import SessionLocal
 from app.redis_client import init_redis 
+from app.services.policy_cache import active_policy_cache, listen_for_policy_changes
 from fastapi.middleware.cors import CORSMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.state.redis = await init_redis()
     print("----Redis is connected and ready!----")
+
+    subscribed = asyncio.Event()
+    policy_listener = asyncio.create_task(
+        listen_for_policy_changes(app.state.redis, subscribed=subscribed)
+    )
+    try:
+        await asyncio.wait_for(subscribed.wait(), timeout=5)
+    except asyncio.TimeoutError:
+        print("----Policy cache subscription not ready, continuing.----")
+    await run_in_threadpool(_load_policy_cache)
+
     yield
+    policy_listener.cancel()
     await app.state.redis.close()
     print("----Redis connection closed.----")
 
+def _load_policy_cache():
+    db = SessionLocal()
+    try:
+        active_policy_cache.load(db)
+        print(f"----Policy cache loaded with {len(active_policy_cache)} active policies.----")
+    except Exception as e:
+        print(f"Policy cache warm-up failed, loading lazily: {e}")
+    finally:
+        db.close()
+
 app = FastAPI(lifespan=lifespan)
 
 origins = [
@@ -29,12 +55,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-model.Base.metadata.create_all(bind=engine)
 app.include_router(lender_router)
 app.include_router(borrower_router)
+app.include_router(internal_router)
 
 @app.get("/")
 def read_root():
-    return {"status": "online"}
\ No newline at end of file
+    return {"status": "online"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render(), media_type=CONTENT_TYPE)
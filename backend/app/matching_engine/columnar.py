@@ -0,0 +1,316 @@
+import math
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from app.matching_engine.compiler import (
+    NUMERIC_FIELDS,
+    PENALTY_CRITICAL,
+    PENALTY_DECAY,
+    PENALTY_SIGMOID,
+    CompiledPolicy,
+    CompiledProgram,
+    CompiledRule,
+)
+
+GLOBAL_FIELDS = ('business_state', 'industry_naics', 'industry_tier')
+SCORE_FIELDS = ('guarantor_fico', 'annual_revenue', 'years_in_business')
+ENUM_FIELDS = frozenset({
+    'business_entity_type', 'industry_tier', 'equipment_type',
+    'equipment_condition', 'vendor_type'
+})
+
+_VECTOR_OPS = {
+    '==': lambda a, t: np.abs(a - t) < 0.001,
+    '!=': lambda a, t: np.abs(a - t) >= 0.001,
+    '>=': np.greater_equal,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '<': np.less,
+}
+
+
+def fields_for_plan(plan: "CompiledPolicy") -> Tuple[str, ...]:
+    """Borrower columns a policy needs, in a stable order, starting with loan_amount."""
+    fields = {'loan_amount', *GLOBAL_FIELDS, *SCORE_FIELDS}
+    for program in plan.programs:
+        for rule in program.strict_rules + program.soft_rules:
+            fields.add(rule.field)
+    fields.discard('loan_amount')
+    return ('loan_amount',) + tuple(sorted(fields))
+
+
+class BorrowerColumns:
+    """Borrower rows held column-wise.
+
+    Values are stored as the engine reads them (enums unwrapped to their
+    values). Numeric views and factorized (uniques, codes) views are built
+    lazily, once per column.
+    """
+
+    def __init__(self, ids: Sequence[int], columns: Dict[str, List[Any]]):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.raw = columns
+        self._numeric: Dict[str, np.ndarray] = {}
+        self._factorized: Dict[str, Tuple[List[Any], np.ndarray]] = {}
+
+    @classmethod
+    def from_rows(cls, fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> "BorrowerColumns":
+        """Rows are (id, *fields) tuples, as returned by a column query."""
+        transposed = list(zip(*rows))
+        if not transposed:
+            return cls([], {field: [] for field in fields})
+
+        columns = {}
+        for field, values in zip(fields, transposed[1:]):
+            if field in ENUM_FIELDS:
+                columns[field] = [None if v is None else v.value for v in values]
+            else:
+                columns[field] = list(values)
+        return cls(transposed[0], columns)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get(self, field: str) -> List[Any]:
+        column = self.raw.get(field)
+        if column is None:
+            column = self.raw[field] = [None] * len(self.ids)
+        return column
+
+    def numeric(self, field: str) -> np.ndarray:
+        array = self._numeric.get(field)
+        if array is None:
+            array = np.array(
+                [np.nan if v is None else v for v in self.get(field)],
+                dtype=np.float64,
+            )
+            self._numeric[field] = array
+        return array
+
+    def factorized(self, field: str) -> Tuple[List[Any], np.ndarray]:
+        result = self._factorized.get(field)
+        if result is None:
+            index: Dict[Any, int] = {}
+            values = self.get(field)
+            codes = np.fromiter(
+                (index.setdefault(v, len(index)) for v in values),
+                dtype=np.intp,
+                count=len(values),
+            )
+            result = (list(index), codes)
+            self._factorized[field] = result
+        return result
+
+    def apply(self, field: str, predicate) -> np.ndarray:
+        """Evaluate a Python predicate once per distinct value and broadcast it."""
+        uniques, codes = self.factorized(field)
+        if not uniques:
+            return np.zeros(0, dtype=bool)
+        passes = np.fromiter((predicate(v) for v in uniques), dtype=bool, count=len(uniques))
+        return passes[codes]
+
+
+def _exp(values: np.ndarray) -> np.ndarray:
+    # math.exp rather than np.exp: numpy's SIMD exp can differ from libm in the
+    # last bit, and scores have to match the scalar engine exactly.
+    out = np.empty(len(values), dtype=np.float64)
+    for i, v in enumerate(values.tolist()):
+        try:
+            out[i] = math.exp(v)
+        except OverflowError:
+            out[i] = math.inf
+    return out
+
+
+class ColumnarEvaluator:
+    """Evaluates one compiled policy against a block of borrowers at once.
+
+    Produces the same scores as CreditMatchingEngine._evaluate_programs for
+    every borrower, using the engine's scoring constants.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def evaluate(self, plan: "CompiledPolicy", columns: "BorrowerColumns") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns (borrower_ids, final_scores, program_positions) of the matches."""
+        n = len(columns)
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0, dtype=np.intp))
+        if n == 0 or not plan.programs:
+            return empty
+
+        eligible = self._global_mask(plan, columns)
+        if not eligible.any():
+            return empty
+
+        scores = np.full((len(plan.programs), n), -np.inf)
+        for pos, program in enumerate(plan.programs):
+            mask = self._hard_mask(program, columns, eligible)
+            if not mask.any():
+                continue
+            final = self._base_score(program, columns) * self._soft_multiplier(program, columns, mask)
+            passed = mask & (final > 20)
+            scores[pos, passed] = final[passed]
+
+        best_pos = np.argmax(scores, axis=0)
+        best_score = scores[best_pos, np.arange(n)]
+        matched = best_score > 20
+        return columns.ids[matched], best_score[matched], best_pos[matched]
+
+    def _global_mask(self, plan: "CompiledPolicy", columns: "BorrowerColumns") -> np.ndarray:
+        mask = np.ones(len(columns), dtype=bool)
+        if plan.restricted_states:
+            mask &= columns.apply('business_state', lambda v: v not in plan.restricted_states)
+        if plan.naics_trie:
+            mask &= columns.apply(
+                'industry_naics',
+                lambda v: not self.engine._is_industry_excluded(v, plan.naics_trie),
+            )
+        if plan.excluded_values:
+            mask &= columns.apply(
+                'industry_tier',
+                lambda v: not (v is not None and v in plan.excluded_values),
+            )
+        return mask
+
+    def _hard_mask(self, program: "CompiledProgram", columns: "BorrowerColumns", eligible: np.ndarray) -> np.ndarray:
+        """Eligible rows passing the program's bounds and strict rules. Each
+        rejection is counted against the first check that fails, as in
+        CreditMatchingEngine._check_hard_constraints."""
+        stats = self.engine.stats
+        remaining = int(np.count_nonzero(eligible))
+        stats.programs_evaluated += remaining
+
+        amount = columns.numeric('loan_amount')
+        mask = eligible & ~((amount > program.max_loan_amount) | (amount < program.min_loan_amount))
+        passed = int(np.count_nonzero(mask))
+        if passed < remaining:
+            stats.rejections['loan_amount'] += remaining - passed
+        remaining = passed
+
+        rules = self.engine.rule_order.order(program.strict_rules)
+        for position, rule in enumerate(rules):
+            if not remaining:
+                break
+            mask &= self._rule_mask(rule, columns, strict=True)
+            passed = int(np.count_nonzero(mask))
+            if passed < remaining:
+                stats.rejections[rule.field] += remaining - passed
+                stats.record_rules(rules, position, remaining - passed)
+            remaining = passed
+        if remaining:
+            stats.record_rules(rules, len(rules), remaining)
+        return mask
+
+    def _rule_mask(self, rule: "CompiledRule", columns: "BorrowerColumns", strict: bool) -> np.ndarray:
+        """True where the rule passes; a missing value passes only for soft rules."""
+        vector_op = _VECTOR_OPS.get(rule.op)
+        if rule.field in NUMERIC_FIELDS and rule.target is not None and vector_op is not None:
+            values = columns.numeric(rule.field)
+            missing = np.isnan(values)
+            with np.errstate(invalid='ignore'):
+                passes = vector_op(values, rule.target)
+            return (passes & ~missing) if strict else (passes | missing)
+
+        test = rule.test
+        if strict:
+            return columns.apply(rule.field, lambda v: v is not None and test(v))
+        return columns.apply(rule.field, lambda v: v is None or test(v))
+
+    def _base_score(self, program: "CompiledProgram", columns: "BorrowerColumns") -> np.ndarray:
+        w_fico, w_rev, w_tib = program.weights
+        engine = self.engine
+
+        u_fico = self._normalize_linear(columns.numeric('guarantor_fico'), 500, 800)
+        u_rev = self._normalize_linear(columns.numeric('annual_revenue'), 0, engine.SCORING_MAX_REVENUE)
+        u_tib = self._normalize_linear(columns.numeric('years_in_business'), 0, engine.SCORING_MAX_TIB)
+
+        final_score = (w_fico * u_fico) + (w_rev * u_rev) + (w_tib * u_tib)
+        return np.minimum(100.0, np.maximum(0.0, final_score))
+
+    def _normalize_linear(self, values: np.ndarray, min_val, max_val) -> np.ndarray:
+        with np.errstate(invalid='ignore'):
+            scaled = ((values - min_val) / (max_val - min_val)) * 100.0
+            result = np.where(values >= max_val, 100.0, scaled)
+            result = np.where(values <= min_val, 0.0, result)
+        result[np.isnan(values) | (values == 0)] = 0.0
+        return result
+
+    def _soft_multiplier(self, program: "CompiledProgram", columns: "BorrowerColumns", mask: np.ndarray) -> np.ndarray:
+        multiplier = np.ones(len(columns))
+        for rule in program.soft_rules:
+            failed = mask & ~self._rule_mask(rule, columns, strict=False)
+            if not failed.any():
+                continue
+
+            if rule.penalty == PENALTY_CRITICAL:
+                multiplier[failed] *= 0.85
+            elif rule.penalty == PENALTY_SIGMOID:
+                multiplier[failed] *= self._sigmoid_penalty(rule, columns, failed)
+            elif rule.penalty == PENALTY_DECAY:
+                multiplier[failed] *= self._decay(rule, columns, failed)
+        return multiplier
+
+    def _actual_values(self, rule: "CompiledRule", columns: "BorrowerColumns", rows: np.ndarray):
+        if rule.field in NUMERIC_FIELDS:
+            return columns.numeric(rule.field)[rows]
+        return None
+
+    def _sigmoid_penalty(self, rule: "CompiledRule", columns: "BorrowerColumns", rows: np.ndarray) -> np.ndarray:
+        actual = self._actual_values(rule, columns, rows)
+        if actual is None:
+            raw = columns.get(rule.field)
+            return np.array([
+                self.engine._calculate_sigmoid_penalty(raw[i], rule.value, rule.op)
+                for i in np.flatnonzero(rows)
+            ])
+        if rule.target is None:
+            return np.full(len(actual), 0.5)
+
+        k = self.engine.SIGMOID_STEEPNESS
+        if rule.op in ('>=', '>'):
+            midpoint = rule.target * 0.90
+            return 1 / (1 + _exp(-k * (actual - midpoint)))
+        elif rule.op in ('<=', '<'):
+            midpoint = rule.target * 1.10
+            return 1 / (1 + _exp(k * (actual - midpoint)))
+        return np.ones(len(actual))
+
+    def _decay(self, rule: "CompiledRule", columns: "BorrowerColumns", rows: np.ndarray) -> np.ndarray:
+        actual = self._actual_values(rule, columns, rows)
+        if actual is None:
+            raw = columns.get(rule.field)
+            return np.array([
+                self.engine._calculate_decay(raw[i], rule.value, rule.op)
+                for i in np.flatnonzero(rows)
+            ])
+        if rule.target is None:
+            return np.full(len(actual), 0.5)
+
+        target = rule.target
+        if target == 0: target = 1
+
+        diff = np.zeros(len(actual))
+        if rule.op in ('>=', '>'):
+            below = actual < target
+            diff[below] = (target - actual[below]) / target
+        elif rule.op in ('<=', '<'):
+            above = actual > target
+            diff[above] = (actual[above] - target) / target
+        elif rule.op == '==':
+            diff = np.abs(actual - target) / target
+
+        return np.maximum(0.0, _exp(-self.engine.DECAY_SENSITIVITY * diff))
+
+
+def iter_column_blocks(rows: Iterable[Sequence[Any]], fields: Sequence[str], block_size: int):
+    """Groups a row stream into BorrowerColumns blocks of at most block_size rows."""
+    block = []
+    for row in rows:
+        block.append(row)
+        if len(block) >= block_size:
+            yield BorrowerColumns.from_rows(fields, block)
+            block = []
+    if block:
+        yield BorrowerColumns.from_rows(fields, block)
@@ -0,0 +1,252 @@
+import operator
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, NamedTuple, Optional, Tuple
+
+from app.models.model import LenderPolicy
+from app.matching_engine.naics import NaicsTrie
+
+CRITICAL_FIELDS = frozenset({
+    'has_active_bankruptcy', 'has_unpaid_tax_liens', 'business_state',
+    'business_entity_type', 'is_homeowner', 'equipment_type',
+    'vendor_type', 'equipment_condition'
+})
+SIGMOID_FIELDS = frozenset({
+    'guarantor_fico', 'paynet_score', 'annual_revenue',
+    'avg_daily_balance', 'dscr_ratio', 'years_in_business'
+})
+DECAY_FIELDS = frozenset({
+    'equipment_age', 'ltv_ratio', 'nsf_count',
+    'years_since_bankruptcy_discharge', 'years_since_last_judgment', "loan_amount"
+})
+
+# Borrower columns whose values always survive float(); every other field may
+# fall back to the string comparison path.
+NUMERIC_FIELDS = frozenset({
+    'guarantor_fico', 'paynet_score', 'years_in_business', 'annual_revenue',
+    'avg_daily_balance', 'nsf_count', 'dscr_ratio', 'industry_tier',
+    'has_active_bankruptcy', 'years_since_bankruptcy_discharge', 'has_unpaid_tax_liens',
+    'years_since_last_judgment', 'loan_amount', 'ltv_ratio', 'equipment_age',
+    'is_homeowner', 'ownership_percentage'
+})
+
+_NUMERIC_OPS: Dict[str, Callable[[float, float], bool]] = {
+    '==': lambda a, b: abs(a - b) < 0.001,
+    '!=': lambda a, b: abs(a - b) >= 0.001,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+}
+_MEMBERSHIP_OPS = {'in': True, 'not_in': False, 'not in': False}
+
+PENALTY_CRITICAL = "critical"
+PENALTY_SIGMOID = "sigmoid"
+PENALTY_DECAY = "decay"
+PENALTY_NONE = "none"
+
+
+class CompiledRule(NamedTuple):
+    field: str
+    op: str
+    value: Any
+    target: Optional[float]
+    test: Callable[[Any], bool]
+    penalty: str
+
+
+class CompiledProgram(NamedTuple):
+    index: int
+    name: str
+    min_loan_amount: float
+    max_loan_amount: float
+    weights: Tuple[float, float, float]
+    strict_rules: Tuple[CompiledRule, ...]
+    soft_rules: Tuple[CompiledRule, ...]
+
+
+class CompiledPolicy(NamedTuple):
+    policy_id: Any
+    lender_id: Any
+    restricted_states: FrozenSet[str]
+    excluded_industries: Tuple[str, ...]
+    naics_trie: NaicsTrie
+    excluded_values: FrozenSet[Hashable]
+    programs: Tuple[CompiledProgram, ...]
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if isinstance(value, (list, tuple, set, dict)) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def compile_comparison(field: str, op: str, value: Any) -> Callable[[Any], bool]:
+    """Pick the comparison for one rule up front.
+
+    Numeric comparison when both the borrower value and the rule value convert
+    to float, string comparison otherwise (membership for in / not_in).
+    """
+    target = _to_float(value)
+    numeric_op = _NUMERIC_OPS.get(op)
+
+    if op in ('==', '!='):
+        target_str = str(value)
+        equal = op == '=='
+        string_op = (lambda b: (str(b) == target_str) is equal)
+    elif op in _MEMBERSHIP_OPS:
+        members = frozenset(str(v) for v in value) if is_iterable(value) else None
+        inside = _MEMBERSHIP_OPS[op]
+        if members is None:
+            string_op = (lambda b: False)
+        else:
+            string_op = (lambda b: (str(b) in members) is inside)
+    else:
+        string_op = (lambda b: False)
+
+    if target is None:
+        return string_op
+
+    if field in NUMERIC_FIELDS:
+        if numeric_op is None:
+            return lambda b: False
+        return lambda b: numeric_op(float(b), target)
+
+    def mixed(b):
+        b_float = _to_float(b)
+        if b_float is None:
+            return string_op(b)
+        return numeric_op(b_float, target) if numeric_op else False
+    return mixed
+
+
+def is_iterable(value: Any) -> bool:
+    try:
+        iter(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _penalty_kind(field: str) -> str:
+    if field in CRITICAL_FIELDS:
+        return PENALTY_CRITICAL
+    if field in SIGMOID_FIELDS:
+        return PENALTY_SIGMOID
+    if field in DECAY_FIELDS:
+        return PENALTY_DECAY
+    return PENALTY_NONE
+
+
+def compile_rule(rule: Dict[str, Any]) -> CompiledRule:
+    field = rule.get('field_name')
+    if hasattr(field, 'value'):
+        field = field.value
+    op = rule.get('operator')
+    if hasattr(op, 'value'):
+        op = op.value
+    value = rule.get('value')
+
+    return CompiledRule(
+        field=field,
+        op=op,
+        value=value,
+        target=_to_float(value),
+        test=compile_comparison(field, op, value),
+        penalty=_penalty_kind(field),
+    )
+
+
+def compile_program(index: int, program: Dict[str, Any]) -> CompiledProgram:
+    min_amt = program.get('min_loan_amount', 0)
+    max_amt = program.get('max_loan_amount', float('inf'))
+    weights = program.get('weights') or {}
+
+    strict_rules = []
+    soft_rules = []
+    for rule in program.get('rules', []) or []:
+        compiled = compile_rule(rule)
+        if rule.get('strict', True):
+            strict_rules.append(compiled)
+        else:
+            soft_rules.append(compiled)
+
+    return CompiledProgram(
+        index=index,
+        name=program.get('program_name', 'Standard'),
+        min_loan_amount=float(min_amt) if min_amt is not None else 0.0,
+        max_loan_amount=float(max_amt) if max_amt is not None else float('inf'),
+        weights=(
+            weights.get('fico', 0.4),
+            weights.get('revenue', 0.3),
+            weights.get('time_in_business', 0.3),
+        ),
+        strict_rules=tuple(strict_rules),
+        soft_rules=tuple(soft_rules),
+    )
+
+
+def compile_policy(policy: "LenderPolicy") -> CompiledPolicy:
+    excluded = policy.excluded_industries or []
+    return CompiledPolicy(
+        policy_id=policy.id,
+        lender_id=policy.lender_id,
+        restricted_states=frozenset(policy.restricted_states or []),
+        excluded_industries=tuple(str(code) for code in excluded),
+        naics_trie=NaicsTrie(excluded),
+        excluded_values=frozenset(v for v in excluded if isinstance(v, Hashable)),
+        programs=tuple(
+            compile_program(idx, program)
+            for idx, program in enumerate(policy.programs or [])
+        ),
+    )
+
+
+class PolicyPlanCache:
+    """Compiled plans keyed by policy id and version.
+
+    A saved LenderPolicy row is never edited in place (update_policy inserts a
+    new row), so (id, updated_at) identifies its rules exactly.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._plans: Dict[Tuple, CompiledPolicy] = {}
+        self._lock = threading.Lock()
+
+    def get(self, policy: "LenderPolicy") -> CompiledPolicy:
+        policy_id = policy.id
+        if policy_id is None:
+            return compile_policy(policy)
+
+        key = (policy_id, policy.updated_at)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+
+        plan = compile_policy(policy)
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.max_entries:
+                del self._plans[next(iter(self._plans))]
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+
+plan_cache = PolicyPlanCache()
+
+
+def get_compiled_policy(policy: "LenderPolicy") -> CompiledPolicy:
+    return plan_cache.get(policy)
+
+
+def compile_policies(policies: List["LenderPolicy"]) -> List[CompiledPolicy]:
+    return [plan_cache.get(policy) for policy in policies]
@@ -1,6 +1,44 @@
+import functools
 import math
-from typing import List, Optional, Dict, Any
+import time
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import exists, or_
+from app.core.metrics import ENGINE_PHASE_SECONDS, ENGINE_SECONDS
 from app.models.model import Borrower, LenderPolicy, LoanMatch, MatchTier
+from app.matching_engine.compiler import (
+    CompiledPolicy,
+    CompiledProgram,
+    CompiledRule,
+    PENALTY_CRITICAL,
+    PENALTY_DECAY,
+    PENALTY_SIGMOID,
+    get_compiled_policy,
+)
+from app.matching_engine.columnar import BorrowerColumns, ColumnarEvaluator, fields_for_plan, iter_column_blocks
+from app.matching_engine.naics import NaicsTrie
+from app.matching_engine.policy_index import PolicyIndex
+from app.matching_engine.policy_diff import diff_policies
+from app.matching_engine.sql_pushdown import policy_clause
+from app.matching_engine.rule_order import rule_orderer
+from app.matching_engine.stats import EngineStats
+
+
+def _instrumented(method):
+    """Times an entry point and publishes the stats it gathered."""
+    entry = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            matches = method(self, *args, **kwargs)
+            self.stats.matches += len(matches)
+            return matches
+        finally:
+            ENGINE_SECONDS.labels(entry).observe(time.perf_counter() - start)
+            self.stats.flush(entry)
+    return wrapper
+
 
 class CreditMatchingEngine:
     def __init__(self):
@@ -10,166 +48,251 @@ class CreditMatchingEngine:
         self.DECAY_SENSITIVITY = 10.0  
         self.SIGMOID_STEEPNESS = 0.5  
 
-    def run_engine_for_borrower(self, borrower: "Borrower", policies: List["LenderPolicy"]) -> List["LoanMatch"]:
+        self.COLUMNAR_BLOCK_SIZE = 50_000
+        self.COLUMNAR_MIN_BATCH = 64
+
+        self.stats = EngineStats()
+        self.rule_order = rule_orderer
+
+    @_instrumented
+    def run_engine_for_borrower(
+        self,
+        borrower: "Borrower",
+        policies: List["LenderPolicy"],
+        index: Optional["PolicyIndex"] = None
+    ) -> List["LoanMatch"]:
+        """Best match per active policy. When an index over the same policies
+        is given, only its candidate (policy, program) pairs are evaluated."""
+        self.stats.borrowers_scanned += 1
+        if index is not None:
+            return self._run_indexed_for_borrower(borrower, index)
+
         matches = []
         for policy in policies:
-            if not self._check_global_policy(borrower, policy):
+            if not policy.is_active:
+                continue
+
+            plan = get_compiled_policy(policy)
+            if not self._check_global_policy(borrower, plan):
                 continue
             
-            best_program_match = self._evaluate_programs(borrower, policy)
+            best_program_match = self._evaluate_programs(borrower, plan)
             if best_program_match:
                 matches.append(best_program_match)
         return matches
     
-    def run_engine_for_lender(self, new_policy: "LenderPolicy", db_session) -> List["LoanMatch"]:
+    def _run_indexed_for_borrower(self, borrower: "Borrower", index: "PolicyIndex") -> List["LoanMatch"]:
         matches = []
-        query = db_session.query(Borrower).filter(Borrower.loan_amount > 0)
+        for plan, programs in index.candidates(borrower):
+            best_program_match = self._evaluate_programs(borrower, plan, programs)
+            if best_program_match:
+                matches.append(best_program_match)
+        return matches
 
-        if new_policy.restricted_states:
-            query = query.filter(Borrower.business_state.notin_(new_policy.restricted_states))
-            
-        global_min_fico = 0
-        if new_policy.programs:
-            try:
-                min_ficos = []
-                for p in new_policy.programs:
-                    for rule in p.get('rules', []):
-                        if rule.get('field_name') == 'guarantor_fico' and rule.get('operator') == '>=':
-                            min_ficos.append(float(rule.get('value')))
-                if min_ficos:
-                    global_min_fico = min(min_ficos)
-            except:
-                pass
-        
-        if global_min_fico > 50:
-            query = query.filter(Borrower.guarantor_fico >= (global_min_fico - 50))
+    @_instrumented
+    def run_engine_for_borrowers(self, borrowers: Sequence["Borrower"], index: "PolicyIndex") -> List["LoanMatch"]:
+        """Batch intake: one columnar pass per active policy over the whole
+        batch. Small batches go borrower by borrower through the index."""
+        self.stats.borrowers_scanned += len(borrowers)
+        if len(borrowers) < self.COLUMNAR_MIN_BATCH:
+            return [
+                match
+                for borrower in borrowers
+                for match in self._run_indexed_for_borrower(borrower, index)
+            ]
+
+        fields = set()
+        for plan in index.plans:
+            fields.update(fields_for_plan(plan))
+        fields = sorted(fields)
+        columns = BorrowerColumns.from_rows(
+            fields,
+            [(b.id, *[getattr(b, field, None) for field in fields]) for b in borrowers]
+        )
+
+        evaluator = ColumnarEvaluator(self)
+        matches = []
+        for plan in index.plans:
+            ids, scores, positions = evaluator.evaluate(plan, columns)
+            matches.extend(self._build_matches(plan, ids, scores, positions))
+        return matches
+
+    @_instrumented
+    def run_engine_for_lender(
+        self,
+        new_policy: "LenderPolicy",
+        db_session,
+        columnar: bool = False,
+        previous_policy: Optional["LenderPolicy"] = None,
+        id_range: Optional[Tuple[int, int]] = None
+    ) -> List["LoanMatch"]:
+        """Full set of matches for the policy. With the previous version whose
+        matches are currently stored, only those borrowers and the ones the
+        policy diff lets in are evaluated. id_range = (start, stop) restricts
+        the run to one shard of borrower ids."""
+        matches = []
+        if not new_policy.is_active:
+            return matches
+
+        plan = get_compiled_policy(new_policy)
+        additions = None
+        if previous_policy is not None:
+            additions = diff_policies(get_compiled_policy(previous_policy), plan)
 
-        candidate_borrowers = query.yield_per(1000) 
+        if columnar:
+            return self._run_columnar_for_lender(plan, db_session, additions, id_range)
+
+        candidate_borrowers = self._candidate_query(
+            plan, db_session, Borrower, additions=additions, id_range=id_range
+        ).yield_per(1000)
 
         for borrower in candidate_borrowers:
-            if not self._check_global_policy(borrower, new_policy):
+            self.stats.borrowers_scanned += 1
+            if not self._check_global_policy(borrower, plan):
                 continue
 
-            best_program_match = self._evaluate_programs(borrower, new_policy)
+            best_program_match = self._evaluate_programs(borrower, plan)
             if best_program_match:
                 matches.append(best_program_match)
 
         return matches
 
-    def _check_global_policy(self, borrower: "Borrower", policy: "LenderPolicy") -> bool:
-        """Global filters that apply to the Lender (not specific programs)."""
-        if not policy.is_active:
-            return False
+    def _candidate_query(self, plan: "CompiledPolicy", db_session, *entities, additions=None, id_range=None):
+        """Borrowers that can pass at least one program: global filters, loan
+        bounds and strict rules are translated to SQL (see sql_pushdown).
+        `additions` further limits them to the lender's current matches plus
+        the borrowers it accepts."""
+        query = db_session.query(*entities).filter(
+            Borrower.loan_amount > 0,
+            policy_clause(plan).clause
+        )
+        if additions is not None:
+            already_matched = exists().where(
+                LoanMatch.lender_id == plan.lender_id,
+                LoanMatch.borrower_id == Borrower.id
+            )
+            query = query.filter(or_(already_matched, additions))
+        if id_range is not None:
+            query = query.filter(Borrower.id >= id_range[0], Borrower.id < id_range[1])
+        return query
+
+    def _run_columnar_for_lender(self, plan: "CompiledPolicy", db_session, additions=None, id_range=None) -> List["LoanMatch"]:
+        """Columnar rematch: loads only the columns the plan reads and scores
+        COLUMNAR_BLOCK_SIZE borrowers at a time with NumPy."""
+        fields = fields_for_plan(plan)
+        entities = [Borrower.id] + [getattr(Borrower, field) for field in fields]
+        rows = self._candidate_query(plan, db_session, *entities, additions=additions, id_range=id_range).yield_per(self.COLUMNAR_BLOCK_SIZE)
+
+        evaluator = ColumnarEvaluator(self)
+        matches = []
+        start = time.perf_counter()
+        scoring = 0.0
+        for columns in iter_column_blocks(rows, fields, self.COLUMNAR_BLOCK_SIZE):
+            self.stats.borrowers_scanned += len(columns)
+            block_start = time.perf_counter()
+            ids, scores, positions = evaluator.evaluate(plan, columns)
+            matches.extend(self._build_matches(plan, ids, scores, positions))
+            scoring += time.perf_counter() - block_start
+
+        ENGINE_PHASE_SECONDS.labels("scoring").observe(scoring)
+        ENGINE_PHASE_SECONDS.labels("candidate_query").observe(time.perf_counter() - start - scoring)
+        return matches
 
-        restricted_states = policy.restricted_states or []
-        if borrower.business_state in restricted_states:
+    def _build_matches(self, plan: "CompiledPolicy", ids, scores, positions) -> List["LoanMatch"]:
+        return [
+            LoanMatch(
+                lender_id=plan.lender_id,
+                borrower_id=borrower_id,
+                match_score=round(score, 2),
+                match_tier=self._determine_tier(score),
+                matched_program_name=plan.programs[pos].name,
+                is_active=True
+            )
+            for borrower_id, score, pos in zip(ids.tolist(), scores.tolist(), positions.tolist())
+        ]
+
+    def _check_global_policy(self, borrower: "Borrower", plan: "CompiledPolicy") -> bool:
+        """Global filters that apply to the Lender (not specific programs)."""
+        if borrower.business_state in plan.restricted_states:
             return False 
 
-        excluded_industries = policy.excluded_industries or []
-        if self._is_industry_excluded(borrower.industry_naics, excluded_industries):
+        if self._is_industry_excluded(borrower.industry_naics, plan.naics_trie):
             return False
 
-        if borrower.industry_tier and borrower.industry_tier.value in excluded_industries:
+        if borrower.industry_tier and borrower.industry_tier.value in plan.excluded_values:
             return False 
 
         return True
 
-    def _evaluate_programs(self, borrower: "Borrower", policy: "LenderPolicy") -> Optional["LoanMatch"]:
+    def _evaluate_programs(
+        self,
+        borrower: "Borrower",
+        plan: "CompiledPolicy",
+        programs: Optional[Sequence["CompiledProgram"]] = None
+    ) -> Optional["LoanMatch"]:
         best_score = -1
-        best_match = None
+        best_program = None
 
-        programs = policy.programs if policy.programs else []
-        
-        for program in programs:
+        for program in plan.programs if programs is None else programs:
             if not self._check_hard_constraints(borrower, program):
                 continue 
 
-            base_score = self._calculate_score(borrower, program.get('weights', {}))
+            base_score = self._calculate_score(borrower, program.weights)
 
-            penalty_multiplier = self._calculate_soft_penalty(borrower, program.get('rules', []))
+            penalty_multiplier = self._calculate_soft_penalty(borrower, program.soft_rules)
             
             final_score = base_score * penalty_multiplier
 
             if final_score > 20 and final_score > best_score:
                 best_score = final_score
-                tier = self._determine_tier(final_score)
-                
-                best_match = LoanMatch(
-                    lender_id=policy.lender_id,
-                    borrower_id=borrower.id,
-                    match_score=round(final_score, 2),
-                    match_tier=tier,
-                    matched_program_name=program.get('program_name', 'Standard'),
-                    is_active=True
-                )
-
-        return best_match
-
-    def _check_hard_constraints(self, b: "Borrower", program: Dict[str, Any]) -> bool:
-        min_amt = program.get('min_loan_amount', 0)
-        max_amt = program.get('max_loan_amount', float('inf'))
-        
-        if b.loan_amount > max_amt or b.loan_amount < min_amt:
+                best_program = program
+
+        if best_program is None:
+            return None
+
+        return LoanMatch(
+            lender_id=plan.lender_id,
+            borrower_id=borrower.id,
+            match_score=round(best_score, 2),
+            match_tier=self._determine_tier(best_score),
+            matched_program_name=best_program.name,
+            is_active=True
+        )
+
+    def _check_hard_constraints(self, b: "Borrower", program: "CompiledProgram") -> bool:
+        self.stats.programs_evaluated += 1
+        if b.loan_amount > program.max_loan_amount or b.loan_amount < program.min_loan_amount:
+            self.stats.rejections['loan_amount'] += 1
             return False
 
-        rules = program.get('rules', [])
-        
-        for rule in rules:
-            if not rule.get('strict', True): 
-                continue
-
-            field = rule.get('field_name')
-            op = rule.get('operator')
-            target_val = rule.get('value')
-            
-            actual_val = self._get_borrower_value(b, field)
-            if actual_val is None: 
-                return False 
-
-            if not self._compare_values(actual_val, target_val, op):
+        rules = self.rule_order.order(program.strict_rules)
+        for position, rule in enumerate(rules):
+            actual_val = self._get_borrower_value(b, rule.field)
+            if actual_val is None or not rule.test(actual_val):
+                self.stats.rejections[rule.field] += 1
+                self.stats.record_rules(rules, position)
                 return False 
                 
+        self.stats.record_rules(rules, len(rules))
         return True
 
-    def _calculate_soft_penalty(self, b: "Borrower", rules: List[Dict]) -> float:
+    def _calculate_soft_penalty(self, b: "Borrower", rules: Sequence["CompiledRule"]) -> float:
         multiplier = 1.0
-        
-        CRITICAL_FIELDS = {
-            'has_active_bankruptcy', 'has_unpaid_tax_liens', 'business_state',
-            'business_entity_type', 'is_homeowner', 'equipment_type', 
-            'vendor_type', 'equipment_condition'
-        }
-        SIGMOID_FIELDS = {
-            'guarantor_fico', 'paynet_score', 'annual_revenue', 
-            'avg_daily_balance', 'dscr_ratio', 'years_in_business'
-        }
-        DECAY_FIELDS = {
-            'equipment_age', 'ltv_ratio', 'nsf_count',
-            'years_since_bankruptcy_discharge', 'years_since_last_judgment', "loan_amount"
-        }
 
         for rule in rules:
-            if rule.get('strict', True): continue 
-
-            field = rule.get('field_name')
-            op = rule.get('operator')
-            target = rule.get('value')
-            actual = self._get_borrower_value(b, field)
+            actual = self._get_borrower_value(b, rule.field)
 
-            if actual is None or self._compare_values(actual, target, op):
+            if actual is None or rule.test(actual):
                 continue
             
-            if field in CRITICAL_FIELDS:
+            if rule.penalty == PENALTY_CRITICAL:
                 multiplier *= 0.85 
             
-            elif field in SIGMOID_FIELDS:
-                multiplier *= self._calculate_sigmoid_penalty(actual, target, op)
+            elif rule.penalty == PENALTY_SIGMOID:
+                multiplier *= self._calculate_sigmoid_penalty(actual, rule.value, rule.op)
             
-            elif field in DECAY_FIELDS:
-                multiplier *= self._calculate_decay(actual, target, op)
-            
-            else:
-                multiplier *= 1 
+            elif rule.penalty == PENALTY_DECAY:
+                multiplier *= self._calculate_decay(actual, rule.value, rule.op)
 
         return multiplier
 
@@ -182,12 +305,15 @@ class CreditMatchingEngine:
 
         k = self.SIGMOID_STEEPNESS
         
-        if op in ['>=', '>']:
-            midpoint = target * 0.90
-            return 1 / (1 + math.exp(-k * (actual - midpoint)))
-        elif op in ['<=', '<']:
-            midpoint = target * 1.10
-            return 1 / (1 + math.exp(k * (actual - midpoint)))
+        try:
+            if op in ['>=', '>']:
+                midpoint = target * 0.90
+                return 1 / (1 + math.exp(-k * (actual - midpoint)))
+            elif op in ['<=', '<']:
+                midpoint = target * 1.10
+                return 1 / (1 + math.exp(k * (actual - midpoint)))
+        except OverflowError:
+            return 0.0
         
         return 1.0
 
@@ -214,27 +340,8 @@ class CreditMatchingEngine:
         if hasattr(val, 'value'): return val.value 
         return val
 
-    def _compare_values(self, b_val, r_val, op) -> bool:
-        try:
-            b_float = float(b_val)
-            r_float = float(r_val)
-            if op == '==': return abs(b_float - r_float) < 0.001
-            if op == '>=': return b_float >= r_float
-            if op == '<=': return b_float <= r_float
-            if op == '>': return b_float > r_float
-            if op == '<': return b_float < r_float
-        except:
-            b_str = str(b_val)
-            if op == '==': return b_str == str(r_val)
-            if op == '!=': return b_str != str(r_val)
-            if op == 'in': return b_str in [str(v) for v in r_val]
-            if op == 'not in': return b_str not in [str(v) for v in r_val]
-        return False
-
-    def _calculate_score(self, b: "Borrower", weights: Dict[str, float]) -> float:
-        w_fico = weights.get('fico', 0.4)
-        w_rev = weights.get('revenue', 0.3)
-        w_tib = weights.get('time_in_business', 0.3)
+    def _calculate_score(self, b: "Borrower", weights: Sequence[float]) -> float:
+        w_fico, w_rev, w_tib = weights
         
         u_fico = self._normalize_linear(b.guarantor_fico, 500, 800)
         u_rev = self._normalize_linear(b.annual_revenue, 0, self.SCORING_MAX_REVENUE)
@@ -255,10 +362,6 @@ class CreditMatchingEngine:
         if score >= 50: return MatchTier.MODERATE
         return MatchTier.WEAK
 
-    def _is_industry_excluded(self, borrower_naics: str, excluded_list: list) -> bool:
+    def _is_industry_excluded(self, borrower_naics: str, excluded: "NaicsTrie") -> bool:
         if not borrower_naics: return False
-        str_naics = str(borrower_naics)
-        for blocked_code in excluded_list:
-            if str_naics.startswith(str(blocked_code)):
-                return True
-        return False
\ No newline at end of file
+        return excluded.matches(str(borrower_naics))
\ No newline at end of file
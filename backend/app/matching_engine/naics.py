@@ -0,0 +1,65 @@
+from typing import Any, Dict, Hashable, Iterable, Set
+
+_TERMINAL = ""
+
+
+class NaicsTrie:
+    """Prefix trie over excluded NAICS codes.
+
+    A code is excluded when any stored prefix is a prefix of it, i.e. the
+    str.startswith semantics of the old linear scan, answered in one walk of
+    at most len(code) steps. Each stored prefix carries a set of owners, so
+    one trie can serve many policies (owners_of) or a single one (matches).
+    """
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self, prefixes: Iterable[Any] = (), owner: Hashable = True):
+        self._root: Dict[str, Any] = {}
+        self._size = 0
+        for prefix in prefixes:
+            self.add(prefix, owner)
+
+    def add(self, prefix: Any, owner: Hashable = True):
+        node = self._root
+        for char in str(prefix):
+            node = node.setdefault(char, {})
+        owners = node.get(_TERMINAL)
+        if owners is None:
+            owners = node[_TERMINAL] = set()
+            self._size += 1
+        owners.add(owner)
+
+    def matches(self, code: str) -> bool:
+        node = self._root
+        if _TERMINAL in node:
+            return True
+        for char in code:
+            node = node.get(char)
+            if node is None:
+                return False
+            if _TERMINAL in node:
+                return True
+        return False
+
+    def owners_of(self, code: str) -> Set[Hashable]:
+        """Union of the owners of every stored prefix of code."""
+        found: Set[Hashable] = set()
+        node = self._root
+        owners = node.get(_TERMINAL)
+        if owners:
+            found |= owners
+        for char in code:
+            node = node.get(char)
+            if node is None:
+                break
+            owners = node.get(_TERMINAL)
+            if owners:
+                found |= owners
+        return found
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app.models.model import Borrower, LenderPolicy, LoanMatch
+
+PARALLEL_WORKERS = int(os.getenv("MATCH_PARALLEL_WORKERS", str(os.cpu_count() or 1)))
+# Below this many borrower ids the process start-up and per-shard queries
+# cost more than they save.
+PARALLEL_MIN_BORROWERS = int(os.getenv("MATCH_PARALLEL_MIN_BORROWERS", "200000"))
+SHARDS_PER_WORKER = 4
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """One pool per process, reused across rematches. Children are spawned,
+    not forked, because the match worker that calls this is multi-threaded."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def shard_ranges(min_id: int, max_id: int, shards: int) -> List[Tuple[int, int]]:
+    """Splits [min_id, max_id] into at most `shards` contiguous [start, stop) ranges."""
+    span = max_id - min_id + 1
+    shards = max(1, min(shards, span))
+    step = -(-span // shards)
+    return [(start, min(start + step, max_id + 1)) for start in range(min_id, max_id + 1, step)]
+
+
+def _match_shard(policy_id, previous_policy_id, id_range: Tuple[int, int]):
+    """Runs in a pool process, with that process's own engine and connections."""
+    from app.database import BatchSessionLocal
+    from app.matching_engine.engine import CreditMatchingEngine
+
+    db = BatchSessionLocal()
+    try:
+        policy = db.query(LenderPolicy).filter(LenderPolicy.id == policy_id).first()
+        previous = None
+        if previous_policy_id is not None:
+            previous = db.query(LenderPolicy).filter(LenderPolicy.id == previous_policy_id).first()
+        if policy is None:
+            return []
+
+        matches = CreditMatchingEngine().run_engine_for_lender(
+            policy, db, columnar=True, previous_policy=previous, id_range=id_range
+        )
+        return [
+            (m.borrower_id, m.match_score, m.match_tier, m.matched_program_name)
+            for m in matches
+        ]
+    finally:
+        db.close()
+
+
+def run_lender_rematch(
+    engine,
+    policy: "LenderPolicy",
+    db_session,
+    previous_policy: Optional["LenderPolicy"] = None,
+    workers: Optional[int] = None
+) -> List["LoanMatch"]:
+    """run_engine_for_lender, sharded by borrower id over a process pool.
+
+    Small borrower tables, or workers <= 1, take the serial columnar path.
+    """
+    workers = PARALLEL_WORKERS if workers is None else workers
+    min_id, max_id = db_session.query(func.min(Borrower.id), func.max(Borrower.id)).one()
+
+    if (
+        not policy.is_active
+        or workers <= 1
+        or min_id is None
+        or max_id - min_id + 1 < PARALLEL_MIN_BORROWERS
+    ):
+        return engine.run_engine_for_lender(policy, db_session, columnar=True, previous_policy=previous_policy)
+
+    executor = _get_executor(workers)
+    previous_id = previous_policy.id if previous_policy is not None else None
+    futures = [
+        executor.submit(_match_shard, policy.id, previous_id, id_range)
+        for id_range in shard_ranges(min_id, max_id, workers * SHARDS_PER_WORKER)
+    ]
+
+    try:
+        results = [future.result() for future in futures]
+    except BrokenProcessPool:
+        _reset_executor()
+        raise
+
+    matches = []
+    for shard in results:
+        for borrower_id, score, tier, program_name in shard:
+            matches.append(LoanMatch(
+                lender_id=policy.lender_id,
+                borrower_id=borrower_id,
+                match_score=score,
+                match_tier=tier,
+                matched_program_name=program_name,
+                is_active=True
+            ))
+    return matches
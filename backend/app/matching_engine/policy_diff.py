@@ -0,0 +1,94 @@
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import false, func, not_, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.matching_engine.compiler import CompiledPolicy, CompiledProgram, CompiledRule
+from app.matching_engine.sql_pushdown import global_clause, program_clause
+
+
+def _rule_key(rule: "CompiledRule") -> Tuple[str, str, str]:
+    return (rule.field, rule.op, repr(rule.value))
+
+
+def _programs_by_name(plan: "CompiledPolicy") -> Optional[Dict[str, CompiledProgram]]:
+    programs = {program.name: program for program in plan.programs}
+    if len(programs) != len(plan.programs):
+        return None
+    return programs
+
+
+def _same_scoring(old: "CompiledProgram", new: "CompiledProgram") -> bool:
+    """Same score for every borrower that passes both programs' strict rules."""
+    return (
+        old.weights == new.weights
+        and tuple(map(_rule_key, old.soft_rules)) == tuple(map(_rule_key, new.soft_rules))
+    )
+
+
+def _program_narrowed(old: "CompiledProgram", new: "CompiledProgram") -> bool:
+    """New program accepts a subset of what the old one accepted, scored the same."""
+    return (
+        _same_scoring(old, new)
+        and new.min_loan_amount >= old.min_loan_amount
+        and new.max_loan_amount <= old.max_loan_amount
+        and set(map(_rule_key, old.strict_rules)) <= set(map(_rule_key, new.strict_rules))
+    )
+
+
+def _global_narrowed(old: "CompiledPolicy", new: "CompiledPolicy") -> bool:
+    return (
+        old.restricted_states <= new.restricted_states
+        and old.excluded_values <= new.excluded_values
+        and all(new.naics_trie.matches(code) for code in old.excluded_industries)
+    )
+
+
+def _accepted(clause: ColumnElement) -> ColumnElement:
+    # NULL-safe, so negating it keeps rows where a compared column is NULL.
+    return func.coalesce(clause, false())
+
+
+def diff_policies(old: Optional["CompiledPolicy"], new: "CompiledPolicy") -> Optional[ColumnElement]:
+    """WHERE clause bounding the borrowers that can match `new` without having
+    matched `old`, or None when the change cannot be bounded. `old` must be
+    the version the stored matches were computed from; borrowers it accepted
+    are assumed to be among them already.
+
+    Programs are paired by name. A borrower can only start matching through
+    program P if it now passes P's strict rules and either did not pass the
+    old P (or the old global filters), or P's scoring changed. Programs whose
+    bounds and strict rules only got tighter add nobody; existing matches are
+    rechecked separately. Duplicate program names fall back to a full rematch.
+    """
+    if old is None or not old.programs:
+        return None
+
+    old_programs = _programs_by_name(old)
+    new_programs = _programs_by_name(new)
+    if old_programs is None or new_programs is None:
+        return None
+
+    old_global = global_clause(old)
+    new_global = global_clause(new).clause
+    global_narrowed = _global_narrowed(old, new)
+
+    additions: List[ColumnElement] = []
+    for name, program in new_programs.items():
+        previous = old_programs.get(name)
+        if previous is None:
+            additions.append(program_clause(program).clause)
+            continue
+
+        if global_narrowed and _program_narrowed(previous, program):
+            continue
+
+        clause = program_clause(program).clause
+        old_clause = program_clause(previous)
+        if _same_scoring(previous, program) and old_clause.exact and old_global.exact:
+            clause = clause & not_(_accepted(old_global.clause & old_clause.clause))
+        additions.append(clause)
+
+    if not additions:
+        return false()
+    return new_global & or_(*additions)
@@ -0,0 +1,101 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, FrozenSet, List, Sequence, Set, Tuple
+
+from app.models.model import Borrower, LenderPolicy
+from app.matching_engine.compiler import CompiledPolicy, CompiledProgram, get_compiled_policy
+from app.matching_engine.naics import NaicsTrie
+
+
+class PolicyIndex:
+    """Inverted index over active policies for borrower-side matching.
+
+    candidates(borrower) returns, per policy that passes the global filters
+    (restricted states, NAICS prefix and industry tier exclusions), the
+    programs whose loan amount bounds contain the borrower's loan amount. All
+    other (policy, program) pairs are rejected by the engine anyway.
+    """
+
+    def __init__(self, policies: Sequence["LenderPolicy"]):
+        self.policies: Tuple[LenderPolicy, ...] = tuple(p for p in policies if p.is_active)
+        self.plans: Tuple[CompiledPolicy, ...] = tuple(get_compiled_policy(p) for p in self.policies)
+        self._all = frozenset(range(len(self.plans)))
+
+        self._restricted_by_state: Dict[str, Set[int]] = {}
+        self._excluded_naics = NaicsTrie()
+        self._excluded_by_value: Dict[object, Set[int]] = {}
+        self._accepting: Dict[str, FrozenSet[int]] = {}
+
+        intervals = []
+        for pos, plan in enumerate(self.plans):
+            for state in plan.restricted_states:
+                self._restricted_by_state.setdefault(state, set()).add(pos)
+            for code in plan.excluded_industries:
+                self._excluded_naics.add(code, pos)
+            for value in plan.excluded_values:
+                self._excluded_by_value.setdefault(value, set()).add(pos)
+            for program in plan.programs:
+                intervals.append((program.min_loan_amount, program.max_loan_amount, pos, program))
+
+        self._by_min = sorted(intervals, key=lambda entry: entry[0])
+        self._mins = [entry[0] for entry in self._by_min]
+        self._by_max = sorted(intervals, key=lambda entry: entry[1])
+        self._maxs = [entry[1] for entry in self._by_max]
+
+    def __len__(self) -> int:
+        return len(self.plans)
+
+    def accepting_state(self, state: str) -> FrozenSet[int]:
+        accepting = self._accepting.get(state)
+        if accepting is None:
+            accepting = self._all - self._restricted_by_state.get(state, set())
+            self._accepting[state] = accepting
+        return accepting
+
+    def candidate_policies(self, borrower: "Borrower") -> Set[int]:
+        candidates = set(self.accepting_state(borrower.business_state))
+
+        naics = borrower.industry_naics
+        if naics and self._excluded_naics:
+            candidates -= self._excluded_naics.owners_of(str(naics))
+
+        tier = borrower.industry_tier
+        if tier and self._excluded_by_value:
+            excluded = self._excluded_by_value.get(tier.value)
+            if excluded:
+                candidates -= excluded
+
+        return candidates
+
+    def candidates(self, borrower: "Borrower") -> List[Tuple[CompiledPolicy, Tuple[CompiledProgram, ...]]]:
+        """(plan, programs) pairs worth evaluating, in policy and program order."""
+        policies = self.candidate_policies(borrower)
+        if not policies:
+            return []
+
+        programs: Dict[int, List[CompiledProgram]] = {}
+        for pos, program in self._programs_containing(borrower.loan_amount):
+            if pos in policies:
+                programs.setdefault(pos, []).append(program)
+
+        return [
+            (self.plans[pos], tuple(sorted(programs[pos], key=lambda program: program.index)))
+            for pos in sorted(programs)
+        ]
+
+    def _programs_containing(self, amount):
+        if amount is None or amount != amount:
+            return [(pos, program) for _, _, pos, program in self._by_min]
+
+        # Programs with min <= amount are a prefix of _by_min, programs with
+        # max >= amount a suffix of _by_max; scan the shorter side.
+        min_end = bisect_right(self._mins, amount)
+        max_start = bisect_left(self._maxs, amount)
+        if min_end <= len(self._maxs) - max_start:
+            return [
+                (pos, program) for _, max_amt, pos, program in self._by_min[:min_end]
+                if max_amt >= amount
+            ]
+        return [
+            (pos, program) for min_amt, _, pos, program in self._by_max[max_start:]
+            if min_amt <= amount
+        ]
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from app.matching_engine.compiler import NUMERIC_FIELDS, CompiledRule
+
+REFRESH_SECONDS = float(os.getenv("RULE_ORDER_REFRESH_SECONDS", "300"))
+# A fresh process computes its first rates as soon as this many checks are in.
+WARMUP_CHECKS = 1000
+MAX_ORDERS = 8192
+
+# Weight, in evaluations, of the field-wide rejection rate in a rule's estimate,
+# so a rule seen a handful of times is not ranked on noise.
+PRIOR_WEIGHT = 20.0
+# Floor for the rejection rate; a rule that never rejects still gets a finite rank.
+MIN_REJECT_RATE = 0.001
+
+_BOOLEAN_FIELDS = frozenset({'has_active_bankruptcy', 'has_unpaid_tax_liens', 'is_homeowner'})
+
+
+def rule_key(rule: CompiledRule) -> Tuple[str, str, str]:
+    """Identifies a rule across policies and plan recompiles."""
+    value = rule.value
+    if isinstance(value, (list, tuple, set, frozenset)):
+        value = sorted(str(v) for v in value)
+    return rule.field, rule.op, repr(value)
+
+
+def rule_cost(rule: CompiledRule) -> float:
+    """Relative cost of one check, by the comparison compile_comparison picked."""
+    if rule.target is not None and rule.field in NUMERIC_FIELDS:
+        return 1.0 if rule.field in _BOOLEAN_FIELDS else 1.2
+    if rule.target is not None:
+        # Mixed: float() attempt, then maybe the string comparison.
+        return 3.0
+    # str() of an enum value, then a string or set comparison.
+    return 2.0
+
+
+class RuleOrderer:
+    """Orders each program's strict rules by observed selectivity.
+
+    Strict rules are a conjunction of side-effect free tests, so any order
+    gives the same pass/fail; only the work done before the first failure
+    changes. Rules are ranked by cost / rejection rate, lowest first, where
+    the rate is what the engine saw when the rule was reached. Orders are
+    computed lazily per rules tuple from the stats of the last refresh and
+    recomputed every REFRESH_SECONDS.
+    """
+
+    def __init__(self, refresh_seconds: float = REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        # rule key / field -> [evaluations, rejections]
+        self._rule_counts: Dict[Tuple, List[int]] = {}
+        self._field_counts: Dict[str, List[int]] = {}
+        self._rates: Dict[Tuple, float] = {}
+        self._field_rates: Dict[str, float] = {}
+        self._checks = 0
+        self._orders: Dict[int, Tuple[Tuple[CompiledRule, ...], Tuple[CompiledRule, ...]]] = {}
+        self._refreshed_at = time.monotonic()
+
+    def order(self, rules: Tuple[CompiledRule, ...]) -> Tuple[CompiledRule, ...]:
+        if len(rules) < 2:
+            return rules
+        entry = self._orders.get(id(rules))
+        # The entry holds the source tuple, so its id cannot be reused while cached.
+        if entry is not None and entry[0] is rules:
+            return entry[1]
+
+        rates, field_rates = self._rates, self._field_rates
+        ranked = tuple(sorted(
+            rules,
+            key=lambda rule: rule_cost(rule) / rates.get(rule_key(rule), field_rates.get(rule.field, 0.5)),
+        ))
+        orders = self._orders
+        if len(orders) >= MAX_ORDERS:
+            orders.clear()
+        orders[id(rules)] = (rules, ranked)
+        return ranked
+
+    def record(self, outcomes: Dict[int, Tuple[Tuple[CompiledRule, ...], List[int]]]):
+        """Merges EngineStats.rule_outcomes: per evaluated rules tuple, how many
+        checks failed at each position (the last slot counts full passes)."""
+        if not outcomes:
+            return
+        with self._lock:
+            for rules, failed_at in outcomes.values():
+                reached = sum(failed_at)
+                self._checks += reached
+                for position, rule in enumerate(rules):
+                    if not reached:
+                        break
+                    rejected = failed_at[position]
+                    for counts in (
+                        self._rule_counts.setdefault(rule_key(rule), [0, 0]),
+                        self._field_counts.setdefault(rule.field, [0, 0]),
+                    ):
+                        counts[0] += reached
+                        counts[1] += rejected
+                    reached -= rejected
+        self.maybe_refresh()
+
+    def maybe_refresh(self):
+        if time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+            self.refresh()
+        elif not self._rates and self._checks >= WARMUP_CHECKS:
+            self.refresh()
+
+    def refresh(self):
+        """Recomputes rejection rates from the counts so far; orders follow lazily."""
+        with self._lock:
+            field_rates = {
+                field: (rejected + 1) / (evaluated + 2)
+                for field, (evaluated, rejected) in self._field_counts.items()
+            }
+            rates = {}
+            for key, (evaluated, rejected) in self._rule_counts.items():
+                prior = field_rates.get(key[0], 0.5)
+                rate = (rejected + PRIOR_WEIGHT * prior) / (evaluated + PRIOR_WEIGHT)
+                rates[key] = max(rate, MIN_REJECT_RATE)
+            self._rates = rates
+            self._field_rates = field_rates
+            self._orders = {}
+            self._refreshed_at = time.monotonic()
+
+    def selectivity(self) -> List[Tuple[Tuple, int, int]]:
+        """(rule key, evaluations, rejections), most rejecting first."""
+        with self._lock:
+            rows = [(key, counts[0], counts[1]) for key, counts in self._rule_counts.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._rule_counts.clear()
+            self._field_counts.clear()
+            self._rates = {}
+            self._field_rates = {}
+            self._checks = 0
+            self._orders = {}
+            self._refreshed_at = time.monotonic()
+
+
+rule_orderer = RuleOrderer()
+
@@ -0,0 +1,163 @@
+from enum import Enum
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Boolean, Float, Integer, and_, false, not_, or_, true
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.model import Borrower
+from app.matching_engine.compiler import CompiledPolicy, CompiledProgram, CompiledRule, is_iterable
+
+_RANGE_OPS = {
+    '>=': lambda col, t: col >= t,
+    '<=': lambda col, t: col <= t,
+    '>': lambda col, t: col > t,
+    '<': lambda col, t: col < t,
+}
+
+
+class Pushdown(NamedTuple):
+    """A WHERE clause on Borrower and whether it is exact.
+
+    An exact clause accepts precisely the borrowers the Python check accepts.
+    An inexact one only over-approximates (some rules were left to Python),
+    so it is safe to filter with but not to negate.
+    """
+    clause: ColumnElement
+    exact: bool
+
+
+def _all_of(parts: List[Pushdown]) -> Pushdown:
+    clauses = [part.clause for part in parts]
+    return Pushdown(and_(true(), *clauses), all(part.exact for part in parts))
+
+
+def _column(field: str):
+    return Borrower.__table__.columns.get(field)
+
+
+def rule_clause(rule: "CompiledRule") -> Pushdown:
+    """Strict rule as SQL. A missing (NULL) value fails, as in the engine."""
+    column = _column(rule.field)
+    if column is None:
+        return Pushdown(false(), True)
+    attr = getattr(Borrower, rule.field)
+
+    enum_class = getattr(column.type, 'enum_class', None)
+    if enum_class is not None:
+        return _domain_clause(attr, rule, list(enum_class))
+    if isinstance(column.type, Boolean):
+        return _domain_clause(attr, rule, [True, False])
+
+    if isinstance(column.type, (Integer, Float)):
+        return _numeric_clause(attr, rule)
+    return _string_clause(attr, rule)
+
+
+def _domain_clause(attr, rule: "CompiledRule", domain: list) -> Pushdown:
+    passing = [
+        member for member in domain
+        if rule.test(member.value if isinstance(member, Enum) else member)
+    ]
+    if not passing:
+        return Pushdown(false(), True)
+    if len(passing) == len(domain):
+        return Pushdown(attr.isnot(None), True)
+    # Identity, not equality: IntEnum members compare equal to True and False.
+    if len(passing) == 1 and passing[0] is True:
+        return Pushdown(attr.is_(True), True)
+    if len(passing) == 1 and passing[0] is False:
+        return Pushdown(attr.is_(False), True)
+    return Pushdown(attr.in_(passing), True)
+
+
+def _numeric_clause(attr, rule: "CompiledRule") -> Pushdown:
+    target = rule.target
+    if target is None:
+        if rule.op in _RANGE_OPS:
+            return Pushdown(false(), True)
+        return Pushdown(true(), False)
+
+    range_op = _RANGE_OPS.get(rule.op)
+    if range_op is not None:
+        return Pushdown(range_op(attr, target), True)
+    if rule.op == '==':
+        # The engine compares with a 0.001 tolerance in binary floating point;
+        # a slightly wider window in SQL never drops a borrower it accepts.
+        return Pushdown(attr.between(target - 0.0011, target + 0.0011), False)
+    if rule.op in ('in', 'not_in', 'not in'):
+        return Pushdown(false(), True)
+    return Pushdown(true(), False)
+
+
+def _string_clause(attr, rule: "CompiledRule") -> Pushdown:
+    if rule.target is not None:
+        # Numeric-looking thresholds on text columns go through float() first
+        # in the engine; leave them to Python.
+        return Pushdown(true(), False)
+
+    if rule.op == '==':
+        return Pushdown(attr == str(rule.value), True)
+    if rule.op == '!=':
+        return Pushdown(attr != str(rule.value), True)
+    if rule.op in ('in', 'not_in', 'not in'):
+        if not is_iterable(rule.value):
+            return Pushdown(false(), True)
+        members = sorted({str(v) for v in rule.value})
+        if rule.op == 'in':
+            return Pushdown(attr.in_(members), True) if members else Pushdown(false(), True)
+        return Pushdown(attr.notin_(members), True) if members else Pushdown(attr.isnot(None), True)
+    return Pushdown(false(), True)
+
+
+def program_clause(program: "CompiledProgram") -> Pushdown:
+    parts = [Pushdown(Borrower.loan_amount >= program.min_loan_amount, True)]
+    if program.max_loan_amount != float('inf'):
+        parts.append(Pushdown(Borrower.loan_amount <= program.max_loan_amount, True))
+    parts.extend(rule_clause(rule) for rule in program.strict_rules)
+    return _all_of(parts)
+
+
+def _minimal_prefixes(codes) -> List[str]:
+    """Drops codes already covered by a shorter excluded prefix."""
+    kept: List[str] = []
+    for code in sorted(set(codes)):
+        if not kept or not code.startswith(kept[-1]):
+            kept.append(code)
+    return kept
+
+
+def global_clause(plan: "CompiledPolicy") -> Pushdown:
+    parts = []
+    if plan.restricted_states:
+        parts.append(Pushdown(Borrower.business_state.notin_(sorted(plan.restricted_states)), True))
+
+    prefixes = _minimal_prefixes(plan.excluded_industries)
+    if prefixes:
+        naics = Borrower.industry_naics
+        parts.append(Pushdown(or_(
+            naics.is_(None),
+            naics == '',
+            not_(or_(*[naics.startswith(code, autoescape=True) for code in prefixes])),
+        ), True))
+
+    tier_enum = Borrower.__table__.columns['industry_tier'].type.enum_class
+    excluded_tiers = [tier for tier in tier_enum if tier.value in plan.excluded_values]
+    if excluded_tiers:
+        tier = Borrower.industry_tier
+        parts.append(Pushdown(or_(tier.is_(None), tier.notin_(excluded_tiers)), True))
+
+    return _all_of(parts)
+
+
+def policy_clause(plan: "CompiledPolicy", programs: Optional[Tuple["CompiledProgram", ...]] = None) -> Pushdown:
+    """Borrowers that pass the global filters and at least one program."""
+    programs = plan.programs if programs is None else programs
+    if not programs:
+        return Pushdown(false(), True)
+
+    program_parts = [program_clause(program) for program in programs]
+    global_part = global_clause(plan)
+    return Pushdown(
+        and_(global_part.clause, or_(*[part.clause for part in program_parts])),
+        global_part.exact and all(part.exact for part in program_parts),
+    )
@@ -0,0 +1,41 @@
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+from app.core.metrics import BORROWERS_SCANNED, HARD_REJECTIONS, MATCHES_FOUND, PROGRAMS_EVALUATED
+from app.matching_engine.rule_order import rule_orderer
+
+
+class EngineStats:
+    """Plain counters the engine bumps in its loops; flush() moves them to
+    the shared metrics once per entry-point call instead of per borrower."""
+
+    __slots__ = ("borrowers_scanned", "programs_evaluated", "rejections", "matches", "rule_outcomes")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.borrowers_scanned = 0
+        self.programs_evaluated = 0
+        self.rejections: Dict[str, int] = defaultdict(int)
+        self.matches = 0
+        # id(rules) -> (rules, checks failing at each position; last slot: passed)
+        self.rule_outcomes: Dict[int, Tuple[Tuple, List[int]]] = {}
+
+    def record_rules(self, rules: Sequence, position: int, count: int = 1):
+        entry = self.rule_outcomes.get(id(rules))
+        if entry is None:
+            entry = self.rule_outcomes[id(rules)] = (rules, [0] * (len(rules) + 1))
+        entry[1][position] += count
+
+    def flush(self, entry: str):
+        if self.borrowers_scanned:
+            BORROWERS_SCANNED.labels(entry).inc(self.borrowers_scanned)
+        if self.programs_evaluated:
+            PROGRAMS_EVALUATED.inc(self.programs_evaluated)
+        for field, count in self.rejections.items():
+            HARD_REJECTIONS.labels(field).inc(count)
+        if self.matches:
+            MATCHES_FOUND.labels(entry).inc(self.matches)
+        rule_orderer.record(self.rule_outcomes)
+        self.reset()
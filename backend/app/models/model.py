@@ -1,7 +1,7 @@
 import uuid
 import enum
 from sqlalchemy.dialects.postgresql import JSONB, UUID
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, func, Float, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, func, Float, Index, UniqueConstraint, Enum as SQLEnum
 from sqlalchemy.orm import declarative_base, relationship
 
 from app.core.constants import (
@@ -22,11 +22,14 @@ class MatchTier(str, enum.Enum):
 
 class LoanMatch(Base):
     __tablename__ = "loan_matches"
+    __table_args__ = (
+        UniqueConstraint("lender_id", "borrower_id", name="uq_loan_matches_lender_borrower"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
     lender_id = Column(UUID(as_uuid=True), ForeignKey("lenders.id"), nullable=False)
-    borrower_id = Column(Integer, ForeignKey("borrowers.id"), nullable=False)
+    borrower_id = Column(Integer, ForeignKey("borrowers.id"), nullable=False, index=True)
 
     match_score = Column(Float) 
     match_tier = Column(SQLEnum(MatchTier), nullable=False, index=True)
@@ -47,6 +50,10 @@ class Lender(Base):
     email = Column(String, unique=True, nullable=False, index=True)
     is_verified = Column(Boolean, default=False, index=True)
     created_at = Column(DateTime, server_default=func.now())
+    # The LenderPolicy the stored LoanMatch rows were computed from; the lender
+    # rematch diffs against it. Not a foreign key: NULL or an id missing from
+    # the history means a full rematch.
+    matched_policy_id = Column(UUID(as_uuid=True), nullable=True)
     
     policies = relationship("LenderPolicy", back_populates="lender", cascade="all, delete-orphan")
     matches = relationship("LoanMatch", back_populates="lender", cascade="all, delete-orphan")
@@ -76,13 +83,13 @@ class Borrower(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     full_name = Column(String, nullable=False)
-    email = Column(String, nullable=False, index=True)
+    email = Column(String, nullable=False, unique=True, index=True)
     mobile_no = Column(String, nullable=False)
     
     business_name = Column(String, nullable=False)
     dba_name = Column(String, nullable=True)
     
-    business_state = Column(String(2), nullable=False) 
+    business_state = Column(String(2), nullable=False, index=True)
     zip_code = Column(String(10), nullable=True)
     
     years_in_business = Column(Float, nullable=False) 
@@ -101,7 +108,7 @@ class Borrower(Base):
     
     dscr_ratio = Column(Float, default=1.0) 
 
-    guarantor_fico = Column(Integer, nullable=False) 
+    guarantor_fico = Column(Integer, nullable=False, index=True)
 
     ownership_percentage = Column(Float, nullable=False, default=100.0)
     
@@ -117,7 +124,7 @@ class Borrower(Base):
 
     paynet_score = Column(Integer, nullable=True)
     
-    loan_amount = Column(Float, nullable=False) 
+    loan_amount = Column(Float, nullable=False, index=True)
     
     ltv_ratio = Column(Float, default=100.0) 
 
@@ -131,4 +138,19 @@ class Borrower(Base):
 
     equipment_location_state = Column(String(2), nullable=True)
 
-    matches = relationship("LoanMatch", back_populates="borrower", cascade="all, delete-orphan")
\ No newline at end of file
+    matches = relationship("LoanMatch", back_populates="borrower", cascade="all, delete-orphan")
+
+
+# Schema changes go through Alembic (backend/migrations); keep these in step
+# with the latest revision.
+Index(
+    "ix_loan_matches_lender_active_score",
+    LoanMatch.lender_id, LoanMatch.match_score.desc(), LoanMatch.borrower_id.desc(),
+    postgresql_where=LoanMatch.is_active == True
+)
+Index(
+    "ix_lender_policies_lender_active",
+    LenderPolicy.lender_id,
+    postgresql_where=LenderPolicy.is_active == True
+)
+Index("ix_lender_policies_lender_updated", LenderPolicy.lender_id, LenderPolicy.updated_at.desc())
@@ -1,8 +1,18 @@
 import os
 import redis.asyncio as redis
+import redis as redis_sync
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://cache:6379/0")
 
+_sync_client = None
+
 async def init_redis():
     client = redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
-    return client
\ No newline at end of file
+    return client
+
+def get_sync_redis():
+    """Blocking client shared by sync routes and the match worker threads."""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis_sync.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+    return _sync_client
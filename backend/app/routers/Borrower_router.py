@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+import json
+from typing import Any, Dict, List
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, status, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.schemas.borrower import BorrowerCreate, ApplicationResponse
-from app.services.crud import BorrowerCRUD
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_async_db
+from app.schemas.borrower import BorrowerCreate, ApplicationResponse, BulkApplicationResponse
+from app.services.crud import AsyncBorrowerCRUD, BorrowerCRUD
 from app.matching_engine.engine import CreditMatchingEngine
-from app.services.borrower_task import run_matching_service
+from app.services.borrower_task import run_matching_service, run_batch_matching_service
+from app.services.match_queue import BORROWER, enqueue_match_job, enqueue_borrower_batch
+from app.redis_client import get_sync_redis
 
 router = APIRouter(
     prefix="/borrowers",
     tags=["Borrower Applications"]
 )
 
+BULK_MAX_APPLICATIONS = 10_000
+
 @router.post("/apply", response_model=ApplicationResponse, status_code=status.HTTP_201_CREATED)
 def submit_loan_application(
     application_data: BorrowerCreate,
@@ -24,7 +33,11 @@ def submit_loan_application(
         
         new_borrower = result["borrower"]
 
-        background_task.add_task(run_matching_service, new_borrower.id)
+        try:
+            enqueue_match_job(get_sync_redis(), BORROWER, new_borrower.id)
+        except Exception as e:
+            print(f"Match queue unavailable, matching Borrower {new_borrower.id} in-process: {e}")
+            background_task.add_task(run_matching_service, new_borrower.id)
         return {
             "success": True,
             "message": "Application received. We are now matching you with lenders.",
@@ -36,4 +49,124 @@ def submit_loan_application(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An error occurred processing your application: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+def _validate_application(index: int, raw: Any, valid: List[BorrowerCreate], rejected: List[Dict[str, Any]]):
+    try:
+        valid.append(BorrowerCreate.model_validate(raw))
+    except ValidationError as e:
+        rejected.append({
+            "index": index,
+            "errors": [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()]
+        })
+
+
+def _queue_batch_matching(borrower_ids: List[int], background_task: BackgroundTasks):
+    if not borrower_ids:
+        return
+    try:
+        enqueue_borrower_batch(get_sync_redis(), borrower_ids)
+    except Exception as e:
+        print(f"Match queue unavailable, matching {len(borrower_ids)} borrowers in-process: {e}")
+        background_task.add_task(run_batch_matching_service, borrower_ids)
+
+
+def _bulk_response(received: int, borrower_ids: List[int], rejected: List[Dict[str, Any]]):
+    return {
+        "success": not rejected,
+        "message": f"{len(borrower_ids)} of {received} applications received. Matching runs in the background.",
+        "received": received,
+        "accepted": len(borrower_ids),
+        "borrower_ids": borrower_ids,
+        "rejected": rejected
+    }
+
+
+@router.post("/apply-bulk", response_model=BulkApplicationResponse, status_code=status.HTTP_201_CREATED)
+def submit_bulk_applications(
+    background_task: BackgroundTasks,
+    applications: List[Dict[str, Any]] = Body(...),
+    db: Session = Depends(get_db)
+):
+    """Up to BULK_MAX_APPLICATIONS applications in one call. Invalid entries
+    are reported by position; the valid ones are upserted by email and
+    matched as one batch."""
+    if len(applications) > BULK_MAX_APPLICATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_MAX_APPLICATIONS} applications per request; use /borrowers/apply-bulk/stream."
+        )
+
+    valid: List[BorrowerCreate] = []
+    rejected: List[Dict[str, Any]] = []
+    for index, raw in enumerate(applications):
+        _validate_application(index, raw, valid, rejected)
+
+    try:
+        borrower_ids = BorrowerCRUD(db).register_bulk(valid)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred processing your applications: {str(e)}"
+        )
+
+    _queue_batch_matching(borrower_ids, background_task)
+    return _bulk_response(len(applications), borrower_ids, rejected)
+
+
+@router.post("/apply-bulk/stream", response_model=BulkApplicationResponse, status_code=status.HTTP_201_CREATED)
+async def submit_bulk_applications_stream(
+    request: Request,
+    background_task: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """NDJSON body, one application per line, of any length. Applications are
+    upserted and queued for matching every BULK_CHUNK_SIZE lines while the
+    body is still streaming in."""
+    crud = AsyncBorrowerCRUD(db)
+    valid: List[BorrowerCreate] = []
+    rejected: List[Dict[str, Any]] = []
+    borrower_ids: List[int] = []
+    received = 0
+
+    async def flush():
+        ids = await crud.register_bulk(valid[:])
+        valid.clear()
+        borrower_ids.extend(ids)
+        await run_in_threadpool(_queue_batch_matching, ids, background_task)
+
+    def handle(line: bytes):
+        nonlocal received
+        line = line.strip()
+        if not line:
+            return
+        index = received
+        received += 1
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            rejected.append({"index": index, "errors": [f"invalid JSON: {e}"]})
+            return
+        _validate_application(index, raw, valid, rejected)
+
+    try:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                handle(line)
+            if len(valid) >= BorrowerCRUD.BULK_CHUNK_SIZE:
+                await flush()
+        handle(buffer)
+        if valid:
+            await flush()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred after {len(borrower_ids)} applications: {str(e)}"
+        )
+
+    return _bulk_response(received, borrower_ids, rejected)
+
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Request
+
+from app.core.db_pool import pool_stats
+from app.services.match_queue import EXTRACTION_QUEUE, queue_stats
+
+router = APIRouter(prefix="/internal", tags=["Internal"])
+
+
+@router.get("/match-queue")
+async def get_match_queue_stats(request: Request):
+    stats = await queue_stats(request.app.state.redis)
+    stats["extraction"] = await queue_stats(request.app.state.redis, EXTRACTION_QUEUE)
+    return stats
+
+
+@router.get("/db-pool")
+def get_db_pool_stats():
+    return {"pools": pool_stats()}
+
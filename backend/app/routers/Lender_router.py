@@ -1,27 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, BackgroundTasks
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, BackgroundTasks, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
+import base64
+import json
 import random
-import shutil
 import os
 
-from app.database import get_db
-from app.services.crud import LenderCRUD
+from app.database import get_db, get_async_db
+from app.services.crud import AsyncLenderCRUD
 from app.schemas.lender import LenderPolicyCreate, LenderAccountSchema, VerifyOTPRequest, LoginRequest
-from app.services.pipeline import DataCleaner 
-from app.services.extractor import extract_policy    
+from app.services.pdf_parser import BACKENDS as PDF_BACKENDS
+from app.services.extraction_jobs import (
+    FINISHED,
+    create_batch_job,
+    create_job as create_extraction_job,
+    events_channel,
+    get_job,
+    new_upload_path,
+)
 from app.services.email_service import send_email
 from app.services.lender_task import run_matching_service
+from app.services.policy_cache import publish_policy_change
+from app.services.match_queue import LENDER, enqueue_match_job_async
+from app.services.match_index import MatchIndex, match_rows
+from app.redis_client import get_sync_redis
 from app.schemas.lender import LenderMatchResponse
 from app.models.model import LoanMatch, Borrower, MatchTier
 from app.schemas.borrower import BorrowerResponse
 
 router = APIRouter(prefix="/lenders", tags=["Lender Applications"])
 
+MATCHES_PAGE_SIZE = 50
+MATCHES_MAX_PAGE_SIZE = 500
+
+PDF_UPLOAD_MAX_BYTES = int(os.getenv("PDF_UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+EXTRACTION_BATCH_MAX_FILES = int(os.getenv("EXTRACTION_BATCH_MAX_FILES", "20"))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+SSE_KEEPALIVE_SECONDS = 15
+
 
 @router.post("/register")
-async def register_lender(data: LenderAccountSchema, request: Request, db: Session = Depends(get_db)):
-    check = LenderCRUD(db).get_lender_by_email(data.email)
+async def register_lender(data: LenderAccountSchema, request: Request, db: AsyncSession = Depends(get_async_db)):
+    check = await AsyncLenderCRUD(db).get_lender_by_email(data.email)
     if check:
         return {"status": "failed", "message": "Lender with this email already exists."}
 
@@ -46,7 +70,7 @@ async def register_lender(data: LenderAccountSchema, request: Request, db: Sessi
 
 
 @router.post("/verify-otp")
-async def verify_otp(data: VerifyOTPRequest, request: Request, db: Session = Depends(get_db)):
+async def verify_otp(data: VerifyOTPRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
     redis = request.app.state.redis
     
     stored_otp = await redis.get(f"otp:{data.email}")
@@ -62,8 +86,8 @@ async def verify_otp(data: VerifyOTPRequest, request: Request, db: Session = Dep
     await redis.delete(f"lender_name:{data.email}")
 
     try:
-        crud = LenderCRUD(db)
-        lender = crud.register_lender(lender_name, data.email)
+        crud = AsyncLenderCRUD(db)
+        lender = await crud.register_lender(lender_name, data.email)
 
         send_email(data.email, "Welcome!", f"Hi {lender_name}, your account is active.")
 
@@ -79,8 +103,8 @@ async def verify_otp(data: VerifyOTPRequest, request: Request, db: Session = Dep
 
 
 @router.post("/login")
-async def login_lender(data: LoginRequest, request: Request, db: Session = Depends(get_db)):
-    lender = LenderCRUD(db).get_lender_by_email(data.email)
+async def login_lender(data: LoginRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
+    lender = await AsyncLenderCRUD(db).get_lender_by_email(data.email)
     if not lender:
         raise HTTPException(status_code=404, detail="Lender not found")
     
@@ -96,14 +120,14 @@ async def login_lender(data: LoginRequest, request: Request, db: Session = Depen
 
 
 @router.post("/login-verify")
-async def login_verify(data: VerifyOTPRequest, request: Request, db: Session = Depends(get_db)):
+async def login_verify(data: VerifyOTPRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
     redis = request.app.state.redis
     stored_otp = await redis.get(f"otp:{data.email}")
     
     # if stored_otp != data.code:
     #     raise HTTPException(status_code=400, detail="Invalid or expired OTP.")
     
-    lender = LenderCRUD(db).get_lender_by_email(data.email)
+    lender = await AsyncLenderCRUD(db).get_lender_by_email(data.email)
     await redis.delete(f"otp:{data.email}")
     
     return {
@@ -115,8 +139,8 @@ async def login_verify(data: VerifyOTPRequest, request: Request, db: Session = D
 
 
 @router.get("/{lender_id}/current-policy")
-async def get_current_policy(lender_id: str, db: Session = Depends(get_db)):
-    policy = LenderCRUD(db).get_active_policy(lender_id)
+async def get_current_policy(lender_id: str, db: AsyncSession = Depends(get_async_db)):
+    policy = await AsyncLenderCRUD(db).get_active_policy(lender_id)
     if not policy:
         raise HTTPException(status_code=404, detail="No active policy found.")
     
@@ -140,16 +164,22 @@ async def update_lender_policy(
     lender_id: str,
     policy_data: LenderPolicyCreate,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
     print(f"Policy Update Received for {lender_id}")
     
     try:
-        new_policy = LenderCRUD(db).update_policy(lender_id, policy_data)
+        new_policy = await AsyncLenderCRUD(db).update_policy(lender_id, policy_data)
+        await publish_policy_change(request.app.state.redis, lender_id)
         
         status_msg = "ACTIVE" if new_policy.is_active else "INACTIVE (No Programs Defined)"
 
-        background_tasks.add_task(run_matching_service, new_policy.id)
+        try:
+            await enqueue_match_job_async(request.app.state.redis, LENDER, lender_id)
+        except Exception as e:
+            print(f"Match queue unavailable, matching Policy {new_policy.id} in-process: {e}")
+            background_tasks.add_task(run_matching_service, new_policy.id)
 
         return {
             "status": "success",
@@ -164,76 +194,206 @@ async def update_lender_policy(
 
 
 @router.get("/{lender_id}/policy-history")
-async def get_policy_history(lender_id: str, db: Session = Depends(get_db)):
+async def get_policy_history(lender_id: str, db: AsyncSession = Depends(get_async_db)):
     print("debug-history")
-    history = LenderCRUD(db).get_policy_history(lender_id)
+    history = await AsyncLenderCRUD(db).get_policy_history(lender_id)
     return history
 
 
 
-@router.post("/{lender_id}/extract-clean-pdf")
-async def extract_and_clean_pdf(lender_id: str, file: UploadFile = File(...)):
-    temp_path = f"temp_{file.filename}"
+@router.post("/{lender_id}/extract-clean-pdf", status_code=202)
+async def extract_and_clean_pdf(
+    lender_id: str,
+    request: Request,
+    file: UploadFile = File(...),
+    backend: Optional[str] = Query(None, description="PDF parser: pymupdf or pdfplumber (default: server setting)"),
+):
+    """Queues the extraction and returns its job; poll the status URL or
+    follow the events stream for the cleaned policy."""
+    _check_backend(backend)
+    temp_path = await _save_upload(file, new_upload_path())
     try:
-        with open(temp_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-        
-        raw_schema = extract_policy(temp_path)
-        raw_dict = raw_schema.model_dump(exclude_none=True)
-        cleaner = DataCleaner(raw_dict)
-        cleaned_data = cleaner.normalize() 
-        cleaned_data["lender_name"] = raw_schema.lender_name
-        final_policy = LenderPolicyCreate.model_validate(cleaned_data)
-        
-        return final_policy
+        job = await create_extraction_job(request.app.state.redis, lender_id, temp_path, backend)
+    except Exception as e:
+        print(f"Extraction Error: {e}")
+        os.remove(temp_path)
+        raise HTTPException(status_code=503, detail="Could not queue the extraction")
+    return _with_job_urls(lender_id, job)
+
 
+@router.post("/{lender_id}/extract-clean-pdfs", status_code=202)
+async def extract_and_clean_pdfs(
+    lender_id: str,
+    request: Request,
+    files: List[UploadFile] = File(...),
+    backend: Optional[str] = Query(None, description="PDF parser: pymupdf or pdfplumber (default: server setting)"),
+):
+    """Queues one job extracting every file and merging them into a single
+    policy; where documents disagree, earlier files win ties. The job status
+    lists every file with its stage timings."""
+    _check_backend(backend)
+    if len(files) > EXTRACTION_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {EXTRACTION_BATCH_MAX_FILES} files per batch")
+
+    uploads = []
+    try:
+        for file in files:
+            uploads.append((file.filename, await _save_upload(file, new_upload_path())))
+    except BaseException:
+        for _, path in uploads:
+            os.remove(path)
+        raise
+    try:
+        job = await create_batch_job(request.app.state.redis, lender_id, uploads, backend)
     except Exception as e:
         print(f"Extraction Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-        
+        for _, path in uploads:
+            os.remove(path)
+        raise HTTPException(status_code=503, detail="Could not queue the extraction")
+    return _with_job_urls(lender_id, job)
+
+
+def _check_backend(backend: Optional[str]):
+    if backend is not None and backend not in PDF_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown PDF backend; expected one of {', '.join(sorted(PDF_BACKENDS))}")
+
+
+def _with_job_urls(lender_id: str, job: dict) -> dict:
+    job["status_url"] = f"/lenders/{lender_id}/extraction-jobs/{job['job_id']}"
+    job["events_url"] = f"{job['status_url']}/events"
+    return job
+
+
+@router.get("/{lender_id}/extraction-jobs/{job_id}")
+async def get_extraction_job(lender_id: str, job_id: str, request: Request):
+    job = await get_job(request.app.state.redis, job_id)
+    if job is None or job["lender_id"] != lender_id:
+        raise HTTPException(status_code=404, detail="Extraction job not found")
+    return job
+
+
+@router.get("/{lender_id}/extraction-jobs/{job_id}/events")
+async def stream_extraction_job(lender_id: str, job_id: str, request: Request):
+    """Server-sent events: the job status now and after every stage change,
+    until it is done or failed."""
+    redis = request.app.state.redis
+    pubsub = redis.pubsub()
+    # Subscribe before the first read so no update falls in between.
+    await pubsub.subscribe(events_channel(job_id))
+    job = await get_job(redis, job_id)
+    if job is None or job["lender_id"] != lender_id:
+        await pubsub.aclose()
+        raise HTTPException(status_code=404, detail="Extraction job not found")
+
+    async def events():
+        try:
+            status = job
+            yield f"data: {json.dumps(status)}\n\n"
+            while status["status"] not in FINISHED and not await request.is_disconnected():
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_KEEPALIVE_SECONDS)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                status = json.loads(message["data"])
+                yield f"data: {message['data']}\n\n"
+        finally:
+            await pubsub.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+async def _save_upload(file: UploadFile, temp_path: str) -> str:
+    """Streams the upload to `temp_path` in chunks, so no PDF is held in memory."""
+    size = 0
+    try:
+        with open(temp_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > PDF_UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail="PDF is too large")
+                await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        os.remove(temp_path)
+        raise
     finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        await file.close()
+    return temp_path
 
 
 @router.delete("/{lender_id}")
-async def delete_lender(lender_id: str, db: Session = Depends(get_db)):
-    success = LenderCRUD(db).delete_lender(lender_id)
+async def delete_lender(lender_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    success = await AsyncLenderCRUD(db).delete_lender(lender_id)
     if not success:
         raise HTTPException(status_code=404, detail="Lender not found")
+    await publish_policy_change(request.app.state.redis, lender_id)
     return {"message": "Lender deactivated successfully"}
 
 
 
-@router.get("/{lender_id}/matches", response_model=List[LenderMatchResponse])
-def get_lender_matches(lender_id: str, db: Session = Depends(get_db)):
-    matches = (
-        db.query(LoanMatch)
-        .options(joinedload(LoanMatch.borrower)) 
-        .filter(
-            LoanMatch.lender_id == lender_id,
-            LoanMatch.is_active == True
-        )
-        .order_by(LoanMatch.match_score.desc()) 
-        .all()
-    )
+def _encode_cursor(row) -> str:
+    return base64.urlsafe_b64encode(f"{row['score']!r}:{row['borrower_id']}".encode()).decode()
 
-    results = []
-    for match in matches:
-        status_label = _map_tier_to_label(match.match_tier)
-        
-        reason_text = f"Fits '{match.matched_program_name}' program"
 
-        results.append(LenderMatchResponse(
-            id=match.id,
-            borrower_id=match.borrower_id,
-            name=match.borrower.business_name,
-            amount=match.borrower.loan_amount,
-            status=status_label,
-            reason=reason_text
-        ))
+def _decode_cursor(cursor: str):
+    try:
+        score, borrower_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return float(score), int(borrower_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    return results
+
+@router.get("/{lender_id}/matches", response_model=List[LenderMatchResponse])
+def get_lender_matches(
+    lender_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(MATCHES_PAGE_SIZE, ge=1, le=MATCHES_MAX_PAGE_SIZE),
+    tier: Optional[List[MatchTier]] = Query(None),
+    min_score: Optional[float] = None,
+    program: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """One page of matches, best first. The cursor for the next page is
+    returned in the X-Next-Cursor header; it is absent on the last page."""
+    after = _decode_cursor(cursor) if cursor else None
+
+    # The Redis index only knows score order, so tier/program filters and
+    # pages it cannot locate are read from Postgres.
+    rows = None
+    if not tier and program is None:
+        index = MatchIndex(get_sync_redis())
+        try:
+            rows = index.read(lender_id, after=after, limit=limit + 1, min_score=min_score)
+            if rows is None and after is None:
+                generation = index.generation(lender_id)
+                index.rebuild(lender_id, match_rows(db, lender_id), generation)
+        except RedisError as e:
+            print(f"Match index unavailable for Lender {lender_id}: {e}")
+
+    if rows is None:
+        rows = match_rows(
+            db, lender_id, after=after, limit=limit + 1,
+            min_score=min_score, tiers=tier, program=program
+        )
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+
+    return JSONResponse(
+        content=[
+            {
+                "id": row["id"],
+                "borrower_id": row["borrower_id"],
+                "name": row["name"],
+                "amount": row["amount"],
+                "status": _TIER_LABELS.get(row["tier"], "Match"),
+                "reason": f"Fits '{row['program']}' program",
+            }
+            for row in rows
+        ],
+        headers=headers
+    )
 
 def _map_tier_to_label(tier: MatchTier) -> str:
     mapping = {
@@ -245,6 +405,9 @@ def _map_tier_to_label(tier: MatchTier) -> str:
     return mapping.get(tier, "Match")
 
 
+_TIER_LABELS = {tier.name: _map_tier_to_label(tier) for tier in MatchTier}
+
+
 
 @router.get("/{lender_id}/borrower/{borrower_id}", response_model=BorrowerResponse)
 def get_matched_borrower_details(
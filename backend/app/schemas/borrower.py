@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from app.core.constants import (
     EntityType, 
@@ -63,4 +63,16 @@ class ApplicationResponse(BaseModel):
     success: bool
     message: str
     matches_count: int
-    note: Optional[str] = None
\ No newline at end of file
+    note: Optional[str] = None
+
+class BulkRejectedApplication(BaseModel):
+    index: int
+    errors: List[str]
+
+class BulkApplicationResponse(BaseModel):
+    success: bool
+    message: str
+    received: int
+    accepted: int
+    borrower_ids: List[int]
+    rejected: List[BulkRejectedApplication]
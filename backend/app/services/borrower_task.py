@@ -1,34 +1,96 @@
-from app.database import SessionLocal
-from app.models.model import Borrower, LenderPolicy, LoanMatch
+from typing import List
+from app.core.metrics import MATCHES_WRITTEN, TASK_SECONDS, TASKS, stage
+from app.database import BatchSessionLocal
+from app.models.model import Borrower
 from app.matching_engine.engine import CreditMatchingEngine
+from app.redis_client import get_sync_redis
+from app.services.match_index import sync_borrower_fields, sync_match_index
+from app.services.match_store import MatchStore
+from app.services.policy_cache import active_policy_cache
 
 def run_matching_service(borrower_id: int):
-    db = SessionLocal()
+    db = BatchSessionLocal()
     engine = CreditMatchingEngine()
+    task = "borrower"
     
     try:
-        borrower = db.query(Borrower).filter(Borrower.id == borrower_id).first()
-        if not borrower:
-            return
+        with TASK_SECONDS.labels(task).time():
+            borrower = db.query(Borrower).filter(Borrower.id == borrower_id).first()
+            if not borrower:
+                TASKS.labels(task, "skipped").inc()
+                return
 
-        num_deleted = db.query(LoanMatch).filter(LoanMatch.borrower_id == borrower_id).delete()
-        
-        if num_deleted > 0:
-            print(f"Cleaned up {num_deleted} stale matches for Borrower {borrower_id}")
+            with stage(task, "load_policies"):
+                index = active_policy_cache.get_index(db)
+            with stage(task, "match"):
+                matches = engine.run_engine_for_borrower(borrower, index.policies, index=index)
 
-        active_policies = db.query(LenderPolicy).filter(LenderPolicy.is_active == True).all()
-        matches = engine.run_engine_for_borrower(borrower, active_policies)
+            store = MatchStore(db)
+            with stage(task, "persist"):
+                upserted, num_deleted = store.replace_for_borrower(borrower_id, matches)
+            if num_deleted > 0:
+                print(f"Cleaned up {num_deleted} stale matches for Borrower {borrower_id}")
 
-        if matches:
-            db.bulk_save_objects(matches)
-            print(f"SUCCESS: Matched Borrower {borrower_id} with {len(matches)} lenders.")
-        else:
-            print(f"Borrower {borrower_id} processed. No matches found.")
+            if matches:
+                print(f"SUCCESS: Matched Borrower {borrower_id} with {len(matches)} lenders.")
+            else:
+                print(f"Borrower {borrower_id} processed. No matches found.")
 
-        db.commit()
+            with stage(task, "commit"):
+                db.commit()
+            with stage(task, "index_sync"):
+                sync_match_index(get_sync_redis(), db, store.upserted_pairs, store.deleted_pairs)
+                sync_borrower_fields(get_sync_redis(), [borrower], matches, store.upserted_pairs)
+        _record_written(task, upserted, num_deleted)
 
     except Exception as e:
         print(f"Background Task Error: {e}")
+        TASKS.labels(task, "error").inc()
         db.rollback()
+        raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def run_batch_matching_service(borrower_ids: List[int]):
+    """Matches a batch of borrowers (bulk intake) in one pass over the active policies."""
+    db = BatchSessionLocal()
+    engine = CreditMatchingEngine()
+    task = "borrower_batch"
+
+    try:
+        with TASK_SECONDS.labels(task).time():
+            borrowers = db.query(Borrower).filter(Borrower.id.in_(borrower_ids)).all()
+            if not borrowers:
+                TASKS.labels(task, "skipped").inc()
+                return
+
+            with stage(task, "load_policies"):
+                index = active_policy_cache.get_index(db)
+            with stage(task, "match"):
+                matches = engine.run_engine_for_borrowers(borrowers, index)
+
+            store = MatchStore(db)
+            with stage(task, "persist"):
+                upserted, num_deleted = store.replace_for_borrowers([b.id for b in borrowers], matches)
+            with stage(task, "commit"):
+                db.commit()
+            with stage(task, "index_sync"):
+                sync_match_index(get_sync_redis(), db, store.upserted_pairs, store.deleted_pairs)
+                sync_borrower_fields(get_sync_redis(), borrowers, matches, store.upserted_pairs)
+        _record_written(task, upserted, num_deleted)
+        print(f"SUCCESS: Matched {len(borrowers)} borrowers: {len(matches)} matches, {upserted} new or changed, {num_deleted} removed.")
+
+    except Exception as e:
+        print(f"Batch Matching Error: {e}")
+        TASKS.labels(task, "error").inc()
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _record_written(task: str, upserted: int, deleted: int):
+    TASKS.labels(task, "success").inc()
+    MATCHES_WRITTEN.labels(task, "upserted").inc(upserted)
+    MATCHES_WRITTEN.labels(task, "deleted").inc(deleted)
@@ -0,0 +1,251 @@
+"""Map-reduce policy extraction for guideline PDFs too long for one prompt.
+
+The parsed document is packed page by page into chunks of at most
+EXTRACTION_CHUNK_CHARS characters (text plus table JSON, tables travelling
+with their page). Every chunk is extracted on its own, at most
+EXTRACTION_LLM_CONCURRENCY calls at a time across the process, and the
+partial policies are merged:
+
+- programs are matched by normalized name, rules by (field, operator);
+- when parts disagree on a value, one that appears in the chunk's tables
+  wins, then the value most parts agree on, then the earliest one;
+- excluded industries and restricted states are unioned in order.
+"""
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from app.schemas.lender import LenderPolicyCreate
+
+EXTRACTION_CHUNK_CHARS = int(os.getenv("EXTRACTION_CHUNK_CHARS", "8000"))
+EXTRACTION_LLM_CONCURRENCY = int(os.getenv("EXTRACTION_LLM_CONCURRENCY", "4"))
+
+# Shared by every extraction call in the process, so concurrent jobs and
+# batch files cannot multiply the number of calls in flight.
+llm_slots = threading.BoundedSemaphore(EXTRACTION_LLM_CONCURRENCY)
+
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+class Chunk(NamedTuple):
+    index: int
+    first_page: int
+    last_page: int
+    text: str
+    tables: List[Dict[str, Any]]
+
+
+def _page_text(page: Dict[str, Any]) -> str:
+    return f"[Page {page['page']}]\n{page['text']}"
+
+
+def build_chunks(raw: Dict[str, Any], max_chars: int = EXTRACTION_CHUNK_CHARS) -> List[Chunk]:
+    """Consecutive pages packed up to `max_chars`. A single page larger than
+    that is split on line boundaries; its tables go with its first piece."""
+    tables_by_page: Dict[int, List[Dict[str, Any]]] = {}
+    for table in raw.get("tables", []):
+        tables_by_page.setdefault(table["page"], []).append(table)
+
+    texts_by_page = {page["page"]: _page_text(page) for page in raw.get("pages", [])}
+    pieces: List[Tuple[int, str, List[Dict[str, Any]]]] = []
+    # Pages with tables but no extractable text still contribute their tables.
+    for page_num in sorted(set(texts_by_page) | set(tables_by_page)):
+        tables = tables_by_page.get(page_num, [])
+        budget = max(1, max_chars - len(json.dumps(tables)))
+        for n, part in enumerate(_split_text(texts_by_page.get(page_num, ""), budget) or [""]):
+            pieces.append((page_num, part, tables if n == 0 else []))
+
+    chunks: List[Chunk] = []
+    current: List[Tuple[int, str, List[Dict[str, Any]]]] = []
+    size = 0
+    for piece in pieces:
+        piece_size = len(piece[1]) + len(json.dumps(piece[2]))
+        if current and size + piece_size > max_chars:
+            chunks.append(_chunk(len(chunks), current))
+            current, size = [], 0
+        current.append(piece)
+        size += piece_size
+    if current:
+        chunks.append(_chunk(len(chunks), current))
+    return chunks
+
+
+def _chunk(index: int, pieces: List[Tuple[int, str, List[Dict[str, Any]]]]) -> Chunk:
+    return Chunk(
+        index=index,
+        first_page=pieces[0][0],
+        last_page=pieces[-1][0],
+        text="\n\n".join(text for _, text, _ in pieces if text),
+        tables=[table for _, _, tables in pieces for table in tables],
+    )
+
+
+def _split_text(text: str, budget: int) -> List[str]:
+    if len(text) <= budget:
+        return [text] if text else []
+    parts, current = [], ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > budget:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:budget])
+            line = line[budget:]
+        if len(current) + len(line) > budget:
+            parts.append(current)
+            current = ""
+        current += line
+    if current:
+        parts.append(current)
+    return parts
+
+
+def extract_chunks(
+    chunks: List[Chunk],
+    extract: Callable[[Chunk], LenderPolicyCreate],
+    progress: Optional[Callable[[str], None]] = None,
+) -> List[Tuple[Chunk, LenderPolicyCreate]]:
+    """Runs `extract` over every chunk concurrently; results in chunk order.
+    Any failed chunk fails the whole extraction rather than dropping content."""
+    def bounded(chunk: Chunk) -> LenderPolicyCreate:
+        with llm_slots:
+            return extract(chunk)
+
+    results: Dict[int, LenderPolicyCreate] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(len(chunks), EXTRACTION_LLM_CONCURRENCY))) as executor:
+        futures = {executor.submit(bounded, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            results[futures[future].index] = future.result()
+            if progress:
+                progress(f"extracting {len(results)}/{len(chunks)}")
+    return [(chunk, results[chunk.index]) for chunk in chunks]
+
+
+def _table_values(chunk: Chunk) -> Tuple[Set[float], Set[str]]:
+    numbers, cells = set(), set()
+    for table in chunk.tables:
+        for row in table.get("rows") or []:
+            for cell in row or []:
+                if cell is None:
+                    continue
+                text = str(cell).strip().lower()
+                cells.add(text)
+                for token in _NUMBER.findall(text):
+                    numbers.add(float(token.replace(",", "")))
+    return numbers, cells
+
+
+def _in_tables(value: Any, tables: Tuple[Set[float], Set[str]]) -> bool:
+    numbers, cells = tables
+    if value is None or isinstance(value, bool):
+        return False
+    if isinstance(value, (list, tuple)):
+        return bool(value) and all(_in_tables(v, tables) for v in value)
+    if isinstance(value, (int, float)):
+        return float(value) in numbers
+    text = str(value).strip().lower()
+    return any(text in cell for cell in cells)
+
+
+def _value_key(value: Any) -> str:
+    if hasattr(value, "value"):
+        value = value.value
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def reconcile(candidates: Iterable[Tuple[Any, bool]]) -> Any:
+    """Picks one of (value, table_backed) candidates, in part order: table
+    backed first, then the most frequent, then the earliest."""
+    groups: Dict[str, List] = {}
+    for order, (value, backed) in enumerate(candidates):
+        key = _value_key(value)
+        if key not in groups:
+            groups[key] = [value, False, 0, order]
+        group = groups[key]
+        group[1] = group[1] or backed
+        group[2] += 1
+    if not groups:
+        return None
+    best = max(groups.values(), key=lambda g: (g[1], g[2], -g[3]))
+    return best[0]
+
+
+def _program_key(name: str) -> str:
+    return re.sub(r"\s+", " ", (name or "").strip().lower())
+
+
+def merge_policies(parts: List[Tuple[Chunk, LenderPolicyCreate]]) -> LenderPolicyCreate:
+    if len(parts) == 1:
+        return parts[0][1]
+    tables = {chunk.index: _table_values(chunk) for chunk, _ in parts}
+
+    lender_name = reconcile(
+        (policy.lender_name, False) for _, policy in parts if policy.lender_name and policy.lender_name.strip()
+    )
+    tib = reconcile(
+        (policy.min_time_in_business_months_global, _in_tables(policy.min_time_in_business_months_global, tables[chunk.index]))
+        for chunk, policy in parts
+        if policy.min_time_in_business_months_global is not None
+    )
+
+    programs: Dict[str, List[Tuple[Chunk, Any]]] = {}
+    for chunk, policy in parts:
+        for program in policy.programs:
+            programs.setdefault(_program_key(program.program_name), []).append((chunk, program))
+
+    return LenderPolicyCreate(
+        lender_name=lender_name or parts[0][1].lender_name,
+        excluded_industries=_union(policy.excluded_industries for _, policy in parts),
+        restricted_states=_union(policy.restricted_states for _, policy in parts),
+        min_time_in_business_months_global=tib,
+        programs=[_merge_program(versions, tables) for versions in programs.values()],
+    )
+
+
+def merge_documents(policies: List[LenderPolicyCreate]) -> LenderPolicyCreate:
+    """Merges policies extracted from separate documents of one lender, in
+    upload order. Each policy already prefers its own tables, so conflicts
+    go to the value most documents agree on, then the earliest."""
+    return merge_policies([(Chunk(index, 0, 0, "", []), policy) for index, policy in enumerate(policies)])
+
+
+def _union(lists: Iterable[List[str]]) -> List[str]:
+    seen, merged = set(), []
+    for values in lists:
+        for value in values:
+            key = str(value).strip().upper()
+            if key not in seen:
+                seen.add(key)
+                merged.append(value)
+    return merged
+
+
+def _merge_program(versions: List[Tuple[Chunk, Any]], tables: Dict[int, Tuple[Set[float], Set[str]]]):
+    first = versions[0][1]
+
+    def amount(attr: str):
+        candidates = [(getattr(p, attr), _in_tables(getattr(p, attr), tables[c.index])) for c, p in versions]
+        # A part that only mentions the program tends to report 0 for amounts it did not see.
+        stated = [candidate for candidate in candidates if candidate[0]]
+        return reconcile(stated or candidates)
+
+    rules: Dict[Tuple[str, str], List[Tuple[Chunk, Any]]] = {}
+    for chunk, program in versions:
+        for rule in program.rules:
+            rules.setdefault((_value_key(rule.field_name), _value_key(rule.operator)), []).append((chunk, rule))
+
+    merged_rules = []
+    for rule_versions in rules.values():
+        value = reconcile((rule.value, _in_tables(rule.value, tables[chunk.index])) for chunk, rule in rule_versions)
+        chosen = next(rule for _, rule in rule_versions if _value_key(rule.value) == _value_key(value))
+        merged_rules.append(chosen)
+
+    return first.model_copy(update={
+        "program_name": first.program_name.strip(),
+        "max_loan_amount": amount("max_loan_amount"),
+        "min_loan_amount": amount("min_loan_amount"),
+        "rules": merged_rules,
+    })
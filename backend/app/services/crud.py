@@ -1,12 +1,59 @@
 import uuid
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, select, update
+from sqlalchemy.dialects.postgresql import insert
 
 from app.models.model import Lender, LenderPolicy, Borrower
 
 from app.schemas.borrower import BorrowerCreate
 from app.schemas.lender import LenderPolicyCreate 
+from app.services.policy_cache import active_policy_cache
+
+def _lender_by_email(email: str):
+    return select(Lender).filter(Lender.email == email)
+
+
+def _lender_by_id(lender_id: uuid.UUID):
+    return select(Lender).filter(Lender.id == lender_id)
+
+
+def _active_policy(lender_id: uuid.UUID):
+    return select(LenderPolicy).filter(
+        LenderPolicy.lender_id == lender_id,
+        LenderPolicy.is_active == True
+    )
+
+
+def _policy_history(lender_id: uuid.UUID):
+    return select(LenderPolicy).filter(
+        LenderPolicy.lender_id == lender_id
+    ).order_by(desc(LenderPolicy.updated_at))
+
+
+def _deactivate_policies(lender_id: uuid.UUID, active_only: bool = True):
+    stmt = update(LenderPolicy).filter(LenderPolicy.lender_id == lender_id)
+    if active_only:
+        stmt = stmt.filter(LenderPolicy.is_active == True)
+    return stmt.values(is_active=False)
+
+
+def _new_policy(lender_id: uuid.UUID, policy_data: LenderPolicyCreate) -> LenderPolicy:
+    data_dict = policy_data.dict() if hasattr(policy_data, 'dict') else policy_data
+
+    programs = data_dict.get("programs", [])
+    should_be_active = len(programs) > 0
+
+    return LenderPolicy(
+        lender_id=lender_id,
+        version_name=f"Policy updated on {uuid.uuid4().hex[:8]}",
+        is_active=should_be_active,
+        excluded_industries=data_dict.get("excluded_industries", []),
+        restricted_states=data_dict.get("restricted_states", []),
+        programs=programs
+    )
+
 
 class LenderCRUD:
     def __init__(self, db: Session):
@@ -24,51 +71,27 @@ class LenderCRUD:
             raise e
 
     def get_lender_by_email(self, email: str) -> Optional[Lender]:
-        return self.db.query(Lender).filter(Lender.email == email).first()
+        return self.db.execute(_lender_by_email(email)).scalars().first()
 
     def get_lender_by_id(self, lender_id: uuid.UUID) -> Optional[Lender]:
-        return self.db.query(Lender).filter(Lender.id == lender_id).first()
+        return self.db.execute(_lender_by_id(lender_id)).scalars().first()
 
-    
     def get_active_policy(self, lender_id: uuid.UUID) -> Optional[LenderPolicy]:
-        return self.db.query(LenderPolicy).filter(
-            LenderPolicy.lender_id == lender_id, 
-            LenderPolicy.is_active == True
-        ).first()
+        return self.db.execute(_active_policy(lender_id)).scalars().first()
 
     def get_policy_history(self, lender_id: uuid.UUID) -> List[LenderPolicy]:
-        return self.db.query(LenderPolicy).filter(
-            LenderPolicy.lender_id == lender_id
-        ).order_by(desc(LenderPolicy.updated_at)).all()
+        return list(self.db.execute(_policy_history(lender_id)).scalars().all())
 
     def update_policy(self, lender_id: uuid.UUID, policy_data: LenderPolicyCreate) -> LenderPolicy:
         try:
-            self.db.query(LenderPolicy).filter(
-                LenderPolicy.lender_id == lender_id,
-                LenderPolicy.is_active == True
-            ).update({"is_active": False})
-            
-            data_dict = policy_data.dict() if hasattr(policy_data, 'dict') else policy_data
-            
-            programs = data_dict.get("programs", [])
-            should_be_active = len(programs) > 0
-
-            new_policy = LenderPolicy(
-                lender_id=lender_id,
-                
-                version_name=f"Policy updated on {uuid.uuid4().hex[:8]}",
-                is_active=should_be_active,
-                
-                excluded_industries=data_dict.get("excluded_industries", []),
-                restricted_states=data_dict.get("restricted_states", []),
-                
-                programs=programs 
-            )
+            self.db.execute(_deactivate_policies(lender_id))
 
+            new_policy = _new_policy(lender_id, policy_data)
             self.db.add(new_policy)
             self.db.commit()
             self.db.refresh(new_policy)
-            
+            active_policy_cache.invalidate(lender_id)
+
             return new_policy
 
         except Exception as e:
@@ -81,36 +104,67 @@ class LenderCRUD:
             if not lender:
                 return False
 
-            self.db.query(LenderPolicy).filter(
-                LenderPolicy.lender_id == lender_id
-            ).update({"is_active": False})
+            self.db.execute(_deactivate_policies(lender_id, active_only=False))
 
             lender.is_verified = False
-            
+
             self.db.commit()
+            active_policy_cache.invalidate(lender_id)
             return True
 
         except Exception as e:
             self.db.rollback()
             raise e
 
+
+def _borrower_by_email(email: str):
+    return select(Borrower).filter(Borrower.email == email)
+
+
+def _apply_application(db, existing: Optional[Borrower], borrower_data: BorrowerCreate) -> Borrower:
+    """Updates the borrower already registered under the email, or adds a new one."""
+    if existing:
+        for key, value in borrower_data.model_dump().items():
+            setattr(existing, key, value)
+        return existing
+    borrower = Borrower(**borrower_data.model_dump())
+    db.add(borrower)
+    return borrower
+
+
+def _rows_by_email(borrowers: List[BorrowerCreate]) -> Dict[str, Dict[str, Any]]:
+    by_email: Dict[str, Dict[str, Any]] = {}
+    for borrower_data in borrowers:
+        row = borrower_data.model_dump()
+        by_email.pop(row["email"], None)
+        by_email[row["email"]] = row
+    return by_email
+
+
+def _upsert_borrowers(rows: List[Dict[str, Any]]):
+    stmt = insert(Borrower).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[Borrower.email],
+        set_={key: stmt.excluded[key] for key in rows[0] if key != "email"}
+    ).returning(Borrower.id, Borrower.email)
+
+
+def _bulk_upserts(rows_by_email: Dict[str, Dict[str, Any]]):
+    rows = list(rows_by_email.values())
+    for start in range(0, len(rows), BorrowerCRUD.BULK_CHUNK_SIZE):
+        yield _upsert_borrowers(rows[start:start + BorrowerCRUD.BULK_CHUNK_SIZE])
+
+
 class BorrowerCRUD:
+    BULK_CHUNK_SIZE = 1000
+
     def __init__(self, db: Session):
         self.db = db
-    
+
     def register(self, borrower_data: BorrowerCreate):
         try:
-            existing_borrower = self.db.query(Borrower).filter(
-                Borrower.email == borrower_data.email
-            ).first()
-
-            if existing_borrower:
-                for key, value in borrower_data.model_dump().items():
-                    setattr(existing_borrower, key, value)
-                borrower = existing_borrower
-            else:
-                borrower = Borrower(**borrower_data.model_dump())
-                self.db.add(borrower)
+            existing_borrower = self.db.execute(_borrower_by_email(borrower_data.email)).scalars().first()
+            borrower = _apply_application(self.db, existing_borrower, borrower_data)
 
             self.db.commit()
             self.db.refresh(borrower)
@@ -118,4 +172,130 @@ class BorrowerCRUD:
             return {"borrower": borrower, "matches_count": 0}
         except Exception as e:
             self.db.rollback()
-            raise e 
\ No newline at end of file
+            raise e
+
+    def register_bulk(self, borrowers: List[BorrowerCreate]) -> List[int]:
+        """Upserts a batch keyed on email. Returns borrower ids in input order;
+        a repeated email keeps the last application."""
+        rows_by_email = _rows_by_email(borrowers)
+        if not rows_by_email:
+            return []
+
+        ids_by_email: Dict[str, int] = {}
+        try:
+            for stmt in _bulk_upserts(rows_by_email):
+                for borrower_id, email in self.db.execute(stmt):
+                    ids_by_email[email] = borrower_id
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise e
+
+        return [ids_by_email[b.email] for b in borrowers]
+
+
+class AsyncLenderCRUD:
+    """LenderCRUD for async routes, on an AsyncSession."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def register_lender(self, name: str, email: str) -> Lender:
+        try:
+            lender = Lender(name=name, email=email, is_verified=True)
+            self.db.add(lender)
+            await self.db.commit()
+            await self.db.refresh(lender)
+            return lender
+        except Exception as e:
+            await self.db.rollback()
+            raise e
+
+    async def get_lender_by_email(self, email: str) -> Optional[Lender]:
+        result = await self.db.execute(_lender_by_email(email))
+        return result.scalars().first()
+
+    async def get_lender_by_id(self, lender_id: uuid.UUID) -> Optional[Lender]:
+        result = await self.db.execute(_lender_by_id(lender_id))
+        return result.scalars().first()
+
+    async def get_active_policy(self, lender_id: uuid.UUID) -> Optional[LenderPolicy]:
+        result = await self.db.execute(_active_policy(lender_id))
+        return result.scalars().first()
+
+    async def get_policy_history(self, lender_id: uuid.UUID) -> List[LenderPolicy]:
+        result = await self.db.execute(_policy_history(lender_id))
+        return list(result.scalars().all())
+
+    async def update_policy(self, lender_id: uuid.UUID, policy_data: LenderPolicyCreate) -> LenderPolicy:
+        try:
+            await self.db.execute(_deactivate_policies(lender_id))
+
+            new_policy = _new_policy(lender_id, policy_data)
+            self.db.add(new_policy)
+            await self.db.commit()
+            await self.db.refresh(new_policy)
+            active_policy_cache.invalidate(lender_id)
+
+            return new_policy
+
+        except Exception as e:
+            await self.db.rollback()
+            raise e
+
+    async def delete_lender(self, lender_id: uuid.UUID) -> bool:
+        try:
+            lender = await self.get_lender_by_id(lender_id)
+            if not lender:
+                return False
+
+            await self.db.execute(_deactivate_policies(lender_id, active_only=False))
+
+            lender.is_verified = False
+
+            await self.db.commit()
+            active_policy_cache.invalidate(lender_id)
+            return True
+
+        except Exception as e:
+            await self.db.rollback()
+            raise e
+
+
+class AsyncBorrowerCRUD:
+    """BorrowerCRUD for async routes, on an AsyncSession."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def register(self, borrower_data: BorrowerCreate):
+        try:
+            result = await self.db.execute(_borrower_by_email(borrower_data.email))
+            borrower = _apply_application(self.db, result.scalars().first(), borrower_data)
+
+            await self.db.commit()
+            await self.db.refresh(borrower)
+
+            return {"borrower": borrower, "matches_count": 0}
+        except Exception as e:
+            await self.db.rollback()
+            raise e
+
+    async def register_bulk(self, borrowers: List[BorrowerCreate]) -> List[int]:
+        """Async BorrowerCRUD.register_bulk."""
+        rows_by_email = _rows_by_email(borrowers)
+        if not rows_by_email:
+            return []
+
+        ids_by_email: Dict[str, int] = {}
+        try:
+            for stmt in _bulk_upserts(rows_by_email):
+                result = await self.db.execute(stmt)
+                for borrower_id, email in result:
+                    ids_by_email[email] = borrower_id
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            raise e
+
+        return [ids_by_email[b.email] for b in borrowers]
@@ -0,0 +1,156 @@
+"""Content-addressed cache for PDF policy extraction.
+
+Entries are keyed by the SHA-256 of the PDF bytes: the parsed text/table
+blocks under the parser backend and version, the extracted policy JSON additionally
+under the extraction version (prompt, schema and model). Entries live on
+local disk, evicted least recently used once the directory grows past
+EXTRACTION_CACHE_MAX_BYTES, and, when enabled, in Redis so every API
+replica shares them.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from redis.exceptions import RedisError
+
+from app.redis_client import get_sync_redis
+
+EXTRACTION_CACHE_DIR = os.getenv(
+    "EXTRACTION_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lender-extraction-cache")
+)
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+EXTRACTION_CACHE_REDIS = os.getenv("EXTRACTION_CACHE_REDIS", "1") == "1"
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", str(30 * 24 * 3600)))
+
+# Bump when pdf_parser output changes for the same bytes and backend.
+PARSER_VERSION = "2"
+
+_READ_CHUNK = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_READ_CHUNK):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def version_digest(*parts: str) -> str:
+    """Short stable digest of whatever determines an extraction's output."""
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part.encode())
+        sha.update(b"\0")
+    return sha.hexdigest()[:16]
+
+
+class DiskLRU:
+    """One file per key; a read bumps the file's mtime, eviction removes the
+    oldest files first."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return value
+
+    def set(self, key: str, value: str):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(value)
+        os.replace(temp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+class ExtractionCache:
+    def __init__(self, disk: Optional[DiskLRU] = None, redis=None, ttl: int = EXTRACTION_CACHE_TTL):
+        self.disk = disk
+        self.redis = redis
+        self.ttl = ttl
+
+    def get_parsed(self, digest: str, backend: str) -> Optional[Dict[str, Any]]:
+        value = self._get(f"parsed-{backend}-{PARSER_VERSION}-{digest}")
+        return json.loads(value) if value is not None else None
+
+    def set_parsed(self, digest: str, backend: str, parsed: Dict[str, Any]):
+        self._set(f"parsed-{backend}-{PARSER_VERSION}-{digest}", json.dumps(parsed))
+
+    def get_policy(self, digest: str, version: str) -> Optional[str]:
+        return self._get(f"policy-{version}-{digest}")
+
+    def set_policy(self, digest: str, version: str, policy_json: str):
+        self._set(f"policy-{version}-{digest}", policy_json)
+
+    def _get(self, key: str) -> Optional[str]:
+        value = self.disk.get(key) if self.disk is not None else None
+        if value is not None or self.redis is None:
+            return value
+        try:
+            value = self.redis.get(f"extraction-cache:{key}")
+        except RedisError as e:
+            print(f"Extraction cache read failed: {e}")
+            return None
+        if value is not None and self.disk is not None:
+            self.disk.set(key, value)
+        return value
+
+    def _set(self, key: str, value: str):
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except OSError as e:
+                print(f"Extraction cache write failed: {e}")
+        if self.redis is not None:
+            try:
+                self.redis.set(f"extraction-cache:{key}", value, ex=self.ttl)
+            except RedisError as e:
+                print(f"Extraction cache write failed: {e}")
+
+
+extraction_cache = ExtractionCache(
+    DiskLRU(EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES),
+    get_sync_redis() if EXTRACTION_CACHE_REDIS else None,
+)
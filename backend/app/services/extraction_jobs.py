@@ -0,0 +1,245 @@
+"""Background PDF policy extraction.
+
+The API saves the upload to EXTRACTION_UPLOAD_DIR (shared with the match
+worker) and queues an "extraction:<job_id>" job on the match queue. The job
+state lives in a Redis hash; every change is also published on the job's
+events channel for the server-sent-events stream.
+
+A batch job extracts several PDFs of one lender (rate sheet, program
+guidelines, state addenda) concurrently and merges them into one policy.
+Its status lists every file with its stage timings.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.redis_client import get_sync_redis
+from app.services.chunked_extraction import merge_documents
+from app.services.extractor import extract_policy
+from app.services.match_queue import EXTRACTION, enqueue_match_job_async
+from app.services.pipeline import clean_extracted_policy
+
+EXTRACTION_UPLOAD_DIR = os.getenv(
+    "EXTRACTION_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "lender-extraction-uploads")
+)
+EXTRACTION_JOB_TTL = int(os.getenv("EXTRACTION_JOB_TTL", str(24 * 3600)))
+# Files of one batch extracted at once; LLM calls are capped separately by
+# EXTRACTION_LLM_CONCURRENCY.
+EXTRACTION_BATCH_CONCURRENCY = int(os.getenv("EXTRACTION_BATCH_CONCURRENCY", "4"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = frozenset({DONE, FAILED})
+
+
+def job_key(job_id: str) -> str:
+    return f"extraction-job:{job_id}"
+
+
+def events_channel(job_id: str) -> str:
+    return f"extraction-job:{job_id}:events"
+
+
+def new_upload_path() -> str:
+    os.makedirs(EXTRACTION_UPLOAD_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="lender-pdf-", suffix=".pdf", dir=EXTRACTION_UPLOAD_DIR)
+    os.close(fd)
+    return path
+
+
+def job_status(job_id: str, fields: Dict[str, str]) -> Dict[str, Any]:
+    """Public view of a job hash; the cleaned policy once it is done."""
+    result = fields.get("result")
+    status = {
+        "job_id": job_id,
+        "lender_id": fields.get("lender_id"),
+        "status": fields.get("status"),
+        "stage": fields.get("stage"),
+        "error": fields.get("error"),
+        "updated_at": float(fields["updated_at"]) if fields.get("updated_at") else None,
+        "result": json.loads(result) if result else None,
+    }
+    if fields.get("files"):
+        status["files"] = [
+            {key: value for key, value in entry.items() if key != "path"}
+            for entry in json.loads(fields["files"])
+        ]
+    return status
+
+
+async def create_job(redis, lender_id: str, path: str, backend: Optional[str] = None) -> Dict[str, Any]:
+    job_id = uuid.uuid4().hex
+    fields = {
+        "lender_id": lender_id,
+        "path": path,
+        "backend": backend or "",
+        "status": QUEUED,
+        "stage": QUEUED,
+        "updated_at": repr(time.time()),
+    }
+    pipe = redis.pipeline()
+    pipe.hset(job_key(job_id), mapping=fields)
+    pipe.expire(job_key(job_id), EXTRACTION_JOB_TTL)
+    await pipe.execute()
+    await enqueue_match_job_async(redis, EXTRACTION, job_id)
+    return job_status(job_id, fields)
+
+
+async def create_batch_job(
+    redis, lender_id: str, uploads: List[Tuple[str, str]], backend: Optional[str] = None
+) -> Dict[str, Any]:
+    """`uploads` are (filename, saved path) pairs, in the order their values
+    win when the documents disagree."""
+    job_id = uuid.uuid4().hex
+    files = [
+        {"filename": filename, "path": path, "status": QUEUED, "stage": QUEUED, "seconds": None, "stages": {}}
+        for filename, path in uploads
+    ]
+    fields = {
+        "lender_id": lender_id,
+        "files": json.dumps(files),
+        "backend": backend or "",
+        "status": QUEUED,
+        "stage": QUEUED,
+        "updated_at": repr(time.time()),
+    }
+    pipe = redis.pipeline()
+    pipe.hset(job_key(job_id), mapping=fields)
+    pipe.expire(job_key(job_id), EXTRACTION_JOB_TTL)
+    await pipe.execute()
+    await enqueue_match_job_async(redis, EXTRACTION, job_id)
+    return job_status(job_id, fields)
+
+
+async def get_job(redis, job_id: str) -> Optional[Dict[str, Any]]:
+    fields = await redis.hgetall(job_key(job_id))
+    return job_status(job_id, fields) if fields else None
+
+
+def _update(redis, job_id: str, **changes):
+    changes["updated_at"] = repr(time.time())
+    pipe = redis.pipeline()
+    pipe.hset(job_key(job_id), mapping=changes)
+    pipe.expire(job_key(job_id), EXTRACTION_JOB_TTL)
+    pipe.hgetall(job_key(job_id))
+    fields = pipe.execute()[-1]
+    redis.publish(events_channel(job_id), json.dumps(job_status(job_id, fields)))
+
+
+def run_extraction_job(job_id: str):
+    """Match queue handler. Failures are recorded on the job rather than
+    retried: a PDF that cannot be read or extracted fails the same way again."""
+    redis = get_sync_redis()
+    fields = redis.hgetall(job_key(job_id))
+    if not fields:
+        print(f"Skipping extraction job {job_id}: expired")
+        return
+    if fields.get("status") in FINISHED:
+        return
+    if fields.get("files"):
+        _run_batch(redis, job_id, fields)
+        return
+
+    path = fields["path"]
+    try:
+        raw_schema = extract_policy(
+            path,
+            progress=lambda stage: _update(redis, job_id, status=RUNNING, stage=stage),
+            backend=fields.get("backend") or None,
+        )
+        _update(redis, job_id, status=RUNNING, stage="cleaning")
+        final_policy = clean_extracted_policy(raw_schema)
+        _update(redis, job_id, status=DONE, stage=DONE, result=final_policy.model_dump_json())
+    except Exception as e:
+        print(f"Extraction job {job_id} failed: {e}")
+        _update(redis, job_id, status=FAILED, stage=FAILED, error=str(e))
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class _FileProgress:
+    """Stage timings of one batch file; every change republishes the job."""
+
+    def __init__(self, redis, job_id: str, files: List[Dict[str, Any]], lock: threading.Lock):
+        self.redis = redis
+        self.job_id = job_id
+        self.files = files
+        self.lock = lock
+
+    def __call__(self, index: int, stage: str, error: Optional[str] = None):
+        now = time.perf_counter()
+        with self.lock:
+            entry = self.files[index]
+            started, current = entry.pop("_started", None), entry.pop("_stage", None)
+            if current is not None:
+                # "extracting 2/5" chunk updates add up under "extracting".
+                key = current.split(" ")[0]
+                entry["stages"][key] = round(entry["stages"].get(key, 0) + now - started, 3)
+            entry["stage"] = stage
+            if stage in FINISHED:
+                entry["status"] = stage
+                entry["seconds"] = round(sum(entry["stages"].values()), 3)
+                entry["error"] = error
+            else:
+                entry["status"] = RUNNING
+                entry["_stage"], entry["_started"] = stage, now
+            finished = sum(1 for f in self.files if f["status"] in FINISHED)
+            public = [{k: v for k, v in f.items() if not k.startswith("_")} for f in self.files]
+            _update(
+                self.redis, self.job_id, status=RUNNING,
+                stage=f"extracting {finished}/{len(self.files)} files", files=json.dumps(public),
+            )
+
+
+def _run_batch(redis, job_id: str, fields: Dict[str, str]):
+    """Extracts every file, at most EXTRACTION_BATCH_CONCURRENCY at a time, and
+    merges the policies of those that succeeded. The job fails only when every
+    file does; the others' errors stay on their file entries."""
+    files = json.loads(fields["files"])
+    backend = fields.get("backend") or None
+    progress = _FileProgress(redis, job_id, files, threading.Lock())
+    started = time.perf_counter()
+
+    def extract(index: int):
+        entry = files[index]
+        progress(index, "reading")
+        try:
+            policy = extract_policy(
+                entry["path"],
+                progress=lambda stage: progress(index, stage),
+                backend=backend,
+                pool=True,
+            )
+        except Exception as e:
+            print(f"Extraction job {job_id} file {entry['filename']} failed: {e}")
+            progress(index, FAILED, str(e))
+            return None
+        progress(index, DONE)
+        return policy
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(len(files), EXTRACTION_BATCH_CONCURRENCY))) as executor:
+            policies = list(executor.map(extract, range(len(files))))
+
+        extracted = [policy for policy in policies if policy is not None]
+        if not extracted:
+            raise ValueError("No file could be extracted")
+        _update(redis, job_id, status=RUNNING, stage="merging")
+        final_policy = clean_extracted_policy(merge_documents(extracted))
+        _update(redis, job_id, status=DONE, stage=DONE, result=final_policy.model_dump_json())
+        print(f"Extraction job {job_id}: {len(extracted)}/{len(files)} files in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"Extraction job {job_id} failed: {e}")
+        _update(redis, job_id, status=FAILED, stage=FAILED, error=str(e))
+    finally:
+        for entry in files:
+            if os.path.exists(entry["path"]):
+                os.remove(entry["path"])
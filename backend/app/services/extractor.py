@@ -1,66 +1,21 @@
 import os
 from pathlib import Path
 from typing import List, Optional, Dict, Any
-from google import genai
 import json
 from uuid import UUID
 from datetime import datetime
 from dotenv import load_dotenv
-import pdfplumber
 import json
 
 from  app.schemas.lender import LenderPolicyCreate
+from app.services.chunked_extraction import EXTRACTION_CHUNK_CHARS, build_chunks, extract_chunks, llm_slots, merge_policies
+from app.services.extraction_cache import PARSER_VERSION, extraction_cache, file_digest, version_digest
+from app.services.llm_client import get_llm_client
+from app.services.pdf_parser import extract_text_and_tables, get_backend
 
 load_dotenv()
 
-gemini_api_key = os.getenv("GEMINI_API_KEYS")
-client = genai.Client(api_key = gemini_api_key)
-def get_extracted_json(schema, content):
-    response = client.models.generate_content(
-        model = "gemini-2.5-flash",
-        contents = content,
-        config = {
-            "response_mime_type": "application/json",
-            "response_schema": schema
-        }
-    )
-    return response.parsed
-
-
-def extract_text_and_tables(pdf_path):
-    text_blocks = []
-    table_blocks = []
-
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num, page in enumerate(pdf.pages, start=1):
-
-            # ---- TEXT ----
-            text = page.extract_text()
-            if text:
-                text_blocks.append(
-                    f"[Page {page_num}]\n{text}"
-                )
-
-            # ---- TABLES ----
-            tables = page.extract_tables()
-            for t_idx, table in enumerate(tables):
-                table_blocks.append({
-                    "page": page_num,
-                    "table_index": t_idx,
-                    "rows": table
-                })
-
-    return {
-        "text": "\n\n".join(text_blocks),
-        "tables": table_blocks
-    }
-
-
-def extract_policy_with_pyplumber(file_path):
-    raw = extract_text_and_tables(file_path)
-    text = raw["text"][:8000]
-    tables = json.dumps(raw["tables"])
-    prompt = f"""
+PROMPT_TEMPLATE = """
     # PERSONA
     You are a Senior Equipment Finance Underwriter with 20 years of experience.
 
@@ -86,13 +41,95 @@ def extract_policy_with_pyplumber(file_path):
     {tables}
     >>>
     """
-    content = [prompt]
-    return get_extracted_json(LenderPolicyCreate, content)
 
-
-def extract_policy(file_path):
-    policy = extract_policy_with_pyplumber(file_path)
+CHUNK_PROMPT_TEMPLATE = PROMPT_TEMPLATE.replace(
+    "    # TEXT CONTENT",
+    """    # SCOPE
+    This is part {part} of {parts} (pages {first_page}-{last_page}) of a longer document.
+    Extract only what this part states; return null or empty lists for anything it does not mention.
+
+    # TEXT CONTENT""",
+)
+
+# Anything besides the model that changes the extracted policy for the same PDF.
+PROMPT_VERSION = version_digest(
+    PARSER_VERSION,
+    PROMPT_TEMPLATE,
+    CHUNK_PROMPT_TEMPLATE,
+    str(EXTRACTION_CHUNK_CHARS),
+    json.dumps(LenderPolicyCreate.model_json_schema(), sort_keys=True),
+)
+
+
+def extraction_version(llm, backend: str) -> str:
+    return version_digest(PROMPT_VERSION, llm.model, backend)
+
+
+def get_extracted_json(schema, content, llm=None):
+    return (llm or get_llm_client()).extract(schema, content)
+
+
+def parse_pdf(file_path, digest=None, backend=None, pool=False):
+    """Text and table blocks of the PDF, from the extraction cache when seen before."""
+    digest = digest or file_digest(file_path)
+    backend = get_backend(backend).name
+    raw = extraction_cache.get_parsed(digest, backend)
+    if raw is None:
+        raw = extract_text_and_tables(file_path, backend, pool)
+        extraction_cache.set_parsed(digest, backend, raw)
+    return raw
+
+
+def extract_policy_with_pyplumber(file_path, digest=None, llm=None, progress=None, backend=None, pool=False):
+    """One call when the document fits in a chunk, otherwise one call per
+    chunk, run concurrently, with the partial policies merged."""
+    if progress:
+        progress("parsing")
+    raw = parse_pdf(file_path, digest, backend, pool)
+    chunks = build_chunks(raw)
+    llm = llm or get_llm_client()
+    if progress:
+        progress("extracting")
+
+    if len(chunks) <= 1:
+        prompt = PROMPT_TEMPLATE.format(text=raw["text"], tables=json.dumps(raw["tables"]))
+        with llm_slots:
+            return get_extracted_json(LenderPolicyCreate, [prompt], llm)
+
+    def extract_chunk(chunk):
+        prompt = CHUNK_PROMPT_TEMPLATE.format(
+            part=chunk.index + 1,
+            parts=len(chunks),
+            first_page=chunk.first_page,
+            last_page=chunk.last_page,
+            text=chunk.text,
+            tables=json.dumps(chunk.tables),
+        )
+        return get_extracted_json(LenderPolicyCreate, [prompt], llm)
+
+    print(f"Extracting {file_path} in {len(chunks)} chunks")
+    return merge_policies(extract_chunks(chunks, extract_chunk, progress))
+
+
+def extract_policy(file_path, progress=None, backend=None, pool=False):
+    """Cache hits skip both the PDF parse and the LLM call. `progress`, if
+    given, is called with the name of each stage as it starts. `backend`
+    overrides PDF_BACKEND for this document; `pool` parses it in the PDF
+    process pool however short it is."""
+    llm = get_llm_client()
+    backend = get_backend(backend).name
+    version = extraction_version(llm, backend)
+    digest = file_digest(file_path)
+    cached = extraction_cache.get_policy(digest, version)
+    if cached is not None:
+        print(f"Extraction cache hit for {digest[:12]}")
+        if progress:
+            progress("cached")
+        return LenderPolicyCreate.model_validate_json(cached)
+
+    policy = extract_policy_with_pyplumber(file_path, digest, llm, progress, backend, pool)
     print(policy.model_dump_json(indent = 2))
+    extraction_cache.set_policy(digest, version, policy.model_dump_json())
     return policy
 
 if __name__ == "__main__":
@@ -1,34 +1,91 @@
+from typing import List, Optional
 from uuid import UUID
-from app.database import SessionLocal
-from app.models.model import LenderPolicy, LoanMatch
+from app.core.metrics import MATCHES_WRITTEN, TASK_SECONDS, TASKS, stage
+from app.database import BatchSessionLocal
+from app.models.model import Lender, LenderPolicy
 from app.matching_engine.engine import CreditMatchingEngine
+from app.matching_engine.parallel import run_lender_rematch
+from app.redis_client import get_sync_redis
+from app.services.crud import LenderCRUD
+from app.services.match_index import sync_match_index
+from app.services.match_store import MatchStore
 
 def run_matching_service(policy_id: UUID):
-    db = SessionLocal()
+    db = BatchSessionLocal()
     engine = CreditMatchingEngine()
-    
+    task = "lender"
+
     try:
-        policy = db.query(LenderPolicy).filter(LenderPolicy.id == policy_id).first()
-        
-        if not policy or not policy.is_active:
-            print(f"Skipping matching for inactive/missing Policy {policy_id}")
-            return
-
-        matches = engine.run_engine_for_lender(policy, db)
-
-        num_deleted = db.query(LoanMatch).filter(LoanMatch.lender_id == policy.lender_id).delete()
-        print(f"Cleaned up {num_deleted} old matches for Lender {policy.lender_id}")
-
-        if matches:
-            db.bulk_save_objects(matches)
-            print(f"SUCCESS: Policy {policy_id} matched with {len(matches)} borrowers.")
-        else:
-            print(f"Policy {policy_id} processed. No new matching borrowers found.")
-            
-        db.commit()
+        with TASK_SECONDS.labels(task).time():
+            policy = db.query(LenderPolicy).filter(LenderPolicy.id == policy_id).first()
+
+            if not policy or not policy.is_active:
+                print(f"Skipping matching for inactive/missing Policy {policy_id}")
+                TASKS.labels(task, "skipped").inc()
+                return
+
+            with stage(task, "load_policies"):
+                crud = LenderCRUD(db)
+                lender = crud.get_lender_by_id(policy.lender_id)
+                previous = matched_policy_version(
+                    crud.get_policy_history(policy.lender_id), lender.matched_policy_id if lender else None
+                )
+            if previous is None:
+                print(f"Full rematch for Policy {policy_id}: stored matches are from an unknown version")
+
+            with stage(task, "match"):
+                matches = run_lender_rematch(engine, policy, db, previous_policy=previous)
+
+            store = MatchStore(db)
+            with stage(task, "persist"):
+                upserted, deleted = store.replace_for_lender(policy.lender_id, matches)
+                db.query(Lender).filter(Lender.id == policy.lender_id).update(
+                    {"matched_policy_id": policy.id}, synchronize_session=False
+                )
+            print(f"Policy {policy_id}: {upserted} new or changed, {deleted} removed matches")
+
+            if matches:
+                print(f"SUCCESS: Policy {policy_id} matched with {len(matches)} borrowers.")
+            else:
+                print(f"Policy {policy_id} processed. No new matching borrowers found.")
+
+            with stage(task, "commit"):
+                db.commit()
+            with stage(task, "index_sync"):
+                sync_match_index(get_sync_redis(), db, store.upserted_pairs, store.deleted_pairs)
+        TASKS.labels(task, "success").inc()
+        MATCHES_WRITTEN.labels(task, "upserted").inc(upserted)
+        MATCHES_WRITTEN.labels(task, "deleted").inc(deleted)
     except Exception as e:
         print(f"CRITICAL ERROR in Lender Matching Service: {e}")
+        TASKS.labels(task, "error").inc()
         db.rollback()
-        
+        raise
+
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def run_matching_for_lender(lender_id: UUID):
+    """Queue entry point: rematches whatever policy is active when the job runs."""
+    db = BatchSessionLocal()
+    try:
+        policy = LenderCRUD(db).get_active_policy(lender_id)
+        policy_id = policy.id if policy else None
+    finally:
+        db.close()
+
+    if policy_id is None:
+        print(f"Skipping matching for Lender {lender_id}: no active policy")
+        return
+    run_matching_service(policy_id)
+
+
+def matched_policy_version(history: List[LenderPolicy], matched_policy_id: Optional[UUID]) -> Optional[LenderPolicy]:
+    """The version the lender's stored matches were computed from, which is
+    not necessarily the one before the active policy: coalesced jobs skip
+    versions and failed ones leave the matches behind. None when it is not
+    recorded or no longer in the history."""
+    if matched_policy_id is None:
+        return None
+    return next((p for p in history if p.id == matched_policy_id), None)
+
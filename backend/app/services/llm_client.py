@@ -0,0 +1,73 @@
+"""LLM backends for policy extraction.
+
+EXTRACTION_LLM picks the client: "gemini" (default) calls Gemini with a
+response schema; "stub" answers locally without network access, from the
+JSON file in EXTRACTION_STUB_RESPONSE or an empty policy, for tests and
+offline development. set_llm_client() swaps it at runtime.
+"""
+import json
+import os
+import threading
+from typing import Any, List, Optional, Type
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+load_dotenv()
+
+EXTRACTION_LLM = os.getenv("EXTRACTION_LLM", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+
+class GeminiClient:
+    def __init__(self, model: str = GEMINI_MODEL, api_key: Optional[str] = None):
+        # Imported here so the stub runs without google-genai configured.
+        from google import genai
+
+        self.model = model
+        self.client = genai.Client(api_key=api_key or os.getenv("GEMINI_API_KEYS"))
+
+    def extract(self, schema: Type[BaseModel], content: List[Any]) -> BaseModel:
+        response = self.client.models.generate_content(
+            model = self.model,
+            contents = content,
+            config = {
+                "response_mime_type": "application/json",
+                "response_schema": schema
+            }
+        )
+        return response.parsed
+
+
+class StubLLMClient:
+    model = "stub"
+
+    def __init__(self, response: Optional[dict] = None):
+        path = os.getenv("EXTRACTION_STUB_RESPONSE")
+        if response is None and path:
+            with open(path, encoding="utf-8") as f:
+                response = json.load(f)
+        self.response = response or {"lender_name": "Stub Lender"}
+        self.prompts: List[Any] = []
+
+    def extract(self, schema: Type[BaseModel], content: List[Any]) -> BaseModel:
+        self.prompts.append(content)
+        return schema.model_validate(self.response)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = StubLLMClient() if EXTRACTION_LLM == "stub" else GeminiClient()
+        return _client
+
+
+def set_llm_client(client):
+    global _client
+    with _client_lock:
+        _client = client
@@ -0,0 +1,296 @@
+import os
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from redis.exceptions import WatchError
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from app.models.model import Borrower, LoanMatch, MatchTier
+
+MATCH_INDEX_TTL = int(os.getenv("MATCH_INDEX_TTL", str(6 * 3600)))
+_ROW_BATCH = 5000
+
+# Per lender: a sorted set of borrower ids scored by match_score, a compact
+# hash per match with what the dashboard shows, a "ready" marker set once the
+# set is complete and a generation counter bumped on every committed change.
+
+# Rewrites the borrower fields of an entry that is still cached, and bumps the
+# generation so that a rebuild which read the old values gives up.
+_PATCH_BORROWER = """
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('HSET', KEYS[2], 'name', ARGV[1], 'amount', ARGV[2])
+end
+"""
+
+
+def _lender(lender_id) -> str:
+    # Routes pass the id as the client typed it, tasks as a UUID.
+    try:
+        return str(uuid.UUID(str(lender_id)))
+    except ValueError:
+        return str(lender_id)
+
+
+def _zset_key(lender_id) -> str:
+    return f"lender-matches:{_lender(lender_id)}"
+
+
+def _ready_key(lender_id) -> str:
+    return f"lender-matches:{_lender(lender_id)}:ready"
+
+
+def _gen_key(lender_id) -> str:
+    return f"lender-matches:{_lender(lender_id)}:gen"
+
+
+def _hash_key(lender_id, borrower_id) -> str:
+    return f"lender-match:{_lender(lender_id)}:{borrower_id}"
+
+
+def _member(borrower_id) -> str:
+    # Zero-padded so that equal scores rank by borrower id, as in Postgres.
+    return f"{int(borrower_id):010d}"
+
+
+def match_rows_query(
+    db: Session,
+    lender_id,
+    after: Optional[Tuple[float, int]] = None,
+    min_score: Optional[float] = None,
+    tiers: Optional[Sequence[MatchTier]] = None,
+    program: Optional[str] = None
+):
+    """Active matches of a lender, ordered by (match_score, borrower_id)
+    descending and starting after the `after` key. Only the columns the
+    match list shows are selected."""
+    query = db.query(
+        LoanMatch.id, LoanMatch.borrower_id, LoanMatch.match_score, LoanMatch.match_tier,
+        LoanMatch.matched_program_name, Borrower.business_name, Borrower.loan_amount
+    ).join(Borrower, Borrower.id == LoanMatch.borrower_id).filter(
+        LoanMatch.lender_id == lender_id,
+        LoanMatch.is_active == True
+    )
+    if after is not None:
+        query = query.filter(tuple_(LoanMatch.match_score, LoanMatch.borrower_id) < tuple_(*after))
+    if min_score is not None:
+        query = query.filter(LoanMatch.match_score >= min_score)
+    if tiers:
+        query = query.filter(LoanMatch.match_tier.in_(tiers))
+    if program is not None:
+        query = query.filter(LoanMatch.matched_program_name == program)
+
+    return query.order_by(LoanMatch.match_score.desc(), LoanMatch.borrower_id.desc())
+
+
+def match_rows(db: Session, lender_id, after=None, limit: Optional[int] = None, **filters) -> List[Dict[str, Any]]:
+    query = match_rows_query(db, lender_id, after=after, **filters)
+    if limit is not None:
+        query = query.limit(limit)
+
+    return [
+        {
+            "id": row[0],
+            "borrower_id": row[1],
+            "score": row[2] or 0.0,
+            "tier": row[3].name,
+            "program": row[4] or "",
+            "name": row[5],
+            "amount": row[6],
+        }
+        for row in query
+    ]
+
+
+def _entry(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "amount": row["amount"],
+        "tier": row["tier"],
+        "program": row["program"],
+    }
+
+
+class MatchIndex:
+    """Redis serving index for GET /lenders/{lender_id}/matches."""
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    def generation(self, lender_id) -> str:
+        return self.redis.get(_gen_key(lender_id)) or "0"
+
+    def read(
+        self,
+        lender_id,
+        after: Optional[Tuple[float, int]] = None,
+        limit: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Same page as match_rows without tier/program filters. None when
+        the index is cold or no longer holds the `after` key."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.exists(_ready_key(lender_id))
+        if after is not None:
+            pipe.zscore(_zset_key(lender_id), _member(after[1]))
+            pipe.zrevrank(_zset_key(lender_id), _member(after[1]))
+        ready, *position = pipe.execute()
+        if not ready:
+            return None
+
+        start = 0
+        if after is not None:
+            score, rank = position
+            if score is None or rank is None or float(score) != after[0]:
+                return None
+            start = rank + 1
+        stop = -1 if limit is None else start + limit - 1
+
+        ranked = self.redis.zrevrange(_zset_key(lender_id), start, stop, withscores=True)
+        if min_score is not None:
+            ranked = [(member, score) for member, score in ranked if score >= min_score]
+
+        pipe = self.redis.pipeline(transaction=False)
+        for member, _ in ranked:
+            pipe.hgetall(_hash_key(lender_id, int(member)))
+        entries = pipe.execute() if ranked else []
+
+        results = []
+        for (member, score), entry in zip(ranked, entries):
+            if not entry:
+                return None
+            results.append({
+                "id": int(entry["id"]),
+                "borrower_id": int(member),
+                "score": score,
+                "tier": entry["tier"],
+                "program": entry["program"],
+                "name": entry["name"],
+                "amount": float(entry["amount"]),
+            })
+        return results
+
+    def rebuild(self, lender_id, rows: Iterable[Dict[str, Any]], generation: str) -> bool:
+        """Replaces the lender's index with `rows` (read from Postgres after
+        `generation` was observed). Gives up if a change was committed since."""
+        rows = list(rows)
+        zset_key = _zset_key(lender_id)
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(_gen_key(lender_id))
+                if (pipe.get(_gen_key(lender_id)) or "0") != generation:
+                    return False
+                stale = set(pipe.zrange(zset_key, 0, -1)) - {_member(row["borrower_id"]) for row in rows}
+
+                pipe.multi()
+                pipe.delete(zset_key)
+                for row in rows:
+                    pipe.zadd(zset_key, {_member(row["borrower_id"]): row["score"]})
+                    hash_key = _hash_key(lender_id, row["borrower_id"])
+                    pipe.hset(hash_key, mapping=_entry(row))
+                    pipe.expire(hash_key, MATCH_INDEX_TTL)
+                for member in stale:
+                    pipe.delete(_hash_key(lender_id, int(member)))
+                pipe.expire(zset_key, MATCH_INDEX_TTL)
+                pipe.set(_ready_key(lender_id), 1, ex=MATCH_INDEX_TTL)
+                pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    def apply(self, lender_id, rows: Sequence[Dict[str, Any]], removed: Sequence[int]):
+        """Records committed changes: bumps the generation and, if the index
+        is warm, updates it in place."""
+        zset_key = _zset_key(lender_id)
+        pipe = self.redis.pipeline()
+        pipe.incr(_gen_key(lender_id))
+        pipe.expire(_gen_key(lender_id), MATCH_INDEX_TTL * 2)
+        pipe.exists(_ready_key(lender_id))
+        _, _, ready = pipe.execute()
+        if not ready:
+            return
+
+        pipe = self.redis.pipeline()
+        for borrower_id in removed:
+            pipe.zrem(zset_key, _member(borrower_id))
+            pipe.delete(_hash_key(lender_id, borrower_id))
+        for row in rows:
+            hash_key = _hash_key(lender_id, row["borrower_id"])
+            pipe.hset(hash_key, mapping=_entry(row))
+            pipe.expire(hash_key, MATCH_INDEX_TTL)
+            pipe.zadd(zset_key, {_member(row["borrower_id"]): row["score"]})
+        pipe.execute()
+
+    def patch_borrower(self, lender_ids: Iterable[Any], borrower_id: int, name: str, amount: float):
+        """Records a new name or loan amount of a borrower in the entries
+        other lenders already hold."""
+        pipe = self.redis.pipeline(transaction=False)
+        for lender_id in lender_ids:
+            pipe.eval(
+                _PATCH_BORROWER, 2, _gen_key(lender_id), _hash_key(lender_id, borrower_id),
+                name, amount, MATCH_INDEX_TTL * 2
+            )
+        pipe.execute()
+
+
+def sync_match_index(redis, db: Session, upserted: Sequence[Tuple[Any, int]], deleted: Sequence[Tuple[Any, int]]):
+    """Pushes committed (lender_id, borrower_id) changes into the index.
+    Failures are logged; the index then heals when its keys expire."""
+    if not upserted and not deleted:
+        return
+    try:
+        by_lender: Dict[Any, Tuple[List[Dict[str, Any]], List[int]]] = {}
+        for lender_id, borrower_id in deleted:
+            by_lender.setdefault(lender_id, ([], []))[1].append(borrower_id)
+
+        upserted = list(upserted)
+        for start in range(0, len(upserted), _ROW_BATCH):
+            pairs = upserted[start:start + _ROW_BATCH]
+            rows = db.query(
+                LoanMatch.lender_id, LoanMatch.id, LoanMatch.borrower_id, LoanMatch.match_score,
+                LoanMatch.match_tier, LoanMatch.matched_program_name,
+                Borrower.business_name, Borrower.loan_amount
+            ).join(Borrower, Borrower.id == LoanMatch.borrower_id).filter(
+                tuple_(LoanMatch.lender_id, LoanMatch.borrower_id).in_(pairs),
+                LoanMatch.is_active == True
+            )
+            for row in rows:
+                by_lender.setdefault(row[0], ([], []))[0].append({
+                    "id": row[1],
+                    "borrower_id": row[2],
+                    "score": row[3] or 0.0,
+                    "tier": row[4].name,
+                    "program": row[5] or "",
+                    "name": row[6],
+                    "amount": row[7],
+                })
+
+        index = MatchIndex(redis)
+        for lender_id, (rows, removed) in by_lender.items():
+            index.apply(lender_id, rows, removed)
+    except Exception as e:
+        print(f"Match index update failed: {e}")
+
+
+def sync_borrower_fields(redis, borrowers: Sequence[Borrower], matches: Iterable[LoanMatch], upserted: Sequence[Tuple[Any, int]]):
+    """An application re-submitted with the same email updates the borrower in
+    place, so its unchanged matches can carry an old name or loan amount.
+    Patches the entries of `matches` that sync_match_index did not rewrite."""
+    fresh = set(upserted)
+    lenders_by_borrower: Dict[int, set] = {}
+    for match in matches:
+        if (match.lender_id, match.borrower_id) not in fresh:
+            lenders_by_borrower.setdefault(match.borrower_id, set()).add(match.lender_id)
+    if not lenders_by_borrower:
+        return
+    try:
+        index = MatchIndex(redis)
+        for borrower in borrowers:
+            lender_ids = lenders_by_borrower.get(borrower.id)
+            if lender_ids:
+                index.patch_borrower(lender_ids, borrower.id, borrower.business_name, borrower.loan_amount)
+    except Exception as e:
+        print(f"Match index update failed: {e}")
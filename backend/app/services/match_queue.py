@@ -0,0 +1,309 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+# Jobs are "<kind>:<key>" strings, e.g. "borrower:42" or "lender:<uuid>". A job
+# is in PENDING from enqueue until a worker starts it, so resubmitting the same
+# borrower or lender while it waits collapses into the queued job.
+class QueueKeys:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.ready = f"{prefix}:ready"
+        self.pending = f"{prefix}:pending"
+        self.delayed = f"{prefix}:delayed"
+        self.running = f"{prefix}:running"
+        self.dead = f"{prefix}:dead"
+        self.attempts = f"{prefix}:attempts"
+        self.stats = f"{prefix}:stats"
+        self.workers = f"{prefix}:workers"
+
+    def processing(self, worker_id: str) -> str:
+        return f"{self.prefix}:processing:{worker_id}"
+
+    def heartbeat(self, worker_id: str) -> str:
+        return f"{self.prefix}:heartbeat:{worker_id}"
+
+
+# Extraction jobs run for minutes, so they get their own queue and threads
+# and never hold up matching.
+MATCH_QUEUE = QueueKeys("match-queue")
+EXTRACTION_QUEUE = QueueKeys("extraction-queue")
+
+BORROWER = "borrower"
+BORROWER_BATCH = "borrower-batch"
+LENDER = "lender"
+EXTRACTION = "extraction"
+
+WORKER_CONCURRENCY = int(os.getenv("MATCH_WORKER_CONCURRENCY", "4"))
+EXTRACTION_WORKER_CONCURRENCY = int(os.getenv("EXTRACTION_WORKER_CONCURRENCY", "2"))
+MAX_ATTEMPTS = int(os.getenv("MATCH_JOB_MAX_ATTEMPTS", "5"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("MATCH_JOB_RETRY_BACKOFF", "5"))
+BUSY_RETRY_SECONDS = 1.0
+HEARTBEAT_TTL = 30
+BATCH_TTL = 7 * 24 * 3600
+CLAIM_TIMEOUT = 1
+
+_ENQUEUE = """
+if redis.call('SADD', KEYS[1], ARGV[1]) == 1 then
+    redis.call('LPUSH', KEYS[2], ARGV[1])
+    redis.call('HINCRBY', KEYS[3], 'enqueued', 1)
+    return 1
+end
+redis.call('HINCRBY', KEYS[3], 'coalesced', 1)
+return 0
+"""
+
+# Starts a claimed job unless the same job is still running elsewhere, in
+# which case it goes back to pending and is retried shortly.
+_START = """
+redis.call('SREM', KEYS[1], ARGV[1])
+if redis.call('HSETNX', KEYS[2], ARGV[1], ARGV[2]) == 1 then
+    return 1
+end
+redis.call('LREM', KEYS[4], 1, ARGV[1])
+if redis.call('SADD', KEYS[1], ARGV[1]) == 1 then
+    redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+end
+return 0
+"""
+
+_FINISH = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+end
+redis.call('LREM', KEYS[2], 1, ARGV[1])
+"""
+
+_RETRY = """
+if redis.call('SADD', KEYS[1], ARGV[1]) == 1 then
+    redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+end
+"""
+
+_PROMOTE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, job in ipairs(due) do
+    redis.call('ZREM', KEYS[1], job)
+    redis.call('LPUSH', KEYS[2], job)
+end
+return #due
+"""
+
+# Requeues everything a worker without a heartbeat had claimed.
+_RECOVER = """
+local jobs = redis.call('LRANGE', KEYS[1], 0, -1)
+for _, job in ipairs(jobs) do
+    if redis.call('HGET', KEYS[2], job) == ARGV[1] then
+        redis.call('HDEL', KEYS[2], job)
+    end
+    if redis.call('SADD', KEYS[3], job) == 1 then
+        redis.call('LPUSH', KEYS[4], job)
+    end
+end
+redis.call('DEL', KEYS[1])
+redis.call('SREM', KEYS[5], ARGV[1])
+return #jobs
+"""
+
+
+def job_id(kind: str, key) -> str:
+    return f"{kind}:{key}"
+
+
+def queue_for(kind: str) -> QueueKeys:
+    return EXTRACTION_QUEUE if kind == EXTRACTION else MATCH_QUEUE
+
+
+def enqueue_match_job(redis, kind: str, key) -> bool:
+    """Queues a matching job; False when one for the same key is already waiting."""
+    queue = queue_for(kind)
+    return bool(redis.eval(_ENQUEUE, 3, queue.pending, queue.ready, queue.stats, job_id(kind, key)))
+
+
+async def enqueue_match_job_async(redis, kind: str, key) -> bool:
+    queue = queue_for(kind)
+    return bool(await redis.eval(_ENQUEUE, 3, queue.pending, queue.ready, queue.stats, job_id(kind, key)))
+
+
+def _batch_key(token: str) -> str:
+    return f"{MATCH_QUEUE.prefix}:batch:{token}"
+
+
+def enqueue_borrower_batch(redis, borrower_ids: List[int]) -> str:
+    """Queues one job matching a whole batch; the ids live under their own key."""
+    token = uuid.uuid4().hex
+    redis.set(_batch_key(token), json.dumps(list(borrower_ids)), ex=BATCH_TTL)
+    enqueue_match_job(redis, BORROWER_BATCH, token)
+    return token
+
+
+def batch_borrower_ids(redis, token: str) -> Optional[List[int]]:
+    payload = redis.get(_batch_key(token))
+    return None if payload is None else json.loads(payload)
+
+
+def drop_batch(redis, token: str):
+    redis.delete(_batch_key(token))
+
+
+async def queue_stats(redis, queue: QueueKeys = MATCH_QUEUE) -> Dict[str, int]:
+    """Queue depths and lifetime counters, for /internal/match-queue."""
+    pipe = redis.pipeline(transaction=False)
+    pipe.llen(queue.ready)
+    pipe.zcard(queue.delayed)
+    pipe.hlen(queue.running)
+    pipe.llen(queue.dead)
+    pipe.smembers(queue.workers)
+    pipe.hgetall(queue.stats)
+    ready, delayed, running, dead, workers, counters = await pipe.execute()
+
+    alive = 0
+    for worker_id in workers:
+        if await redis.exists(queue.heartbeat(worker_id)):
+            alive += 1
+
+    stats = {
+        "ready": ready,
+        "delayed": delayed,
+        "running": running,
+        "dead": dead,
+        "workers": alive,
+    }
+    for name in ("enqueued", "coalesced", "completed", "failed", "retried", "dead_lettered"):
+        stats[name] = int(counters.get(name, 0))
+    return stats
+
+
+class MatchWorker:
+    """Runs the jobs of one queue on `concurrency` threads.
+
+    Every thread claims jobs with BLMOVE into its own processing list and
+    refreshes a heartbeat key; lists left behind by workers whose heartbeat
+    expired are requeued. Failed jobs are retried with exponential backoff
+    and dead-lettered after MAX_ATTEMPTS.
+    """
+
+    def __init__(
+        self,
+        redis,
+        handlers: Dict[str, Callable[[str], None]],
+        concurrency: int = WORKER_CONCURRENCY,
+        queue: QueueKeys = MATCH_QUEUE,
+    ):
+        self.redis = redis
+        self.handlers = handlers
+        self.concurrency = max(1, concurrency)
+        self.queue = queue
+        self.prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.worker_ids = [f"{self.prefix}:{n}" for n in range(self.concurrency)]
+        self._stop = threading.Event()
+
+    def run(self):
+        self._heartbeat()
+        self.recover_dead_workers()
+
+        threads = [threading.Thread(target=self._heartbeat_loop, daemon=True)]
+        threads += [
+            threading.Thread(target=self._work, args=(worker_id,), daemon=True)
+            for worker_id in self.worker_ids
+        ]
+        for thread in threads:
+            thread.start()
+        print(f"----{self.queue.prefix} worker {self.prefix} running {self.concurrency} threads----")
+
+        for thread in threads:
+            thread.join()
+
+        for worker_id in self.worker_ids:
+            self.redis.delete(self.queue.heartbeat(worker_id))
+            self.redis.srem(self.queue.workers, worker_id)
+        print(f"----{self.queue.prefix} worker {self.prefix} stopped----")
+
+    def stop(self):
+        self._stop.set()
+
+    def _heartbeat(self):
+        pipe = self.redis.pipeline()
+        for worker_id in self.worker_ids:
+            pipe.set(self.queue.heartbeat(worker_id), self.prefix, ex=HEARTBEAT_TTL)
+            pipe.sadd(self.queue.workers, worker_id)
+        pipe.execute()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(HEARTBEAT_TTL / 3):
+            try:
+                self._heartbeat()
+                self.recover_dead_workers()
+            except Exception as e:
+                print(f"Match worker heartbeat failed: {e}")
+
+    def recover_dead_workers(self):
+        for worker_id in self.redis.smembers(self.queue.workers):
+            if worker_id in self.worker_ids or self.redis.exists(self.queue.heartbeat(worker_id)):
+                continue
+            queue = self.queue
+            requeued = self.redis.eval(
+                _RECOVER, 5, queue.processing(worker_id), queue.running, queue.pending, queue.ready, queue.workers, worker_id
+            )
+            if requeued:
+                print(f"Requeued {requeued} jobs from dead match worker {worker_id}")
+
+    def _work(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                self.work_once(worker_id)
+            except Exception as e:
+                print(f"Match worker {worker_id} error: {e}")
+                self._stop.wait(1)
+
+    def work_once(self, worker_id: str) -> Optional[str]:
+        """Claims and runs one job as `worker_id`; the job, or None when
+        nothing was ready or it is still running elsewhere."""
+        processing = self.queue.processing(worker_id)
+        self.redis.eval(_PROMOTE, 2, self.queue.delayed, self.queue.ready, time.time())
+        job = self.redis.blmove(self.queue.ready, processing, CLAIM_TIMEOUT, "RIGHT", "LEFT")
+        if job is None:
+            return None
+        started = self.redis.eval(
+            _START, 4, self.queue.pending, self.queue.running, self.queue.delayed, processing,
+            job, worker_id, time.time() + BUSY_RETRY_SECONDS
+        )
+        if not started:
+            return None
+        self._run(worker_id, processing, job)
+        return job
+
+    def _run(self, worker_id: str, processing: str, job: str):
+        kind, _, key = job.partition(":")
+        try:
+            handler = self.handlers[kind]
+            handler(key)
+        except Exception as e:
+            print(f"Match job {job} failed: {e}")
+            self._failed(job, e)
+        else:
+            pipe = self.redis.pipeline()
+            pipe.hdel(self.queue.attempts, job)
+            pipe.hincrby(self.queue.stats, "completed", 1)
+            pipe.execute()
+        finally:
+            self.redis.eval(_FINISH, 2, self.queue.running, processing, job, worker_id)
+
+    def _failed(self, job: str, error: Exception):
+        attempts = self.redis.hincrby(self.queue.attempts, job, 1)
+        self.redis.hincrby(self.queue.stats, "failed", 1)
+        if attempts < MAX_ATTEMPTS:
+            retry_at = time.time() + RETRY_BACKOFF_SECONDS * (2 ** (attempts - 1))
+            self.redis.eval(_RETRY, 2, self.queue.pending, self.queue.delayed, job, retry_at)
+            self.redis.hincrby(self.queue.stats, "retried", 1)
+            return
+
+        pipe = self.redis.pipeline()
+        pipe.lpush(self.queue.dead, json.dumps({"job": job, "error": str(error), "attempts": attempts, "failed_at": time.time()}))
+        pipe.hdel(self.queue.attempts, job)
+        pipe.hincrby(self.queue.stats, "dead_lettered", 1)
+        pipe.execute()
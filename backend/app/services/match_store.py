@@ -0,0 +1,160 @@
+import csv
+import io
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.metrics import STORE_SECONDS
+from app.models.model import LoanMatch
+
+# Above this many inserted/changed rows the upsert goes through COPY into a
+# staging table instead of multi-row INSERT statements.
+COPY_THRESHOLD = int(os.getenv("MATCH_COPY_THRESHOLD", "20000"))
+UPSERT_BATCH_SIZE = 5000
+DELETE_BATCH_SIZE = 10000
+
+_VALUE_COLUMNS = ("match_score", "match_tier", "matched_program_name", "is_active")
+
+
+def _values(match: LoanMatch) -> Tuple:
+    return tuple(getattr(match, column) for column in _VALUE_COLUMNS)
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class MatchStore:
+    """Persists match sets as a diff against what loan_matches already holds.
+
+    Unchanged pairs are not touched (created_at is kept), changed and new
+    pairs are upserted on (lender_id, borrower_id) and only pairs that are no
+    longer matched are deleted. Nothing is committed here.
+
+    The (lender_id, borrower_id) pairs written and deleted are collected in
+    `upserted_pairs` and `deleted_pairs` for the Redis match index.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.upserted_pairs: List[Tuple] = []
+        self.deleted_pairs: List[Tuple] = []
+
+    def replace_for_lender(self, lender_id, matches: List[LoanMatch]) -> Tuple[int, int]:
+        """Makes `matches` the lender's complete match set. Returns (upserted, deleted)."""
+        existing = self._existing(LoanMatch.lender_id == lender_id, LoanMatch.borrower_id)
+        return self._apply(
+            existing, matches, lambda m: m.borrower_id, lambda key: (lender_id, key),
+            LoanMatch.lender_id == lender_id, LoanMatch.borrower_id
+        )
+
+    def replace_for_borrower(self, borrower_id: int, matches: List[LoanMatch]) -> Tuple[int, int]:
+        """Makes `matches` the borrower's complete match set. Returns (upserted, deleted)."""
+        existing = self._existing(LoanMatch.borrower_id == borrower_id, LoanMatch.lender_id)
+        return self._apply(
+            existing, matches, lambda m: m.lender_id, lambda key: (key, borrower_id),
+            LoanMatch.borrower_id == borrower_id, LoanMatch.lender_id
+        )
+
+    def replace_for_borrowers(self, borrower_ids: List[int], matches: List[LoanMatch]) -> Tuple[int, int]:
+        """Makes `matches` the complete match set of every borrower in `borrower_ids`."""
+        owner_filter = LoanMatch.borrower_id.in_(borrower_ids)
+        rows = self.db.query(
+            LoanMatch.borrower_id, LoanMatch.lender_id, *[getattr(LoanMatch, c) for c in _VALUE_COLUMNS]
+        ).filter(owner_filter)
+        existing = {(row[0], row[1]): tuple(row[2:]) for row in rows}
+        return self._apply(
+            existing, matches, lambda m: (m.borrower_id, m.lender_id), lambda key: (key[1], key[0]),
+            owner_filter, tuple_(LoanMatch.borrower_id, LoanMatch.lender_id)
+        )
+
+    def _existing(self, owner_filter, key_column) -> Dict:
+        with STORE_SECONDS.labels("load").time():
+            rows = self.db.query(key_column, *[getattr(LoanMatch, c) for c in _VALUE_COLUMNS]).filter(owner_filter)
+            return {row[0]: tuple(row[1:]) for row in rows}
+
+    def _apply(self, existing: Dict, matches: List[LoanMatch], key_of, pair_of, owner_filter, key_column) -> Tuple[int, int]:
+        # One row per pair; ON CONFLICT cannot touch the same row twice in a statement.
+        best: Dict = {}
+        for match in matches:
+            key = key_of(match)
+            current = best.get(key)
+            if current is None or match.match_score > current.match_score:
+                best[key] = match
+
+        changed = [match for key, match in best.items() if existing.get(key) != _values(match)]
+        vanished = [key for key in existing if key not in best]
+        with STORE_SECONDS.labels("delete").time():
+            for chunk in _chunks(vanished, DELETE_BATCH_SIZE):
+                self.db.query(LoanMatch).filter(owner_filter, key_column.in_(chunk)).delete(synchronize_session=False)
+
+        if len(changed) > COPY_THRESHOLD:
+            with STORE_SECONDS.labels("copy_upsert").time():
+                self._copy_upsert(changed)
+        else:
+            with STORE_SECONDS.labels("upsert").time():
+                for chunk in _chunks(changed, UPSERT_BATCH_SIZE):
+                    self._upsert(chunk)
+
+        self.upserted_pairs.extend((m.lender_id, m.borrower_id) for m in changed)
+        self.deleted_pairs.extend(pair_of(key) for key in vanished)
+        return len(changed), len(vanished)
+
+    def _upsert(self, matches: List[LoanMatch]):
+        stmt = insert(LoanMatch).values([
+            {
+                "lender_id": m.lender_id,
+                "borrower_id": m.borrower_id,
+                **dict(zip(_VALUE_COLUMNS, _values(m))),
+            }
+            for m in matches
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LoanMatch.lender_id, LoanMatch.borrower_id],
+            set_={column: stmt.excluded[column] for column in _VALUE_COLUMNS},
+        )
+        self.db.execute(stmt)
+
+    def _copy_upsert(self, matches: List[LoanMatch]):
+        """COPY into a transaction-scoped staging table, then one INSERT ... SELECT."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for m in matches:
+            # csv.writer emits None as an unquoted empty field, which COPY reads as NULL.
+            writer.writerow([
+                m.lender_id, m.borrower_id, m.match_score, m.match_tier.name,
+                m.matched_program_name, m.is_active,
+            ])
+        buffer.seek(0)
+
+        self.db.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS loan_matches_staging ("
+            "lender_id uuid, borrower_id integer, match_score double precision, "
+            "match_tier matchtier, matched_program_name varchar, is_active boolean"
+            ") ON COMMIT DELETE ROWS"
+        ))
+        self.db.execute(text("TRUNCATE loan_matches_staging"))
+
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                "COPY loan_matches_staging (lender_id, borrower_id, match_score, match_tier, "
+                "matched_program_name, is_active) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+
+        self.db.execute(text(
+            "INSERT INTO loan_matches (lender_id, borrower_id, match_score, match_tier, "
+            "matched_program_name, is_active) "
+            "SELECT lender_id, borrower_id, match_score, match_tier, "
+            "matched_program_name, is_active FROM loan_matches_staging "
+            "ON CONFLICT (lender_id, borrower_id) DO UPDATE SET "
+            "match_score = EXCLUDED.match_score, match_tier = EXCLUDED.match_tier, "
+            "matched_program_name = EXCLUDED.matched_program_name, is_active = EXCLUDED.is_active"
+        ))
@@ -0,0 +1,274 @@
+"""Text and table extraction from lender guideline PDFs.
+
+Kept apart from the Gemini client so the parse worker processes import only
+the PDF libraries. Two backends produce the same page and table blocks:
+PyMuPDF (fast) and pdfplumber (slower, steadier table detection).
+PDF_BACKEND picks the default and callers may pick one per document. Pages
+whose PyMuPDF tables look unreliable, or where it finds no table under text
+laid out in columns, are parsed again with pdfplumber.
+
+Short documents are parsed in the calling thread; longer ones are split
+into page ranges and parsed across a process pool.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+import pdfplumber
+import pymupdf
+
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pymupdf")
+# Share of non-empty cells below which a PyMuPDF table counts as misdetected.
+TABLE_MIN_FILL = float(os.getenv("PDF_TABLE_MIN_FILL", "0.5"))
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+PAGES_PER_CHUNK = int(os.getenv("PDF_PAGES_PER_CHUNK", "8"))
+# Below this many pages the pool start-up costs more than it saves.
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+# Lines sharing this many column starts make a page look tabular.
+ALIGNED_MIN_ROWS = 3
+ALIGNED_MIN_COLUMNS = 3
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# (page text blocks, table blocks, page numbers to parse again with pdfplumber)
+ParsedPages = Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[int]]
+
+
+def table_fill(rows: List[List[Any]]) -> float:
+    """Share of non-empty cells; 0 for anything under 2 rows or 2 columns."""
+    if len(rows) < 2 or max((len(row) for row in rows), default=0) < 2:
+        return 0.0
+    cells = [cell for row in rows for cell in row]
+    filled = sum(1 for cell in cells if cell is not None and str(cell).strip())
+    return filled / len(cells)
+
+
+def has_aligned_columns(words: List[Tuple]) -> bool:
+    """Whether PyMuPDF words (x0, y0, x1, y1, text, ...) form at least
+    ALIGNED_MIN_COLUMNS columns over ALIGNED_MIN_ROWS lines: a table laid out
+    with whitespace, or with too few rules to be detected."""
+    lines: Dict[int, List[Tuple]] = {}
+    for word in words:
+        lines.setdefault(round(word[3]), []).append(word)
+
+    starts: Dict[int, int] = {}
+    for line in lines.values():
+        line.sort(key=lambda word: word[0])
+        # A gap wider than the line height separates cells, not words.
+        gap = max(word[3] - word[1] for word in line)
+        cells = [line[0][0]] + [
+            word[0] for previous, word in zip(line, line[1:]) if word[0] - previous[2] > gap
+        ]
+        if len(cells) < 2:
+            continue
+        for x in {round(x / 3) for x in cells}:
+            starts[x] = starts.get(x, 0) + 1
+
+    columns = sum(1 for rows in starts.values() if rows >= ALIGNED_MIN_ROWS)
+    return columns >= ALIGNED_MIN_COLUMNS
+
+
+class PdfplumberBackend:
+    name = "pdfplumber"
+
+    def page_count(self, pdf_path: str) -> int:
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+
+    def parse_pages(self, pdf_path: str, start: int = 0, stop: Optional[int] = None) -> ParsedPages:
+        text_blocks = []
+        table_blocks = []
+
+        with pdfplumber.open(pdf_path) as pdf:
+            pages = pdf.pages[start:stop]
+            for page_num, page in enumerate(pages, start=start + 1):
+
+                # ---- TEXT ----
+                text = page.extract_text()
+                if text:
+                    text_blocks.append({
+                        "page": page_num,
+                        "text": text
+                    })
+
+                # ---- TABLES ----
+                tables = page.extract_tables()
+                for t_idx, table in enumerate(tables):
+                    table_blocks.append({
+                        "page": page_num,
+                        "table_index": t_idx,
+                        "rows": table
+                    })
+
+                # Parsed layout objects are large; drop them once the page is done.
+                page.close()
+
+        return text_blocks, table_blocks, []
+
+
+class PyMuPDFBackend:
+    name = "pymupdf"
+
+    def page_count(self, pdf_path: str) -> int:
+        with pymupdf.open(pdf_path) as doc:
+            return doc.page_count
+
+    def parse_pages(self, pdf_path: str, start: int = 0, stop: Optional[int] = None) -> ParsedPages:
+        text_blocks = []
+        table_blocks = []
+        unreliable = []
+
+        with pymupdf.open(pdf_path) as doc:
+            stop = doc.page_count if stop is None else min(stop, doc.page_count)
+            for index in range(start, stop):
+                page = doc[index]
+                page_num = index + 1
+
+                text = page.get_text("text", sort=True).strip()
+                if text:
+                    text_blocks.append({
+                        "page": page_num,
+                        "text": text
+                    })
+
+                tables = self._find_tables(page)
+                for t_idx, table in enumerate(tables):
+                    rows = table.extract()
+                    if table_fill(rows) < TABLE_MIN_FILL and page_num not in unreliable:
+                        unreliable.append(page_num)
+                    table_blocks.append({
+                        "page": page_num,
+                        "table_index": t_idx,
+                        "rows": rows
+                    })
+                if not tables and text and has_aligned_columns(page.get_text("words")):
+                    unreliable.append(page_num)
+
+        return text_blocks, table_blocks, unreliable
+
+    @staticmethod
+    def _find_tables(page) -> list:
+        """Ruled tables only, searched within the area covered by vector
+        graphics. Table detection dominates PyMuPDF parse time, and most
+        guideline pages are prose without any drawings."""
+        drawings = page.get_drawings()
+        if not drawings:
+            return []
+        # Not Rect |=, which skips the zero-height rects of horizontal rules.
+        rects = [drawing["rect"] for drawing in drawings]
+        area = pymupdf.Rect(
+            min(rect.x0 for rect in rects), min(rect.y0 for rect in rects),
+            max(rect.x1 for rect in rects), max(rect.y1 for rect in rects),
+        )
+        return page.find_tables(clip=area + (-5, -5, 5, 5), paths=drawings).tables
+
+
+BACKENDS = {backend.name: backend for backend in (PyMuPDFBackend(), PdfplumberBackend())}
+
+
+def get_backend(name: Optional[str] = None):
+    name = name or PDF_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend {name!r}; expected one of {', '.join(sorted(BACKENDS))}")
+    return BACKENDS[name]
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """One pool per process. Spawned, because the API calls this from its
+    thread pool."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def page_count(pdf_path: str, backend: Optional[str] = None) -> int:
+    return get_backend(backend).page_count(pdf_path)
+
+
+def page_ranges(count: int, size: int) -> List[Tuple[int, int]]:
+    """[start, stop) page index ranges of at most `size` pages."""
+    size = max(1, size)
+    return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+
+def parse_pages(pdf_path: str, start: int = 0, stop: Optional[int] = None, backend: Optional[str] = None) -> ParsedPages:
+    """Blocks of pages [start, stop); page numbers are 1-based."""
+    return get_backend(backend).parse_pages(pdf_path, start, stop)
+
+
+def _parse_parallel(pdf_path: str, count: int, backend: str) -> ParsedPages:
+    executor = _get_executor()
+    futures = [
+        executor.submit(parse_pages, pdf_path, start, stop, backend)
+        for start, stop in page_ranges(count, PAGES_PER_CHUNK)
+    ]
+    text_blocks = []
+    table_blocks = []
+    unreliable = []
+    # Submission order is page order.
+    for future in futures:
+        texts, tables, pages = future.result()
+        text_blocks.extend(texts)
+        table_blocks.extend(tables)
+        unreliable.extend(pages)
+    return text_blocks, table_blocks, unreliable
+
+
+def _with_fallback(pdf_path: str, parsed: ParsedPages) -> ParsedPages:
+    """Replaces the blocks of every flagged page with pdfplumber's."""
+    text_blocks, table_blocks, unreliable = parsed
+    if not unreliable:
+        return parsed
+    print(f"Low-confidence or missing tables on pages {unreliable} of {pdf_path}, parsing them with pdfplumber")
+    redo = set(unreliable)
+    text_blocks = [block for block in text_blocks if block["page"] not in redo]
+    table_blocks = [block for block in table_blocks if block["page"] not in redo]
+    for page_num in unreliable:
+        texts, tables, _ = parse_pages(pdf_path, page_num - 1, page_num, PdfplumberBackend.name)
+        text_blocks.extend(texts)
+        table_blocks.extend(tables)
+    text_blocks.sort(key=lambda block: block["page"])
+    table_blocks.sort(key=lambda block: (block["page"], block["table_index"]))
+    return text_blocks, table_blocks, []
+
+
+def extract_text_and_tables(pdf_path: str, backend: Optional[str] = None, pool: bool = False) -> Dict[str, Any]:
+    """`pool` sends even short documents to the process pool, for callers
+    parsing several documents from concurrent threads."""
+    backend = get_backend(backend).name
+    count = page_count(pdf_path, backend)
+    parsed = None
+
+    if PDF_PARSE_WORKERS > 1 and (pool or count >= PARALLEL_MIN_PAGES):
+        try:
+            parsed = _parse_parallel(pdf_path, count, backend)
+        except BrokenProcessPool as e:
+            print(f"PDF parse pool failed, parsing in-process: {e}")
+            _reset_executor()
+
+    if parsed is None:
+        parsed = parse_pages(pdf_path, backend=backend)
+    text_blocks, table_blocks, _ = _with_fallback(pdf_path, parsed)
+
+    return {
+        "text": "\n\n".join(f"[Page {block['page']}]\n{block['text']}" for block in text_blocks),
+        "pages": text_blocks,
+        "tables": table_blocks
+    }
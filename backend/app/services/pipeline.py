@@ -1,6 +1,6 @@
 from typing import Dict, Any, List
 import re
-from app.schemas.lender import Operator
+from app.schemas.lender import LenderPolicyCreate, Operator
 
 class DataCleaner:
     def __init__(self, extracted_data: Dict[str, Any]):
@@ -95,4 +95,13 @@ class DataCleaner:
     def _ensure_list(self, val):
         if val is None: return []
         if isinstance(val, list): return val
-        return [str(val)]
\ No newline at end of file
+        return [str(val)]
+
+
+def clean_extracted_policy(raw_schema: LenderPolicyCreate) -> LenderPolicyCreate:
+    """Normalizes an extracted policy into what the policy editor accepts."""
+    raw_dict = raw_schema.model_dump(exclude_none=True)
+    cleaner = DataCleaner(raw_dict)
+    cleaned_data = cleaner.normalize()
+    cleaned_data["lender_name"] = raw_schema.lender_name
+    return LenderPolicyCreate.model_validate(cleaned_data)
@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.model import LenderPolicy
+from app.matching_engine.compiler import get_compiled_policy
+from app.matching_engine.policy_index import PolicyIndex
+
+POLICY_CHANNEL = "policy-cache:invalidate"
+INVALIDATE_ALL = "*"
+
+
+class ActivePolicyCache:
+    """Process-wide snapshot of every active LenderPolicy.
+
+    Policies are loaded once, detached from their session and compiled, then
+    served to borrower matching without touching Postgres. A lender's entry is
+    reloaded on the next read after invalidate(lender_id); invalidations from
+    other workers arrive over Redis pub/sub (see listen_for_policy_changes).
+    """
+
+    def __init__(self):
+        self._by_lender: Dict[str, Tuple[LenderPolicy, ...]] = {}
+        self._active: Tuple[LenderPolicy, ...] = ()
+        self._index: Optional[PolicyIndex] = None
+        self._loaded = False
+        self._generation = 0
+        self._stale: Set[str] = set()
+        self._state_lock = threading.Lock()
+        self._refresh_lock = threading.RLock()
+
+    def load(self, db: Session):
+        with self._refresh_lock:
+            with self._state_lock:
+                self._stale.clear()
+                generation = self._generation
+            policies = db.query(LenderPolicy).filter(LenderPolicy.is_active == True).all()
+
+            by_lender: Dict[str, List[LenderPolicy]] = {}
+            for policy in policies:
+                self._detach(db, policy)
+                by_lender.setdefault(str(policy.lender_id), []).append(policy)
+
+            self._by_lender = {key: tuple(value) for key, value in by_lender.items()}
+            self._rebuild()
+            with self._state_lock:
+                self._loaded = generation == self._generation
+
+    def get_active_policies(self, db: Session) -> List[LenderPolicy]:
+        self._ensure_fresh(db)
+        return list(self._active)
+
+    def get_index(self, db: Session) -> PolicyIndex:
+        """PolicyIndex over the current snapshot, rebuilt only after a change."""
+        self._ensure_fresh(db)
+        index = self._index
+        if index is None:
+            with self._refresh_lock:
+                index = self._index
+                if index is None:
+                    index = self._index = PolicyIndex(self._active)
+        return index
+
+    def _ensure_fresh(self, db: Session):
+        if not self._loaded or self._stale:
+            with self._refresh_lock:
+                if not self._loaded:
+                    self.load(db)
+                else:
+                    self._refresh_stale(db)
+
+    def invalidate(self, lender_id: Optional[str] = None):
+        key = _lender_key(lender_id)
+        with self._state_lock:
+            if key is None:
+                self._loaded = False
+                self._generation += 1
+                self._stale.clear()
+            else:
+                self._stale.add(key)
+
+    def _refresh_stale(self, db: Session):
+        with self._state_lock:
+            stale, self._stale = self._stale, set()
+        if not stale:
+            return
+
+        policies = db.query(LenderPolicy).filter(
+            LenderPolicy.lender_id.in_([uuid.UUID(key) for key in stale]),
+            LenderPolicy.is_active == True
+        ).all()
+
+        by_lender = dict(self._by_lender)
+        for key in stale:
+            by_lender.pop(key, None)
+        for policy in policies:
+            self._detach(db, policy)
+            key = str(policy.lender_id)
+            by_lender[key] = by_lender.get(key, ()) + (policy,)
+
+        self._by_lender = by_lender
+        self._rebuild()
+
+    def _detach(self, db: Session, policy: LenderPolicy):
+        db.expunge(policy)
+        get_compiled_policy(policy)
+
+    def _rebuild(self):
+        self._active = tuple(
+            policy for policies in self._by_lender.values() for policy in policies
+        )
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+
+def _lender_key(lender_id) -> Optional[str]:
+    if lender_id is None or lender_id == INVALIDATE_ALL:
+        return None
+    try:
+        return str(uuid.UUID(str(lender_id)))
+    except ValueError:
+        return None
+
+
+active_policy_cache = ActivePolicyCache()
+
+
+async def publish_policy_change(redis, lender_id: Optional[str] = None):
+    """Tell every worker (this one included) to drop its cached policies for a lender."""
+    active_policy_cache.invalidate(lender_id)
+    try:
+        await redis.publish(POLICY_CHANNEL, INVALIDATE_ALL if lender_id is None else str(lender_id))
+    except Exception as e:
+        print(f"Policy cache invalidation not published for Lender {lender_id}: {e}")
+
+
+async def listen_for_policy_changes(
+    redis,
+    cache: ActivePolicyCache = active_policy_cache,
+    subscribed: Optional[asyncio.Event] = None,
+):
+    """Applies invalidation messages until cancelled.
+
+    Messages published while the subscription is down are lost, so every
+    re-subscribe starts with a full invalidation.
+    """
+    reconnecting = False
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(POLICY_CHANNEL)
+            if reconnecting:
+                cache.invalidate()
+            if subscribed is not None:
+                subscribed.set()
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                cache.invalidate(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Policy cache subscription lost: {e}")
+            await asyncio.sleep(1)
+        finally:
+            reconnecting = True
+            await pubsub.aclose()
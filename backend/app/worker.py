@@ -0,0 +1,70 @@
+import asyncio
+import os
+import signal
+
+from app.core.metrics import start_metrics_server
+
+from app.redis_client import init_redis, get_sync_redis
+from app.services import borrower_task, extraction_jobs, lender_task
+from app.services.match_queue import (
+    BORROWER,
+    BORROWER_BATCH,
+    EXTRACTION,
+    EXTRACTION_QUEUE,
+    EXTRACTION_WORKER_CONCURRENCY,
+    LENDER,
+    WORKER_CONCURRENCY,
+    MatchWorker,
+    batch_borrower_ids,
+    drop_batch,
+)
+from app.services.policy_cache import listen_for_policy_changes
+
+
+def _run_borrower_batch(token: str):
+    redis = get_sync_redis()
+    borrower_ids = batch_borrower_ids(redis, token)
+    if borrower_ids is None:
+        print(f"Skipping borrower batch {token}: ids expired")
+        return
+    borrower_task.run_batch_matching_service(borrower_ids)
+    drop_batch(redis, token)
+
+
+HANDLERS = {
+    BORROWER: lambda key: borrower_task.run_matching_service(int(key)),
+    BORROWER_BATCH: _run_borrower_batch,
+    LENDER: lender_task.run_matching_for_lender,
+}
+
+EXTRACTION_HANDLERS = {
+    EXTRACTION: extraction_jobs.run_extraction_job,
+}
+
+
+async def main():
+    metrics_port = int(os.getenv("MATCH_WORKER_METRICS_PORT", "9100"))
+    if metrics_port:
+        start_metrics_server(metrics_port)
+        print(f"----Match worker metrics on :{metrics_port}/metrics----")
+
+    redis = await init_redis()
+    policy_listener = asyncio.create_task(listen_for_policy_changes(redis))
+
+    workers = [
+        MatchWorker(get_sync_redis(), HANDLERS, WORKER_CONCURRENCY),
+        MatchWorker(get_sync_redis(), EXTRACTION_HANDLERS, EXTRACTION_WORKER_CONCURRENCY, EXTRACTION_QUEUE),
+    ]
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: [worker.stop() for worker in workers])
+
+    try:
+        await asyncio.gather(*(asyncio.to_thread(worker.run) for worker in workers))
+    finally:
+        policy_listener.cancel()
+        await redis.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""Matching engine benchmarks.
+
+    python -m benchmarks run [--profile quick|full] [--only borrower,lender,helpers]
+                             [--output results.json] [--save-baseline]
+    python -m benchmarks compare [results.json] [--baseline benchmarks/baseline.json] [--threshold 0.15]
+    python -m benchmarks pdf [file.pdf ...] [--backends pdfplumber,pymupdf,pymupdf+fallback] [--output pdf.json]
+
+Run from backend/. `compare` exits with status 1 when a benchmark is slower
+than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.compare import DEFAULT_THRESHOLD, compare
+from benchmarks.pdf import BACKENDS as PDF_BACKENDS, run_pdf_benchmark
+from benchmarks.suite import PROFILES, BenchmarkSuite
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+RESULTS_PATH = "benchmark-results.json"
+
+
+def _run(args) -> int:
+    only = args.only.split(",") if args.only else None
+    suite = BenchmarkSuite(args.profile, seed=args.seed, database_url=args.database_url)
+    report = suite.run(only)
+
+    output = BASELINE_PATH if args.save_baseline else args.output
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Results written to {output}")
+    return 0
+
+
+def _compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.results) as f:
+        current = json.load(f)
+
+    lines, regressions = compare(baseline, current, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print("No regressions.")
+    return 0
+
+
+def _pdf(args) -> int:
+    backends = args.backends.split(",")
+    unknown = [backend for backend in backends if backend not in PDF_BACKENDS]
+    if unknown:
+        print(f"Unknown backend(s): {', '.join(unknown)}")
+        return 2
+    report = run_pdf_benchmark(args.files, backends, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Results written to {args.output}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Matching engine benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmarks")
+    run.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    run.add_argument("--only", help="comma-separated groups: borrower, lender, helpers")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--database-url", help="dedicated database for the lender benchmarks (default: temporary SQLite)")
+    run.add_argument("--output", default=RESULTS_PATH)
+    run.add_argument("--save-baseline", action="store_true", help=f"write to {BASELINE_PATH} instead of --output")
+    run.set_defaults(handler=_run)
+
+    check = commands.add_parser("compare", help="compare results with the baseline")
+    check.add_argument("results", nargs="?", default=RESULTS_PATH)
+    check.add_argument("--baseline", default=BASELINE_PATH)
+    check.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    check.set_defaults(handler=_compare)
+
+    pdf = commands.add_parser("pdf", help="compare PDF parser backends")
+    pdf.add_argument("files", nargs="*", help="PDFs to parse (default: a generated sample)")
+    pdf.add_argument("--backends", default=",".join(PDF_BACKENDS))
+    pdf.add_argument("--repeat", type=int, default=3)
+    pdf.add_argument("--output")
+    pdf.set_defaults(handler=_pdf)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
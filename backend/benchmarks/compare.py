@@ -0,0 +1,36 @@
+from typing import Any, Dict, List, Tuple
+
+DEFAULT_THRESHOLD = 0.15
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> Tuple[List[str], List[str]]:
+    """Report lines and the names of benchmarks whose best time grew by more
+    than `threshold` (a fraction) over the baseline. The best of several runs
+    is far less sensitive to a busy machine than the median."""
+    lines = []
+    regressions = []
+    base_results = baseline["results"]
+    for name, result in current["results"].items():
+        base = base_results.get(name)
+        if base is None:
+            lines.append(f"{name:<48} {'new':>10}")
+            continue
+        ratio = result["min_s"] / base["min_s"] if base["min_s"] else float("inf")
+        status = ""
+        if ratio > 1 + threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            status = "faster"
+        lines.append(
+            f"{name:<48} {base['min_s'] * 1000:>10.2f} ms -> {result['min_s'] * 1000:>10.2f} ms"
+            f"  {ratio:>6.2f}x  {status}"
+        )
+
+    for name in base_results:
+        if name not in current["results"]:
+            lines.append(f"{name:<48} {'not run':>10}")
+
+    if baseline.get("meta", {}).get("profile") != current.get("meta", {}).get("profile"):
+        lines.append("Warning: baseline and current results use different profiles.")
+    return lines, regressions
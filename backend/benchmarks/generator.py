@@ -0,0 +1,185 @@
+import random
+import uuid
+from typing import Any, Dict, Iterator, List
+
+from app.core.constants import (
+    FIELD_METADATA,
+    CriteriaField,
+    EntityType,
+    EquipmentCondition,
+    EquipmentType,
+    IndustryTier,
+    VendorType,
+)
+from app.models.model import Borrower, LenderPolicy
+
+# Rough share of small-business lending volume, so state filters are as
+# selective as they are in production.
+STATES = {
+    "CA": 12, "TX": 10, "FL": 8, "NY": 7, "IL": 4, "PA": 4, "OH": 4, "GA": 4,
+    "NC": 3, "MI": 3, "NJ": 3, "VA": 3, "WA": 3, "AZ": 3, "MA": 2, "TN": 2,
+    "IN": 2, "MO": 2, "MD": 2, "WI": 2, "CO": 2, "MN": 2, "SC": 2, "AL": 2,
+    "LA": 1, "KY": 1, "OR": 1, "OK": 1, "CT": 1, "UT": 1, "IA": 1, "NV": 1,
+    "AR": 1, "MS": 1, "KS": 1, "NM": 1, "NE": 1, "ID": 1, "WV": 1, "HI": 1,
+}
+
+NAICS_CODES = [
+    "484121", "484110", "484220", "621111", "621210", "621511", "236115", "236220",
+    "238210", "111150", "112111", "541511", "541330", "722511", "811111", "561720",
+    "423810", "532412", "713940", "447110",
+]
+
+# Prefixes lenders typically exclude (trucking, gas stations, cannabis-adjacent
+# agriculture, restaurants, gambling).
+EXCLUDED_PREFIXES = ["4841", "484", "4471", "1111", "7225", "7132", "5324"]
+
+# (operator, low, high) for threshold rules, per numeric field.
+THRESHOLDS = {
+    CriteriaField.GUARANTOR_FICO: (">=", 600, 720),
+    CriteriaField.PAYNET_SCORE: (">=", 50, 80),
+    CriteriaField.YEARS_IN_BUSINESS: (">=", 1, 5),
+    CriteriaField.ANNUAL_REVENUE: (">=", 100_000, 1_000_000),
+    CriteriaField.AVG_DAILY_BALANCE: (">=", 2_000, 20_000),
+    CriteriaField.NSF_COUNT: ("<=", 0, 5),
+    CriteriaField.DSCR_RATIO: (">=", 1.0, 1.5),
+    CriteriaField.YEARS_SINCE_BANKRUPTCY: (">=", 2, 10),
+    CriteriaField.YEARS_SINCE_JUDGMENT: (">=", 1, 7),
+    CriteriaField.LTV_RATIO: ("<=", 80, 110),
+    CriteriaField.EQUIPMENT_AGE: ("<=", 5, 15),
+}
+
+BOOLEAN_EXPECTED = {
+    CriteriaField.HAS_ACTIVE_BANKRUPTCY: False,
+    CriteriaField.HAS_UNPAID_LIENS: False,
+    CriteriaField.IS_HOMEOWNER: True,
+}
+
+# Loan amount is covered by the program bounds rather than by rules.
+RULE_FIELDS = [field for field in CriteriaField if field != CriteriaField.LOAN_AMOUNT]
+
+PROGRAM_TIERS = [
+    ("A Tier", 50_000, 1_000_000),
+    ("B Tier", 25_000, 500_000),
+    ("C Tier", 10_000, 250_000),
+    ("App Only", 5_000, 150_000),
+]
+
+
+def _clip(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+
+class DataGenerator:
+    """Seeded synthetic borrowers and lender policies.
+
+    Borrowers follow skewed, production-like distributions; policy programs
+    and rules are drawn from CriteriaField/FIELD_METADATA. The same seed
+    always yields the same data.
+    """
+
+    def __init__(self, seed: int = 42):
+        self.seed = seed
+        self._states = list(STATES)
+        self._state_weights = list(STATES.values())
+
+    def borrower_rows(self, count: int, start_id: int = 1) -> Iterator[Dict[str, Any]]:
+        """Column dicts for the borrowers table."""
+        r = random.Random(f"{self.seed}:borrowers:{start_id}")
+        for borrower_id in range(start_id, start_id + count):
+            years = round(_clip(r.lognormvariate(1.6, 0.8), 0.1, 40.0), 1)
+            bankrupt = r.random() < 0.04
+            discharged = not bankrupt and r.random() < 0.08
+            yield {
+                "id": borrower_id,
+                "full_name": f"Owner {borrower_id}",
+                "email": f"borrower{borrower_id}@example.com",
+                "mobile_no": f"555-{borrower_id % 10_000:04d}",
+                "business_name": f"Business {borrower_id} LLC",
+                "business_state": r.choices(self._states, self._state_weights)[0],
+                "zip_code": f"{r.randint(10_000, 99_999)}",
+                "years_in_business": years,
+                "business_entity_type": r.choices(list(EntityType), [50, 25, 15, 10])[0],
+                "industry_tier": r.choices(list(IndustryTier), [30, 50, 20])[0],
+                "industry_naics": r.choice(NAICS_CODES) if r.random() < 0.9 else None,
+                "annual_revenue": round(r.lognormvariate(13.6, 1.0), 2),
+                "avg_daily_balance": round(r.lognormvariate(9.2, 1.1), 2),
+                "nsf_count": min(int(r.expovariate(0.8)), 15),
+                "dscr_ratio": round(_clip(r.gauss(1.35, 0.35), 0.2, 4.0), 2),
+                "guarantor_fico": int(_clip(r.gauss(695, 65), 300, 850)),
+                "ownership_percentage": r.choice([100.0, 100.0, 75.0, 51.0, 50.0]),
+                "is_homeowner": r.random() < 0.6,
+                "has_active_bankruptcy": bankrupt,
+                "years_since_bankruptcy_discharge": round(r.uniform(0.5, 15), 1) if discharged else None,
+                "has_unpaid_tax_liens": r.random() < 0.06,
+                "years_since_last_judgment": round(r.uniform(0.5, 15), 1) if r.random() < 0.1 else None,
+                "paynet_score": int(_clip(r.gauss(66, 14), 0, 100)) if r.random() < 0.7 else None,
+                "loan_amount": round(_clip(r.lognormvariate(11.4, 0.9), 2_000, 2_000_000), 2),
+                "ltv_ratio": round(_clip(r.gauss(85, 15), 20, 130), 1),
+                "equipment_type": r.choice(list(EquipmentType)),
+                "equipment_age": min(int(r.expovariate(0.25)), 30),
+                "equipment_condition": r.choices(list(EquipmentCondition), [55, 45])[0],
+                "vendor_type": r.choices(list(VendorType), [80, 20])[0],
+                "equipment_location_state": None,
+            }
+
+    def borrowers(self, count: int, start_id: int = 1) -> List[Borrower]:
+        """Transient Borrower objects (not added to any session)."""
+        return [Borrower(**row) for row in self.borrower_rows(count, start_id)]
+
+    def policies(self, count: int) -> List[LenderPolicy]:
+        """Transient active LenderPolicy objects, one per synthetic lender."""
+        r = random.Random(f"{self.seed}:policies")
+        return [self._policy(r, n) for n in range(count)]
+
+    def _policy(self, r: random.Random, n: int) -> LenderPolicy:
+        tiers = PROGRAM_TIERS[:r.randint(1, len(PROGRAM_TIERS))]
+        return LenderPolicy(
+            id=uuid.UUID(int=r.getrandbits(128)),
+            lender_id=uuid.UUID(int=r.getrandbits(128)),
+            version_name=f"Bench Lender {n}",
+            is_active=True,
+            restricted_states=r.sample(self._states, r.randint(0, 5)),
+            excluded_industries=r.sample(EXCLUDED_PREFIXES, r.randint(0, 3)),
+            programs=[
+                {
+                    "program_name": name,
+                    "min_loan_amount": min_amount,
+                    "max_loan_amount": max_amount,
+                    "rules": [self._rule(r, level) for _ in range(r.randint(2, 8))],
+                }
+                for level, (name, min_amount, max_amount) in enumerate(tiers)
+            ],
+        )
+
+    def _rule(self, r: random.Random, level: int) -> Dict[str, Any]:
+        """One rule; lower program levels (A Tier first) get stricter thresholds."""
+        field = r.choice(RULE_FIELDS)
+        meta = FIELD_METADATA[field]
+        strict = r.random() < 0.6
+
+        if field in BOOLEAN_EXPECTED:
+            operator, value = "==", BOOLEAN_EXPECTED[field]
+        elif field in THRESHOLDS:
+            operator, low, high = THRESHOLDS[field]
+            # Stricter end of the range for the top tier.
+            share = _clip(1.0 - level * 0.3 + r.uniform(-0.15, 0.15), 0.0, 1.0)
+            if operator == "<=":
+                share = 1.0 - share
+            value = low + (high - low) * share
+            value = int(round(value)) if meta["type"] in ("int", "currency") else round(value, 2)
+        elif meta["type"] == "enum":
+            options = list(meta["options"])
+            operator = r.choice(["in", "not_in"])
+            picked = r.sample(options, r.randint(1, max(1, len(options) - 1)))
+            value = picked if operator == "in" else picked[:1]
+        else:
+            operator = r.choice(["in", "not_in"])
+            value = r.sample(self._states, r.randint(5, 25) if operator == "in" else r.randint(1, 4))
+
+        return {
+            "field_name": field.value,
+            "operator": operator,
+            "value": value,
+            "failure_reason": f"{meta.get('label', field.value)} does not meet {operator} {value}",
+            "strict": strict,
+        }
@@ -0,0 +1,141 @@
+"""PDF parser backend benchmark: per-page latency and peak memory.
+
+Every (file, backend) pair runs in a fresh spawned process, so the peak
+resident set of one backend does not hide another's; peak MB is the growth
+over the RSS after imports. Without files, a
+seeded synthetic guideline PDF (prose pages, every third one with a ruled
+threshold table) is generated.
+"""
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import pymupdf
+
+# "pymupdf+fallback" is what extract_text_and_tables does by default:
+# PyMuPDF, then pdfplumber for pages whose tables look unreliable.
+BACKENDS = ["pdfplumber", "pymupdf", "pymupdf+fallback"]
+
+_FIELDS = [
+    ("Minimum FICO", "680"), ("Time in Business", "24 months"), ("Max Loan Amount", "$250,000"),
+    ("Min Annual Revenue", "$500,000"), ("Max NSFs (90 days)", "3"), ("Min PayNet", "65"),
+    ("Max Equipment Age", "10 years"), ("Min DSCR", "1.25"),
+]
+
+
+def sample_pdf(path: str, pages: int = 40, table_every: int = 3, seed: int = 42) -> str:
+    r = random.Random(seed)
+    doc = pymupdf.open()
+    for page_num in range(1, pages + 1):
+        page = doc.new_page()
+        y = 60
+        for line in range(28):
+            words = " ".join(r.choice(["lender", "program", "credit", "borrower", "equipment", "guideline",
+                                       "approval", "collateral", "tier", "minimum", "term"]) for _ in range(10))
+            page.insert_text((50, y), f"{page_num}.{line} {words}", fontsize=9)
+            y += 12
+        if page_num % table_every:
+            continue
+        tier = r.choice(["A Tier", "B Tier", "C Tier", "App Only"])
+        page.insert_text((50, y + 20), f"{tier} requirements", fontsize=11)
+        top = y + 30
+        for row, (label, value) in enumerate(_FIELDS):
+            for col, text in enumerate((label, value)):
+                rect = pymupdf.Rect(50 + col * 200, top + row * 18, 250 + col * 200, top + (row + 1) * 18)
+                page.draw_rect(rect)
+                page.insert_text((rect.x0 + 4, rect.y1 - 5), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def _proc_status_bytes(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> int:
+    """Resets the peak RSS where the kernel allows it (Linux); returns the
+    current RSS, the baseline the peak is measured from."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    current = _proc_status_bytes("VmRSS")
+    return current if current is not None else _peak_rss_bytes()
+
+
+def _peak_rss_bytes() -> int:
+    peak = _proc_status_bytes("VmHWM")
+    if peak is not None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _measure(path: str, backend: str, repeat: int, queue):
+    from app.services import pdf_parser
+
+    pdf_parser.PDF_PARSE_WORKERS = 1
+    pages = pdf_parser.page_count(path, "pymupdf")
+    baseline = _reset_peak_rss()
+
+    def parse():
+        if backend == "pymupdf+fallback":
+            raw = pdf_parser.extract_text_and_tables(path, "pymupdf")
+            return raw["pages"], raw["tables"], []
+        return pdf_parser.parse_pages(path, backend=backend)
+
+    runs = []
+    texts = tables = unreliable = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        texts, tables, unreliable = parse()
+        runs.append(time.perf_counter() - start)
+
+    queue.put({
+        "pages": pages,
+        "median_s": statistics.median(runs),
+        "min_s": min(runs),
+        "per_page_ms": statistics.median(runs) / pages * 1000 if pages else None,
+        "baseline_rss_mb": baseline / 2**20,
+        "peak_rss_mb": (_peak_rss_bytes() - baseline) / 2**20,
+        "text_chars": sum(len(block["text"]) for block in texts),
+        "tables": len(tables),
+        "unreliable_pages": len(unreliable),
+    })
+
+
+def run_pdf_benchmark(paths: List[str], backends: List[str], repeat: int = 3, log=print) -> Dict[str, Any]:
+    if not paths:
+        paths = [sample_pdf(os.path.join(tempfile.gettempdir(), "lender-bench-guidelines.pdf"))]
+
+    context = multiprocessing.get_context("spawn")
+    results: Dict[str, Dict[str, Any]] = {}
+    log(f"{'file / backend':<52} {'ms/page':>9} {'base MB':>9} {'peak MB':>9} {'tables':>7} {'chars':>9}")
+    for path in paths:
+        for backend in backends:
+            queue = context.Queue()
+            process = context.Process(target=_measure, args=(path, backend, repeat, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            name = f"{os.path.basename(path)}/{backend}"
+            results[name] = result
+            log(f"{name:<52} {result['per_page_ms']:>9.2f} {result['baseline_rss_mb']:>9.1f} {result['peak_rss_mb']:>9.1f} "
+                f"{result['tables']:>7} {result['text_chars']:>9}")
+    return {"results": results, "repeat": repeat}
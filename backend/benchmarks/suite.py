@@ -0,0 +1,210 @@
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.matching_engine.compiler import get_compiled_policy
+from app.matching_engine.engine import CreditMatchingEngine
+from app.matching_engine.policy_index import PolicyIndex
+from app.models.model import Borrower
+from benchmarks.generator import DataGenerator
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "quick": {
+        "borrower_policies": [10, 100, 1_000],
+        "borrower_sample": 200,
+        "lender_borrowers": [1_000, 10_000],
+        "lender_policies": 5,
+        "helper_borrowers": 1_000,
+        "helper_policies": 50,
+        "repeat": 3,
+    },
+    "full": {
+        "borrower_policies": [10, 100, 1_000, 5_000],
+        "borrower_sample": 1_000,
+        "lender_borrowers": [1_000, 10_000, 100_000, 1_000_000],
+        "lender_policies": 10,
+        "helper_borrowers": 10_000,
+        "helper_policies": 200,
+        "repeat": 5,
+    },
+}
+
+# The row-at-a-time lender path takes minutes beyond this.
+ROW_MODE_MAX_BORROWERS = 100_000
+SEED_CHUNK = 10_000
+
+
+def measure(fn: Callable[[], Any], repeat: int, ops: int) -> Dict[str, Any]:
+    """Runs fn `repeat` times after one warm-up call."""
+    fn()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    median = statistics.median(runs)
+    return {
+        "median_s": median,
+        "min_s": min(runs),
+        "runs": len(runs),
+        "ops": ops,
+        "per_op_us": median / ops * 1e6 if ops else None,
+    }
+
+
+class BenchmarkSuite:
+    def __init__(self, profile: str = "quick", seed: int = 42, database_url: Optional[str] = None, log=print):
+        self.profile = profile
+        self.config = PROFILES[profile]
+        self.seed = seed
+        self.database_url = database_url
+        self.log = log
+        self.generator = DataGenerator(seed)
+        self.engine = CreditMatchingEngine()
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def run(self, only: Optional[List[str]] = None) -> Dict[str, Any]:
+        groups = {"borrower": self.bench_borrower, "lender": self.bench_lender, "helpers": self.bench_helpers}
+        for name, bench in groups.items():
+            if only and name not in only:
+                continue
+            bench()
+        return {
+            "meta": {
+                "profile": self.profile,
+                "seed": self.seed,
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "database": self._database_label(),
+            },
+            "results": self.results,
+        }
+
+    def _record(self, name: str, result: Dict[str, Any]):
+        self.results[name] = result
+        per_op = f"{result['per_op_us']:.2f} us/op" if result["per_op_us"] is not None else ""
+        self.log(f"{name:<48} {result['median_s'] * 1000:>10.2f} ms  {per_op}")
+
+    # Borrower side: one application against every active policy.
+
+    def bench_borrower(self):
+        repeat = self.config["repeat"]
+        borrowers = self.generator.borrowers(self.config["borrower_sample"])
+        for count in self.config["borrower_policies"]:
+            policies = self.generator.policies(count)
+            for policy in policies:
+                get_compiled_policy(policy)
+            index = PolicyIndex(policies)
+
+            self._record(f"borrower/scan/{count}_policies", measure(
+                lambda: [self.engine.run_engine_for_borrower(b, policies) for b in borrowers],
+                repeat, len(borrowers)
+            ))
+            self._record(f"borrower/indexed/{count}_policies", measure(
+                lambda: [self.engine.run_engine_for_borrower(b, policies, index=index) for b in borrowers],
+                repeat, len(borrowers)
+            ))
+
+    # Lender side: full rematch of one policy against the borrowers table.
+
+    def bench_lender(self):
+        repeat = self.config["repeat"]
+        policies = self.generator.policies(self.config["lender_policies"])
+        for count in self.config["lender_borrowers"]:
+            session_factory = self._seeded_sessions(count)
+            db = session_factory()
+            try:
+                run_all = lambda columnar: [
+                    self.engine.run_engine_for_lender(policy, db, columnar=columnar) for policy in policies
+                ]
+                self._record(f"lender/columnar/{count}_borrowers", measure(
+                    lambda: run_all(True), repeat, len(policies)
+                ))
+                if count <= ROW_MODE_MAX_BORROWERS:
+                    self._record(f"lender/rows/{count}_borrowers", measure(
+                        lambda: run_all(False), repeat, len(policies)
+                    ))
+            finally:
+                db.close()
+
+    def _database_label(self) -> str:
+        if self.database_url is None:
+            return "sqlite (temporary file)"
+        return self.database_url.split("://", 1)[0]
+
+    def _seeded_sessions(self, count: int):
+        """Session factory over a borrowers table holding exactly the first
+        `count` generated borrowers."""
+        url = self.database_url
+        if url is None:
+            path = os.path.join(tempfile.gettempdir(), f"lender-bench-{self.seed}-{count}.db")
+            url = f"sqlite:///{path}"
+
+        db_engine = create_engine(url)
+        table = Borrower.__table__
+        table.create(db_engine, checkfirst=True)
+        with db_engine.begin() as conn:
+            existing = conn.execute(select(func.count()).select_from(table)).scalar()
+            if existing != count:
+                foreign = conn.execute(
+                    select(func.count()).select_from(table).where(~table.c.email.like("borrower%@example.com"))
+                ).scalar()
+                if foreign:
+                    raise RuntimeError("Benchmark database holds non-synthetic borrowers; use a dedicated database.")
+                self.log(f"Seeding {count} borrowers ...")
+                conn.execute(table.delete())
+                chunk = []
+                for row in self.generator.borrower_rows(count):
+                    chunk.append(row)
+                    if len(chunk) == SEED_CHUNK:
+                        conn.execute(insert(table), chunk)
+                        chunk = []
+                if chunk:
+                    conn.execute(insert(table), chunk)
+        return sessionmaker(bind=db_engine)
+
+    # Scoring helpers, per call.
+
+    def bench_helpers(self):
+        repeat = self.config["repeat"]
+        engine = self.engine
+        borrowers = self.generator.borrowers(self.config["helper_borrowers"])
+        plans = [get_compiled_policy(p) for p in self.generator.policies(self.config["helper_policies"])]
+
+        pairs = [(b, plan) for b in borrowers for plan in plans]
+        programs = [(b, program) for b, plan in pairs for program in plan.programs]
+        soft = [(b, program.soft_rules) for b, program in programs]
+        numeric = [
+            (engine._get_borrower_value(b, rule.field), rule.value, rule.op)
+            for b, program in programs[:20_000]
+            for rule in program.soft_rules
+            if rule.target is not None and engine._get_borrower_value(b, rule.field) is not None
+        ]
+
+        cases = {
+            "_check_global_policy": (lambda: [engine._check_global_policy(b, plan) for b, plan in pairs], len(pairs)),
+            "_evaluate_programs": (lambda: [engine._evaluate_programs(b, plan) for b, plan in pairs], len(pairs)),
+            "_check_hard_constraints": (lambda: [engine._check_hard_constraints(b, p) for b, p in programs], len(programs)),
+            "_calculate_soft_penalty": (lambda: [engine._calculate_soft_penalty(b, rules) for b, rules in soft], len(soft)),
+            "_calculate_sigmoid_penalty": (lambda: [engine._calculate_sigmoid_penalty(*args) for args in numeric], len(numeric)),
+            "_calculate_decay": (lambda: [engine._calculate_decay(*args) for args in numeric], len(numeric)),
+            "_calculate_score": (lambda: [engine._calculate_score(b, p.weights) for b, p in programs], len(programs)),
+            "_determine_tier": (lambda: [engine._determine_tier(s) for s in range(0, 100) for _ in borrowers], 100 * len(borrowers)),
+            "_is_industry_excluded": (
+                lambda: [engine._is_industry_excluded(b.industry_naics, plan.naics_trie) for b, plan in pairs], len(pairs)
+            ),
+            "_get_borrower_value": (
+                lambda: [engine._get_borrower_value(b, "industry_tier") for b, _ in pairs], len(pairs)
+            ),
+        }
+        for name, (fn, ops) in cases.items():
+            self._record(f"helpers/{name}", measure(fn, repeat, ops))
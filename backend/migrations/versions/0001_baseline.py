@@ -0,0 +1,130 @@
+"""Baseline: the schema Base.metadata.create_all used to build
+
+Databases created by create_all before migrations existed are already at
+this revision; mark them with `alembic stamp 0001` and then upgrade.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Enum labels are the member names, as SQLAlchemy stores them.
+match_tier = sa.Enum("PERFECT", "STRONG", "MODERATE", "WEAK", name="matchtier")
+entity_type = sa.Enum("LLC", "CORP", "SOLE_PROP", "PARTNERSHIP", name="entitytype")
+industry_tier = sa.Enum("TIER_1", "TIER_2", "TIER_3", name="industrytier")
+equipment_type = sa.Enum(
+    "MEDICAL", "TRUCKING", "CNC", "CONSTRUCTION", "AGRICULTURAL", "INDUSTRIAL", name="equipmenttype"
+)
+equipment_condition = sa.Enum("NEW", "USED", name="equipmentcondition")
+vendor_type = sa.Enum("DEALER", "PRIVATE_PARTY", name="vendortype")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "lenders",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("is_verified", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_lenders_email", "lenders", ["email"], unique=True)
+    op.create_index("ix_lenders_is_verified", "lenders", ["is_verified"])
+    op.create_index("ix_lenders_name", "lenders", ["name"])
+
+    op.create_table(
+        "borrowers",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("mobile_no", sa.String(), nullable=False),
+        sa.Column("business_name", sa.String(), nullable=False),
+        sa.Column("dba_name", sa.String(), nullable=True),
+        sa.Column("business_state", sa.String(length=2), nullable=False),
+        sa.Column("zip_code", sa.String(length=10), nullable=True),
+        sa.Column("years_in_business", sa.Float(), nullable=False),
+        sa.Column("business_start_date", sa.DateTime(), nullable=True),
+        sa.Column("business_entity_type", entity_type, nullable=True),
+        sa.Column("industry_tier", industry_tier, nullable=True),
+        sa.Column("industry_naics", sa.String(), nullable=True),
+        sa.Column("annual_revenue", sa.Float(), nullable=False),
+        sa.Column("avg_daily_balance", sa.Float(), nullable=True),
+        sa.Column("nsf_count", sa.Integer(), nullable=True),
+        sa.Column("dscr_ratio", sa.Float(), nullable=True),
+        sa.Column("guarantor_fico", sa.Integer(), nullable=False),
+        sa.Column("ownership_percentage", sa.Float(), nullable=False),
+        sa.Column("is_homeowner", sa.Boolean(), nullable=True),
+        sa.Column("has_active_bankruptcy", sa.Boolean(), nullable=True),
+        sa.Column("years_since_bankruptcy_discharge", sa.Float(), nullable=True),
+        sa.Column("has_unpaid_tax_liens", sa.Boolean(), nullable=True),
+        sa.Column("years_since_last_judgment", sa.Float(), nullable=True),
+        sa.Column("paynet_score", sa.Integer(), nullable=True),
+        sa.Column("loan_amount", sa.Float(), nullable=False),
+        sa.Column("ltv_ratio", sa.Float(), nullable=True),
+        sa.Column("equipment_type", equipment_type, nullable=False),
+        sa.Column("equipment_age", sa.Integer(), nullable=True),
+        sa.Column("equipment_condition", equipment_condition, nullable=False),
+        sa.Column("vendor_type", vendor_type, nullable=True),
+        sa.Column("equipment_location_state", sa.String(length=2), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_borrowers_email", "borrowers", ["email"])
+    op.create_index("ix_borrowers_id", "borrowers", ["id"])
+
+    op.create_table(
+        "lender_policies",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("lender_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("version_name", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("excluded_industries", postgresql.JSONB(astext_type=sa.Text()), server_default="[]", nullable=True),
+        sa.Column("restricted_states", postgresql.JSONB(astext_type=sa.Text()), server_default="[]", nullable=True),
+        sa.Column("programs", postgresql.JSONB(astext_type=sa.Text()), server_default="[]", nullable=False),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["lender_id"], ["lenders.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_lender_policies_is_active", "lender_policies", ["is_active"])
+
+    op.create_table(
+        "loan_matches",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("lender_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("borrower_id", sa.Integer(), nullable=False),
+        sa.Column("match_score", sa.Float(), nullable=True),
+        sa.Column("match_tier", match_tier, nullable=False),
+        sa.Column("matched_program_name", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(["borrower_id"], ["borrowers.id"]),
+        sa.ForeignKeyConstraint(["lender_id"], ["lenders.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_loan_matches_id", "loan_matches", ["id"])
+    op.create_index("ix_loan_matches_match_tier", "loan_matches", ["match_tier"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("loan_matches")
+    op.drop_table("lender_policies")
+    op.drop_table("borrowers")
+    op.drop_table("lenders")
+    bind = op.get_bind()
+    for enum in (match_tier, entity_type, industry_tier, equipment_type, equipment_condition, vendor_type):
+        enum.drop(bind, checkfirst=True)
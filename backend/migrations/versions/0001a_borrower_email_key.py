@@ -0,0 +1,62 @@
+"""Unique borrower email, the conflict target of bulk intake upserts
+
+BorrowerCRUD.register_bulk runs INSERT ... ON CONFLICT (email), which needs
+this key. It used to be created by 0002; it sits before 0002 so that
+databases already at 0002 or later, which have it, skip this revision.
+
+The upgrade stops, before changing anything, with a report of the emails
+shared by several borrowers; which application to keep is for an operator
+to decide.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001a"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Emails listed in the error; the total is always reported.
+REPORT_LIMIT = 20
+
+
+def _check_duplicates():
+    """Raises with the repeated emails instead of deleting borrowers."""
+    bind = op.get_bind()
+    total = bind.execute(sa.text(
+        "SELECT count(*) FROM (SELECT 1 FROM borrowers GROUP BY email HAVING count(*) > 1) duplicates"
+    )).scalar()
+    if not total:
+        return
+    rows = bind.execute(sa.text(
+        "SELECT email, count(*), array_agg(id ORDER BY id) FROM borrowers "
+        "GROUP BY email HAVING count(*) > 1 ORDER BY count(*) DESC, email LIMIT :limit"
+    ), {"limit": REPORT_LIMIT}).all()
+
+    lines = [f"Cannot make borrowers.email unique: {total} emails are shared by several borrowers. Nothing was changed."]
+    lines += [f"  {row[0]}: {row[1]} borrowers, ids {row[2]}" for row in rows]
+    if total > REPORT_LIMIT:
+        lines.append(f"Only the first {REPORT_LIMIT} are listed.")
+    lines.append("Merge or delete the duplicates (and the matches of removed borrowers), then upgrade again.")
+    raise RuntimeError("\n".join(lines))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _check_duplicates()
+    op.drop_index("ix_borrowers_email", table_name="borrowers")
+    op.create_index("ix_borrowers_email", "borrowers", ["email"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_borrowers_email", table_name="borrowers")
+    op.create_index("ix_borrowers_email", "borrowers", ["email"])
@@ -0,0 +1,61 @@
+"""Unique (lender_id, borrower_id) on loan_matches, the conflict target of MatchStore
+
+MatchStore upserts matches with INSERT ... ON CONFLICT (lender_id,
+borrower_id), which needs this key. It used to be created by 0002; it sits
+before 0002 so that databases already at 0002 or later, which have it, skip
+this revision.
+
+The upgrade stops, before changing anything, with a report of the repeated
+pairs; which row to keep is for an operator to decide.
+
+Revision ID: 0001b
+Revises: 0001a
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001b"
+down_revision: Union[str, Sequence[str], None] = "0001a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Pairs listed in the error; the total is always reported.
+REPORT_LIMIT = 20
+
+
+def _check_duplicates():
+    """Raises with the repeated pairs instead of deleting matches."""
+    bind = op.get_bind()
+    total = bind.execute(sa.text(
+        "SELECT count(*) FROM (SELECT 1 FROM loan_matches GROUP BY lender_id, borrower_id HAVING count(*) > 1) duplicates"
+    )).scalar()
+    if not total:
+        return
+    rows = bind.execute(sa.text(
+        "SELECT lender_id, borrower_id, count(*), array_agg(id ORDER BY id) FROM loan_matches "
+        "GROUP BY lender_id, borrower_id HAVING count(*) > 1 "
+        "ORDER BY count(*) DESC, lender_id, borrower_id LIMIT :limit"
+    ), {"limit": REPORT_LIMIT}).all()
+
+    lines = [f"Cannot make loan_matches (lender_id, borrower_id) unique: {total} pairs are repeated. Nothing was changed."]
+    lines += [f"  lender {row[0]}, borrower {row[1]}: {row[2]} rows, ids {row[3]}" for row in rows]
+    if total > REPORT_LIMIT:
+        lines.append(f"Only the first {REPORT_LIMIT} are listed.")
+    lines.append("Delete the extra rows, then upgrade again.")
+    raise RuntimeError("\n".join(lines))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _check_duplicates()
+    op.create_unique_constraint("uq_loan_matches_lender_borrower", "loan_matches", ["lender_id", "borrower_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint("uq_loan_matches_lender_borrower", "loan_matches", type_="unique")
@@ -0,0 +1,67 @@
+"""Indexes for the matching tables
+
+- loan_matches: borrower_id for the per-borrower diff and delete, and a
+  partial (lender_id, match_score DESC, borrower_id DESC) index on active
+  rows for the paginated match list. The unique (lender_id, borrower_id)
+  key is created by 0001b.
+- borrowers: loan_amount, business_state and guarantor_fico for the lender
+  rematch candidate query. The unique email key is created by 0001a.
+- lender_policies: partial lender_id index on active policies and
+  (lender_id, updated_at DESC) for the version history.
+
+Revision ID: 0002
+Revises: 0001b
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_loan_matches_borrower_id", "loan_matches", ["borrower_id"])
+    op.create_index(
+        "ix_loan_matches_lender_active_score",
+        "loan_matches",
+        ["lender_id", sa.text("match_score DESC"), sa.text("borrower_id DESC")],
+        postgresql_where=sa.text("is_active = true"),
+    )
+
+    op.create_index("ix_borrowers_loan_amount", "borrowers", ["loan_amount"])
+    op.create_index("ix_borrowers_business_state", "borrowers", ["business_state"])
+    op.create_index("ix_borrowers_guarantor_fico", "borrowers", ["guarantor_fico"])
+
+    op.create_index(
+        "ix_lender_policies_lender_active",
+        "lender_policies",
+        ["lender_id"],
+        postgresql_where=sa.text("is_active = true"),
+    )
+    op.create_index(
+        "ix_lender_policies_lender_updated",
+        "lender_policies",
+        ["lender_id", sa.text("updated_at DESC")],
+    )
+    op.execute("ANALYZE loan_matches")
+    op.execute("ANALYZE borrowers")
+    op.execute("ANALYZE lender_policies")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_lender_policies_lender_updated", table_name="lender_policies")
+    op.drop_index("ix_lender_policies_lender_active", table_name="lender_policies")
+    op.drop_index("ix_borrowers_guarantor_fico", table_name="borrowers")
+    op.drop_index("ix_borrowers_business_state", table_name="borrowers")
+    op.drop_index("ix_borrowers_loan_amount", table_name="borrowers")
+    op.drop_index("ix_loan_matches_lender_active_score", table_name="loan_matches")
+    op.drop_index("ix_loan_matches_borrower_id", table_name="loan_matches")
@@ -0,0 +1,32 @@
+"""Record the policy each lender's matches were computed from
+
+lenders.matched_policy_id is set by the lender rematch in the same
+transaction that stores the matches. Existing lenders start with NULL, so
+their next rematch is a full one.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("lenders", sa.Column("matched_policy_id", postgresql.UUID(as_uuid=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("lenders", "matched_policy_id")
@@ -0,0 +1,63 @@
+"""Offline test setup: SQLite instead of Postgres, fakeredis instead of Redis
+and the stub LLM client. The settings are read at import time, so they are
+set before anything under app/ is imported.
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+_TMP = tempfile.mkdtemp(prefix="lender-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP}/test.db")
+os.environ.setdefault("ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{_TMP}/test.db")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("EXTRACTION_LLM", "stub")
+os.environ.setdefault("EXTRACTION_CACHE_DIR", os.path.join(_TMP, "extraction-cache"))
+os.environ.setdefault("EXTRACTION_CACHE_REDIS", "0")
+os.environ.setdefault("EXTRACTION_UPLOAD_DIR", os.path.join(_TMP, "uploads"))
+os.environ.setdefault("PDF_PARSE_WORKERS", "1")
+
+import fakeredis  # noqa: E402
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    """One in-memory Redis shared by the sync client (workers) and the async
+    client (routes)."""
+    from app import redis_client
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis_client, "_sync_client", fakeredis.FakeRedis(server=server, decode_responses=True))
+    return server
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Stub LLM client for the test; swap its `response` or `extract`."""
+    from app.services import llm_client
+
+    client = llm_client.StubLLMClient({"lender_name": "Stub Lender"})
+    monkeypatch.setattr(llm_client, "_client", client)
+    return client
+
+
+@pytest.fixture
+def db():
+    """A session on a fresh SQLite schema, shared with the routes' engines."""
+    from app.database import SessionLocal, engine
+    from app.models.model import Base
+
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
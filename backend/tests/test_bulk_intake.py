@@ -0,0 +1,121 @@
+"""Bulk borrower intake: upserts keyed on email, rejected rows reported by
+position and one batch matching job per chunk."""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.model import Borrower
+from app.services.crud import BorrowerCRUD
+from app.services.match_queue import MATCH_QUEUE, batch_borrower_ids
+
+
+@pytest.fixture
+def client(db, redis_server):
+    return TestClient(app)
+
+
+@pytest.fixture
+def sync_redis(redis_server):
+    from app.redis_client import get_sync_redis
+    return get_sync_redis()
+
+
+def _application(email, loan_amount=50_000, business_name="Acme Tooling"):
+    return {
+        "full_name": "Pat Doe",
+        "email": email,
+        "mobile_no": "5550100",
+        "business_name": business_name,
+        "business_state": "CA",
+        "years_in_business": 4,
+        "business_entity_type": "LLC",
+        "annual_revenue": 1_200_000,
+        "guarantor_fico": 710,
+        "ownership_percentage": 100,
+        "loan_amount": loan_amount,
+        "equipment_type": "CNC",
+        "equipment_condition": "new",
+    }
+
+
+def _existing(db, email, loan_amount=20_000):
+    borrower = Borrower(**_application(email, loan_amount, business_name="Old Name"))
+    db.add(borrower)
+    db.commit()
+    return borrower.id
+
+
+def _queued_batches(sync_redis):
+    batches = []
+    for job in reversed(sync_redis.lrange(MATCH_QUEUE.ready, 0, -1)):
+        kind, _, token = job.partition(":")
+        assert kind == "borrower-batch"
+        batches.append(batch_borrower_ids(sync_redis, token))
+    return batches
+
+
+def test_apply_bulk_upserts_new_and_existing_emails(client, db, sync_redis):
+    existing_id = _existing(db, "known@example.com")
+    invalid = {**_application("broken@example.com"), "business_state": "California"}
+
+    response = client.post("/borrowers/apply-bulk", json=[
+        _application("new@example.com"),
+        invalid,
+        _application("known@example.com", loan_amount=90_000, business_name="New Name"),
+    ])
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body["received"] == 3 and body["accepted"] == 2 and not body["success"]
+    assert [r["index"] for r in body["rejected"]] == [1]
+    assert body["rejected"][0]["errors"][0].startswith("business_state:")
+
+    new_id, known_id = body["borrower_ids"]
+    assert known_id == existing_id and new_id != existing_id
+    db.expire_all()
+    updated = db.get(Borrower, existing_id)
+    assert (updated.loan_amount, updated.business_name) == (90_000, "New Name")
+    assert db.query(Borrower).filter(Borrower.email == "broken@example.com").count() == 0
+    assert _queued_batches(sync_redis) == [[new_id, known_id]]
+
+
+def test_apply_bulk_keeps_the_last_of_a_repeated_email(client, db):
+    response = client.post("/borrowers/apply-bulk", json=[
+        _application("twice@example.com", loan_amount=10_000),
+        _application("twice@example.com", loan_amount=30_000),
+    ])
+
+    ids = response.json()["borrower_ids"]
+    assert ids[0] == ids[1]
+    assert db.get(Borrower, ids[0]).loan_amount == 30_000
+
+
+def test_apply_bulk_stream_reports_bad_lines_and_flushes_in_chunks(client, db, sync_redis, monkeypatch):
+    monkeypatch.setattr(BorrowerCRUD, "BULK_CHUNK_SIZE", 2)
+    existing_id = _existing(db, "known@example.com")
+    lines = [
+        json.dumps(_application("a@example.com")),
+        "{not json",
+        json.dumps(_application("known@example.com", loan_amount=75_000)),
+        "",
+        json.dumps({**_application("b@example.com"), "loan_amount": 0}),
+        json.dumps(_application("c@example.com")),
+    ]
+
+    response = client.post("/borrowers/apply-bulk/stream", content="\n".join(lines).encode())
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body["received"] == 5 and body["accepted"] == 3
+    assert [r["index"] for r in body["rejected"]] == [1, 3]
+    assert body["rejected"][0]["errors"][0].startswith("invalid JSON")
+    assert body["rejected"][1]["errors"][0].startswith("loan_amount:")
+
+    a_id, known_id, c_id = body["borrower_ids"]
+    assert known_id == existing_id
+    db.expire_all()
+    assert db.get(Borrower, existing_id).loan_amount == 75_000
+    # One matching job per flushed chunk.
+    assert _queued_batches(sync_redis) == [[a_id, known_id], [c_id]]
@@ -0,0 +1,163 @@
+"""Map-reduce extraction: chunking, merging of partial policies and failures,
+with a fake model client in place of Gemini."""
+import re
+import threading
+
+import pymupdf
+import pytest
+
+from app.schemas.lender import LenderPolicyCreate
+from app.services import extractor
+from app.services.chunked_extraction import build_chunks, extract_chunks, merge_policies, reconcile
+
+PART = re.compile(r"This is part (\d+) of (\d+)")
+
+
+class FakeChunkClient:
+    """Answers each chunk prompt with the policy for its part number."""
+    model = "fake"
+
+    def __init__(self, responses, fail_parts=()):
+        self.responses = responses
+        self.fail_parts = set(fail_parts)
+        self.parts_seen = []
+        self._lock = threading.Lock()
+
+    def extract(self, schema, content):
+        part, parts = map(int, PART.search(content[0]).groups())
+        with self._lock:
+            self.parts_seen.append((part, parts))
+        if part in self.fail_parts:
+            raise RuntimeError(f"model error on part {part}")
+        return schema.model_validate(self.responses[part])
+
+
+def _rule(field, operator, value):
+    return {"field_name": field, "operator": operator, "value": value, "failure_reason": f"{field} {operator} {value}"}
+
+
+def _policy(programs=(), **fields):
+    return LenderPolicyCreate.model_validate({"lender_name": "Acme Capital", "programs": list(programs), **fields})
+
+
+def _program(name, rules=(), max_loan_amount=0, min_loan_amount=0):
+    return {"program_name": name, "rules": list(rules), "max_loan_amount": max_loan_amount, "min_loan_amount": min_loan_amount}
+
+
+def _raw(pages, tables=()):
+    """A parsed document: one page per text, tables as (page, rows)."""
+    return {
+        "pages": [{"page": n, "text": text} for n, text in enumerate(pages, start=1)],
+        "tables": [{"page": page, "table_index": 0, "rows": rows} for page, rows in tables],
+    }
+
+
+def _parts(raw, max_chars, responses):
+    chunks = build_chunks(raw, max_chars)
+    assert len(chunks) == len(responses)
+    return list(zip(chunks, responses))
+
+
+def test_chunks_cover_every_page_in_order_with_their_tables():
+    raw = _raw(["a" * 900, "b" * 900, "c" * 900, "d" * 900], tables=[(3, [["FICO", "700"]])])
+    chunks = build_chunks(raw, max_chars=2_000)
+
+    assert [(c.first_page, c.last_page) for c in chunks] == [(1, 2), (3, 4)]
+    assert [t["page"] for c in chunks for t in c.tables] == [3]
+    assert "[Page 3]" in chunks[1].text
+
+
+def test_overlapping_programs_merge_by_name():
+    raw = _raw(["x" * 500, "y" * 500])
+    merged = merge_policies(_parts(raw, 600, [
+        _policy([_program("A Tier", [_rule("guarantor_fico", ">=", 700)], max_loan_amount=250_000)]),
+        _policy([
+            _program(" a  tier ", [_rule("paynet_score", ">=", 70)]),
+            _program("App Only", [_rule("guarantor_fico", ">=", 650)], max_loan_amount=75_000),
+        ]),
+    ]))
+
+    assert [p.program_name for p in merged.programs] == ["A Tier", "App Only"]
+    a_tier = merged.programs[0]
+    assert {(r.field_name.value, r.value) for r in a_tier.rules} == {("guarantor_fico", 700), ("paynet_score", 70)}
+    # The part that only mentions the program reported 0 for its amounts.
+    assert a_tier.max_loan_amount == 250_000
+
+
+def test_conflicting_values_prefer_tables_then_majority_then_earliest():
+    raw = _raw(["p1 " * 200, "p2 " * 200, "p3 " * 200], tables=[(3, [["Min FICO", "720"], ["Max", "$300,000"]])])
+    fico = lambda value: _policy([_program("A Tier", [_rule("guarantor_fico", ">=", value)], max_loan_amount=0)])
+
+    # 720 appears in the third part's table: it beats two prose mentions of 680.
+    merged = merge_policies(_parts(raw, 700, [fico(680), fico(680), fico(720)]))
+    assert merged.programs[0].rules[0].value == 720
+
+    # No table backing: the value most parts agree on.
+    merged = merge_policies(_parts(raw, 700, [fico(650), fico(680), fico(680)]))
+    assert merged.programs[0].rules[0].value == 680
+
+    # A tie goes to the earliest part.
+    assert reconcile([(640, False), (660, False)]) == 640
+
+    merged = merge_policies(_parts(raw, 700, [
+        _policy(restricted_states=["NV", "CA"], min_time_in_business_months_global=24),
+        _policy(restricted_states=["ca", "ND"], excluded_industries=["Cannabis"]),
+        _policy(restricted_states=["ND"], min_time_in_business_months_global=24),
+    ]))
+    assert merged.restricted_states == ["NV", "CA", "ND"]
+    assert merged.excluded_industries == ["Cannabis"]
+    assert merged.min_time_in_business_months_global == 24
+
+
+def test_a_failing_chunk_fails_the_extraction():
+    raw = _raw(["a" * 900, "b" * 900, "c" * 900])
+    chunks = build_chunks(raw, max_chars=1_000)
+
+    def extract(chunk):
+        if chunk.index == 1:
+            raise RuntimeError("model error")
+        return _policy()
+
+    with pytest.raises(RuntimeError, match="model error"):
+        extract_chunks(chunks, extract)
+
+
+def _guideline_pdf(path, pages=10):
+    doc = pymupdf.open()
+    for n in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_textbox(pymupdf.Rect(40, 40, 570, 800), f"Page {n} guideline terms. " * 110, fontsize=6)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_extract_policy_merges_fake_chunk_responses(tmp_path):
+    path = _guideline_pdf(tmp_path / "guidelines.pdf")
+    parts = len(build_chunks(extractor.parse_pdf(path)))
+    assert parts == 4
+
+    a_tier = lambda fico, amount=0: _program("A Tier", [_rule("guarantor_fico", ">=", fico)], max_loan_amount=amount)
+    client = FakeChunkClient({
+        1: _policy([a_tier(700, 500_000)], restricted_states=["NV"]).model_dump(),
+        2: _policy([a_tier(680)]).model_dump(),
+        3: _policy([a_tier(680)], restricted_states=["CA"]).model_dump(),
+        4: _policy([_program("B Tier", [_rule("paynet_score", ">=", 60)], max_loan_amount=100_000)]).model_dump(),
+    })
+
+    policy = extractor.extract_policy_with_pyplumber(path, llm=client)
+
+    assert sorted(client.parts_seen) == [(1, 4), (2, 4), (3, 4), (4, 4)]
+    assert [p.program_name for p in policy.programs] == ["A Tier", "B Tier"]
+    assert policy.programs[0].rules[0].value == 680
+    assert policy.programs[0].max_loan_amount == 500_000
+    assert policy.restricted_states == ["NV", "CA"]
+
+
+def test_extract_policy_fails_when_one_chunk_fails(tmp_path):
+    path = _guideline_pdf(tmp_path / "guidelines.pdf")
+    parts = len(build_chunks(extractor.parse_pdf(path)))
+    client = FakeChunkClient({part: _policy().model_dump() for part in range(1, parts + 1)}, fail_parts=[2])
+
+    with pytest.raises(RuntimeError, match="part 2"):
+        extractor.extract_policy_with_pyplumber(path, llm=client)
@@ -0,0 +1,259 @@
+"""Background extraction jobs end to end, offline: the routes on fakeredis,
+the job run the way the extraction worker runs it and the stub LLM."""
+import json
+import os
+import threading
+import time
+import uuid
+
+import fakeredis
+import pymupdf
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import extraction_jobs
+from app.services.match_queue import EXTRACTION_QUEUE, MATCH_QUEUE
+
+
+@pytest.fixture
+def client(redis_server, llm):
+    app.state.redis = fakeredis.aioredis.FakeRedis(server=redis_server, decode_responses=True)
+    # No context manager: the lifespan would connect to a real Redis.
+    return TestClient(app)
+
+
+@pytest.fixture
+def sync_redis():
+    from app.redis_client import get_sync_redis
+    return get_sync_redis()
+
+
+def _pdf_bytes() -> bytes:
+    # Unique text, so the extraction cache never answers for an earlier test.
+    doc = pymupdf.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), f"Acme Capital credit guidelines {uuid.uuid4()}. Minimum FICO 680.")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _submit(client, lender_id="L1", content=None):
+    response = client.post(
+        f"/lenders/{lender_id}/extract-clean-pdf",
+        files={"file": ("guidelines.pdf", content if content is not None else _pdf_bytes(), "application/pdf")},
+    )
+    assert response.status_code == 202
+    return response.json()
+
+
+def _stages(sync_redis, job_id):
+    """Runs the job and records every status it publishes."""
+    pubsub = sync_redis.pubsub()
+    pubsub.subscribe(extraction_jobs.events_channel(job_id))
+    pubsub.get_message(timeout=1)
+    extraction_jobs.run_extraction_job(job_id)
+    published = []
+    while (message := pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)) is not None:
+        published.append(json.loads(message["data"]))
+    pubsub.close()
+    return published
+
+
+def test_submit_queues_the_job_on_the_extraction_queue(client, sync_redis):
+    job = _submit(client)
+
+    assert job["status"] == job["stage"] == extraction_jobs.QUEUED
+    assert job["status_url"] == f"/lenders/L1/extraction-jobs/{job['job_id']}"
+    assert sync_redis.lrange(EXTRACTION_QUEUE.ready, 0, -1) == [f"extraction:{job['job_id']}"]
+    assert sync_redis.llen(MATCH_QUEUE.ready) == 0
+    assert client.get(job["status_url"]).json()["status"] == extraction_jobs.QUEUED
+    # Another lender cannot see the job.
+    assert client.get(f"/lenders/L2/extraction-jobs/{job['job_id']}").status_code == 404
+
+
+def test_job_moves_through_every_stage_to_done(client, sync_redis):
+    job = _submit(client)
+    path = sync_redis.hget(extraction_jobs.job_key(job["job_id"]), "path")
+
+    published = _stages(sync_redis, job["job_id"])
+
+    assert [(s["status"], s["stage"]) for s in published] == [
+        ("running", "parsing"),
+        ("running", "extracting"),
+        ("running", "cleaning"),
+        ("done", "done"),
+    ]
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "done"
+    assert status["result"]["lender_name"] == "Stub Lender"
+    assert not os.path.exists(path)
+
+    # A finished job is not run again.
+    assert _stages(sync_redis, job["job_id"]) == []
+
+
+def test_unreadable_pdf_fails_the_job(client, sync_redis):
+    job = _submit(client, content=b"not a pdf")
+
+    published = _stages(sync_redis, job["job_id"])
+
+    assert published[-1]["status"] == published[-1]["stage"] == "failed"
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "failed"
+    assert status["error"]
+    assert status["result"] is None
+
+
+def test_model_error_fails_the_job(client, sync_redis, llm):
+    def extract(schema, content):
+        raise RuntimeError("model unavailable")
+
+    llm.extract = extract
+    job = _submit(client)
+
+    published = _stages(sync_redis, job["job_id"])
+
+    assert [s["stage"] for s in published] == ["parsing", "extracting", "failed"]
+    assert client.get(job["status_url"]).json()["error"] == "model unavailable"
+
+
+def test_events_stream_every_stage_until_done(client):
+    job = _submit(client)
+
+    def work():
+        # Give the stream time to subscribe and send the current status.
+        time.sleep(0.5)
+        extraction_jobs.run_extraction_job(job["job_id"])
+
+    worker = threading.Thread(target=work)
+    worker.start()
+    events = []
+    with client.stream("GET", job["events_url"]) as stream:
+        assert stream.headers["content-type"].startswith("text/event-stream")
+        for line in stream.iter_lines():
+            if line.startswith("data:"):
+                events.append(json.loads(line[len("data:"):]))
+    worker.join()
+
+    assert [(e["status"], e["stage"]) for e in events] == [
+        ("queued", "queued"),
+        ("running", "parsing"),
+        ("running", "extracting"),
+        ("running", "cleaning"),
+        ("done", "done"),
+    ]
+    assert events[-1]["result"]["lender_name"] == "Stub Lender"
+
+
+def test_events_of_a_finished_job_end_after_one_event(client):
+    job = _submit(client)
+    extraction_jobs.run_extraction_job(job["job_id"])
+
+    with client.stream("GET", job["events_url"]) as stream:
+        events = [json.loads(line[len("data:"):]) for line in stream.iter_lines() if line.startswith("data:")]
+
+    assert [e["status"] for e in events] == ["done"]
+    assert client.get(f"/lenders/L2/extraction-jobs/{job['job_id']}/events").status_code == 404
+
+
+def test_batch_job_reports_every_file(client, sync_redis):
+    response = client.post(
+        "/lenders/L1/extract-clean-pdfs",
+        files=[
+            ("files", ("rates.pdf", _pdf_bytes(), "application/pdf")),
+            ("files", ("broken.pdf", b"not a pdf", "application/pdf")),
+        ],
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert [f["filename"] for f in job["files"]] == ["rates.pdf", "broken.pdf"]
+
+    extraction_jobs.run_extraction_job(job["job_id"])
+
+    # One readable file is enough; the other's error stays on its entry.
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "done"
+    assert status["result"]["lender_name"] == "Stub Lender"
+    assert [f["status"] for f in status["files"]] == ["done", "failed"]
+    assert status["files"][0]["seconds"] is not None
+    assert status["files"][1]["error"]
+
+
+def _document(text: str) -> bytes:
+    doc = pymupdf.open()
+    doc.new_page().insert_text((72, 72), f"{text} {uuid.uuid4()}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_batch_of_several_pdfs_merges_the_readable_ones(client, sync_redis, llm):
+    """Each document answers with its own program; one fails at the model, one
+    cannot be read."""
+    def extract(schema, content):
+        text = " ".join(str(part) for part in content)
+        if "Addendum" in text:
+            raise RuntimeError("model unavailable")
+        name = next(name for name in ("Rate sheet", "Guidelines", "Vendor program") if name in text)
+        return schema.model_validate({
+            "lender_name": "Acme Capital",
+            "programs": [{
+                "program_name": name,
+                "max_loan_amount": 250_000,
+                "rules": [{"field_name": "guarantor_fico", "operator": ">=", "value": 680, "failure_reason": "FICO"}],
+            }],
+        })
+
+    llm.extract = extract
+    uploads = [
+        ("rates.pdf", _document("Rate sheet")),
+        ("guidelines.pdf", _document("Guidelines")),
+        ("addendum.pdf", _document("Addendum")),
+        ("vendor.pdf", _document("Vendor program")),
+        ("scan.pdf", b"not a pdf"),
+    ]
+    response = client.post(
+        "/lenders/L1/extract-clean-pdfs",
+        files=[("files", (name, content, "application/pdf")) for name, content in uploads],
+    )
+    assert response.status_code == 202
+    job = response.json()
+    paths = [entry["path"] for entry in json.loads(sync_redis.hget(extraction_jobs.job_key(job["job_id"]), "files"))]
+
+    extraction_jobs.run_extraction_job(job["job_id"])
+
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "done"
+    assert sorted(p["program_name"] for p in status["result"]["programs"]) == ["Guidelines", "Rate sheet", "Vendor program"]
+    files = status["files"]
+    assert [(f["filename"], f["status"]) for f in files] == [
+        ("rates.pdf", "done"),
+        ("guidelines.pdf", "done"),
+        ("addendum.pdf", "failed"),
+        ("vendor.pdf", "done"),
+        ("scan.pdf", "failed"),
+    ]
+    assert files[2]["error"] == "model unavailable"
+    assert files[4]["error"]
+    for entry in files:
+        assert entry["seconds"] is not None
+        assert (entry["error"] is None) == (entry["status"] == "done")
+    assert "extracting" in files[0]["stages"]
+    assert not any(os.path.exists(path) for path in paths)
+
+
+def test_batch_fails_when_no_file_can_be_extracted(client):
+    response = client.post(
+        "/lenders/L1/extract-clean-pdfs",
+        files=[("files", (f"scan-{n}.pdf", b"not a pdf", "application/pdf")) for n in range(3)],
+    )
+    job = response.json()
+
+    extraction_jobs.run_extraction_job(job["job_id"])
+
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "failed"
+    assert status["error"] == "No file could be extracted"
+    assert [f["status"] for f in status["files"]] == ["failed"] * 3
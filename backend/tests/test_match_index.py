@@ -0,0 +1,67 @@
+"""Borrower fields cached in the Redis match index follow re-applications."""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.match_index import MatchIndex, sync_borrower_fields
+
+LENDER_A = uuid.UUID(int=1)
+LENDER_B = uuid.UUID(int=2)
+
+
+@pytest.fixture
+def redis(redis_server):
+    from app.redis_client import get_sync_redis
+    return get_sync_redis()
+
+
+def _row(borrower_id, score, name="Old Name", amount=50_000.0):
+    return {"id": borrower_id * 10, "borrower_id": borrower_id, "score": score, "tier": "TIER_1",
+            "program": "A Tier", "name": name, "amount": amount}
+
+
+def _warm(index, lender_id, rows):
+    assert index.rebuild(lender_id, rows, index.generation(lender_id))
+
+
+def test_re_applied_borrower_is_patched_in_every_warm_index(redis):
+    index = MatchIndex(redis)
+    _warm(index, LENDER_A, [_row(7, 90.0), _row(8, 80.0)])
+    _warm(index, LENDER_B, [_row(7, 70.0)])
+    borrower = SimpleNamespace(id=7, business_name="New Name", loan_amount=125_000.0)
+    matches = [SimpleNamespace(lender_id=LENDER_A, borrower_id=7), SimpleNamespace(lender_id=LENDER_B, borrower_id=7)]
+
+    sync_borrower_fields(redis, [borrower], matches, upserted=[])
+
+    for lender_id in (LENDER_A, LENDER_B):
+        entry = next(row for row in index.read(lender_id) if row["borrower_id"] == 7)
+        assert (entry["name"], entry["amount"]) == ("New Name", 125_000.0)
+    other = next(row for row in index.read(LENDER_A) if row["borrower_id"] == 8)
+    assert other["name"] == "Old Name"
+
+
+def test_patch_skips_rewritten_and_expired_entries(redis):
+    index = MatchIndex(redis)
+    _warm(index, LENDER_A, [_row(7, 90.0)])
+    borrower = SimpleNamespace(id=7, business_name="New Name", loan_amount=125_000.0)
+
+    # sync_match_index already wrote this pair from Postgres.
+    sync_borrower_fields(redis, [borrower], [SimpleNamespace(lender_id=LENDER_A, borrower_id=7)], [(LENDER_A, 7)])
+    assert index.read(LENDER_A)[0]["name"] == "Old Name"
+
+    # No partial entry is created for a pair the index does not hold.
+    index.patch_borrower([LENDER_B], 7, "New Name", 125_000.0)
+    assert not redis.exists(f"lender-match:{LENDER_B}:7")
+
+
+def test_patch_makes_a_concurrent_rebuild_give_up(redis):
+    index = MatchIndex(redis)
+    _warm(index, LENDER_A, [_row(7, 90.0)])
+    generation = index.generation(LENDER_A)
+
+    index.patch_borrower([LENDER_A], 7, "New Name", 125_000.0)
+
+    # Rows read from Postgres before the upsert committed must not win.
+    assert not index.rebuild(LENDER_A, [_row(7, 90.0)], generation)
+    assert index.read(LENDER_A)[0]["name"] == "New Name"
@@ -0,0 +1,131 @@
+"""The match queue's Lua scripts and worker on fakeredis: coalescing, parking
+a job that is still running, retries with backoff, dead-lettering and
+requeueing the jobs of a worker whose heartbeat expired."""
+import json
+import time
+
+import pytest
+
+from app.services import match_queue
+from app.services.match_queue import BORROWER, LENDER, MATCH_QUEUE, MatchWorker, enqueue_match_job
+
+
+@pytest.fixture
+def sync_redis(redis_server):
+    from app.redis_client import get_sync_redis
+    return get_sync_redis()
+
+
+def _stats(sync_redis):
+    return {name: int(value) for name, value in sync_redis.hgetall(MATCH_QUEUE.stats).items()}
+
+
+def _worker(sync_redis, handler, concurrency=1):
+    worker = MatchWorker(sync_redis, {BORROWER: handler, LENDER: handler}, concurrency=concurrency)
+    worker._heartbeat()
+    return worker
+
+
+def test_waiting_jobs_coalesce(sync_redis):
+    assert enqueue_match_job(sync_redis, BORROWER, 1)
+    assert not enqueue_match_job(sync_redis, BORROWER, 1)
+    assert enqueue_match_job(sync_redis, BORROWER, 2)
+
+    assert sync_redis.lrange(MATCH_QUEUE.ready, 0, -1) == ["borrower:2", "borrower:1"]
+    assert _stats(sync_redis) == {"enqueued": 2, "coalesced": 1}
+
+    # Once started the job no longer absorbs resubmissions.
+    seen = []
+    worker = _worker(sync_redis, lambda key: seen.append((key, enqueue_match_job(sync_redis, BORROWER, key))))
+    assert worker.work_once(worker.worker_ids[0]) == "borrower:1"
+    assert seen == [("1", True)]
+    assert sync_redis.lrange(MATCH_QUEUE.ready, 0, -1) == ["borrower:1", "borrower:2"]
+
+
+def test_job_running_elsewhere_is_parked_then_run(sync_redis, monkeypatch):
+    monkeypatch.setattr(match_queue, "BUSY_RETRY_SECONDS", 0)
+    runs = []
+
+    def handler(key):
+        runs.append(key)
+        if len(runs) > 1:
+            return
+        # Resubmitted while running and claimed by a second thread.
+        assert enqueue_match_job(sync_redis, BORROWER, key)
+        assert worker.work_once(worker.worker_ids[1]) is None
+        assert sync_redis.hget(MATCH_QUEUE.running, "borrower:7") == worker.worker_ids[0]
+        assert sync_redis.zscore(MATCH_QUEUE.delayed, "borrower:7") is not None
+        assert sync_redis.sismember(MATCH_QUEUE.pending, "borrower:7")
+        assert sync_redis.llen(MATCH_QUEUE.processing(worker.worker_ids[1])) == 0
+
+    worker = _worker(sync_redis, handler, concurrency=2)
+    enqueue_match_job(sync_redis, BORROWER, 7)
+    assert worker.work_once(worker.worker_ids[0]) == "borrower:7"
+    assert runs == ["7"]
+
+    assert worker.work_once(worker.worker_ids[1]) == "borrower:7"
+    assert runs == ["7", "7"]
+    assert sync_redis.hlen(MATCH_QUEUE.running) == 0
+    assert sync_redis.scard(MATCH_QUEUE.pending) == 0
+    assert sync_redis.zcard(MATCH_QUEUE.delayed) == 0
+
+
+def test_failures_back_off_then_dead_letter(sync_redis, monkeypatch):
+    monkeypatch.setattr(match_queue, "MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(match_queue, "RETRY_BACKOFF_SECONDS", 10)
+
+    def handler(key):
+        raise RuntimeError(f"no borrower {key}")
+
+    worker = _worker(sync_redis, handler)
+    worker_id = worker.worker_ids[0]
+    enqueue_match_job(sync_redis, BORROWER, 3)
+
+    delays = []
+    for attempt in (1, 2):
+        before = time.time()
+        assert worker.work_once(worker_id) == "borrower:3"
+        delays.append(sync_redis.zscore(MATCH_QUEUE.delayed, "borrower:3") - before)
+        assert sync_redis.hget(MATCH_QUEUE.attempts, "borrower:3") == str(attempt)
+        assert sync_redis.sismember(MATCH_QUEUE.pending, "borrower:3")
+        # Not due yet.
+        assert sync_redis.llen(MATCH_QUEUE.ready) == 0
+        sync_redis.zadd(MATCH_QUEUE.delayed, {"borrower:3": 0})
+
+    assert 10 <= delays[0] < 11 and 20 <= delays[1] < 21
+
+    assert worker.work_once(worker_id) == "borrower:3"
+    dead = [json.loads(entry) for entry in sync_redis.lrange(MATCH_QUEUE.dead, 0, -1)]
+    assert [(entry["job"], entry["attempts"], entry["error"]) for entry in dead] == [("borrower:3", 3, "no borrower 3")]
+    assert not sync_redis.exists(MATCH_QUEUE.attempts, MATCH_QUEUE.delayed, MATCH_QUEUE.pending, MATCH_QUEUE.running)
+    assert sync_redis.llen(MATCH_QUEUE.processing(worker_id)) == 0
+    stats = _stats(sync_redis)
+    assert (stats["failed"], stats["retried"], stats["dead_lettered"]) == (3, 2, 1)
+
+
+def test_jobs_of_a_dead_worker_are_requeued(sync_redis):
+    # A worker that died holding two jobs; one of them has since been resubmitted.
+    ghost = "gone-host:1:abcdef:0"
+    sync_redis.sadd(MATCH_QUEUE.workers, ghost)
+    sync_redis.rpush(MATCH_QUEUE.processing(ghost), "borrower:1", "lender:L1")
+    sync_redis.hset(MATCH_QUEUE.running, mapping={"borrower:1": ghost, "lender:L1": ghost})
+    enqueue_match_job(sync_redis, LENDER, "L1")
+    # Alive, claimed jobs untouched.
+    alive = "live-host:1:abcdef:0"
+    sync_redis.sadd(MATCH_QUEUE.workers, alive)
+    sync_redis.set(MATCH_QUEUE.heartbeat(alive), "live-host", ex=30)
+    sync_redis.rpush(MATCH_QUEUE.processing(alive), "borrower:9")
+    sync_redis.hset(MATCH_QUEUE.running, "borrower:9", alive)
+
+    worker = _worker(sync_redis, lambda key: None)
+    worker.recover_dead_workers()
+
+    assert sorted(sync_redis.lrange(MATCH_QUEUE.ready, 0, -1)) == ["borrower:1", "lender:L1"]
+    assert sync_redis.smembers(MATCH_QUEUE.pending) == {"borrower:1", "lender:L1"}
+    assert sync_redis.hgetall(MATCH_QUEUE.running) == {"borrower:9": alive}
+    assert not sync_redis.exists(MATCH_QUEUE.processing(ghost))
+    assert not sync_redis.sismember(MATCH_QUEUE.workers, ghost)
+    assert sync_redis.lrange(MATCH_QUEUE.processing(alive), 0, -1) == ["borrower:9"]
+
+    ran = [worker.work_once(worker.worker_ids[0]) for _ in range(2)]
+    assert sorted(ran) == ["borrower:1", "lender:L1"]
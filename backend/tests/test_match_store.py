@@ -0,0 +1,134 @@
+"""MatchStore writes match sets as a diff: unchanged rows are left alone,
+changed ones are upserted on (lender_id, borrower_id) and vanished pairs
+are deleted."""
+import datetime
+import uuid
+
+from app.models.model import LoanMatch, MatchTier
+from app.services import match_store
+from app.services.match_store import MatchStore
+
+# Hex letters keep SQLite from storing the ids as numbers.
+LENDER_A = uuid.UUID("aaaaaaaa-0000-4000-8000-000000000001")
+LENDER_B = uuid.UUID("bbbbbbbb-0000-4000-8000-000000000002")
+LONG_AGO = datetime.datetime(2020, 1, 1)
+
+
+def _match(lender_id, borrower_id, score=80.0, tier=MatchTier.STRONG, program="A Tier"):
+    return LoanMatch(
+        lender_id=lender_id, borrower_id=borrower_id, match_score=score,
+        match_tier=tier, matched_program_name=program, is_active=True,
+    )
+
+
+def _rows(db):
+    """(lender_id, borrower_id) -> (id, score, tier, program, created_at)"""
+    db.expire_all()
+    return {
+        (m.lender_id, m.borrower_id): (m.id, m.match_score, m.match_tier, m.matched_program_name, m.created_at)
+        for m in db.query(LoanMatch)
+    }
+
+
+def _seed(db, matches):
+    store = MatchStore(db)
+    store.replace_for_lender(matches[0].lender_id, matches)
+    db.commit()
+    # Tell kept rows apart from rewritten ones.
+    db.query(LoanMatch).update({"created_at": LONG_AGO})
+    db.commit()
+    return _rows(db)
+
+
+def test_lender_diff_keeps_updates_and_deletes(db):
+    before = _seed(db, [_match(LENDER_A, 1), _match(LENDER_A, 2), _match(LENDER_A, 3)])
+
+    store = MatchStore(db)
+    counts = store.replace_for_lender(LENDER_A, [
+        _match(LENDER_A, 1),
+        _match(LENDER_A, 2, score=91.0, tier=MatchTier.PERFECT),
+        _match(LENDER_A, 4),
+    ])
+    db.commit()
+    after = _rows(db)
+
+    assert counts == (2, 1)
+    assert after[(LENDER_A, 1)] == before[(LENDER_A, 1)]
+    # Updated in place: same row, new values.
+    assert after[(LENDER_A, 2)][0] == before[(LENDER_A, 2)][0]
+    assert after[(LENDER_A, 2)][1:3] == (91.0, MatchTier.PERFECT)
+    assert (LENDER_A, 3) not in after
+    assert after[(LENDER_A, 4)][4] != LONG_AGO
+    assert sorted(store.upserted_pairs) == [(LENDER_A, 2), (LENDER_A, 4)]
+    assert store.deleted_pairs == [(LENDER_A, 3)]
+
+
+def test_unchanged_set_writes_nothing(db):
+    matches = [_match(LENDER_A, 1), _match(LENDER_A, 2, program=None)]
+    before = _seed(db, matches)
+
+    store = MatchStore(db)
+    assert store.replace_for_lender(LENDER_A, [_match(LENDER_A, 1), _match(LENDER_A, 2, program=None)]) == (0, 0)
+    db.commit()
+    assert _rows(db) == before
+    assert store.upserted_pairs == store.deleted_pairs == []
+
+
+def test_borrower_diff_only_touches_that_borrower(db):
+    _seed(db, [_match(LENDER_A, 1), _match(LENDER_A, 2)])
+    MatchStore(db).replace_for_lender(LENDER_B, [_match(LENDER_B, 1)])
+    db.commit()
+    before = _rows(db)
+
+    store = MatchStore(db)
+    assert store.replace_for_borrower(1, [_match(LENDER_B, 1, score=60.0, tier=MatchTier.MODERATE)]) == (1, 1)
+    db.commit()
+    after = _rows(db)
+
+    assert set(after) == {(LENDER_A, 2), (LENDER_B, 1)}
+    assert after[(LENDER_A, 2)] == before[(LENDER_A, 2)]
+    assert after[(LENDER_B, 1)][1] == 60.0
+    assert store.deleted_pairs == [(LENDER_A, 1)]
+
+
+def test_repeated_pair_keeps_the_best_score(db):
+    store = MatchStore(db)
+    store.replace_for_lender(LENDER_A, [_match(LENDER_A, 1, score=70.0, program="B"), _match(LENDER_A, 1, score=85.0)])
+    db.commit()
+    assert _rows(db)[(LENDER_A, 1)][1:4] == (85.0, MatchTier.STRONG, "A Tier")
+
+
+def test_batched_upserts_and_deletes_for_many_borrowers(db, monkeypatch):
+    monkeypatch.setattr(match_store, "UPSERT_BATCH_SIZE", 3)
+    monkeypatch.setattr(match_store, "DELETE_BATCH_SIZE", 2)
+    borrower_ids = list(range(1, 11))
+
+    store = MatchStore(db)
+    first = [_match(lender, b, score=50.0 + b) for b in borrower_ids for lender in (LENDER_A, LENDER_B)]
+    assert store.replace_for_borrowers(borrower_ids, first) == (20, 0)
+    db.commit()
+    db.query(LoanMatch).update({"created_at": LONG_AGO})
+    db.commit()
+    before = _rows(db)
+    assert len(before) == 20
+
+    # Odd borrowers rescored, lender B dropped for borrowers above 5.
+    second = [
+        _match(lender, b, score=50.0 + b + (b % 2))
+        for b in borrower_ids
+        for lender in (LENDER_A, LENDER_B)
+        if lender == LENDER_A or b <= 5
+    ]
+    store = MatchStore(db)
+    assert store.replace_for_borrowers(borrower_ids, second) == (8, 5)
+    db.commit()
+    after = _rows(db)
+
+    assert set(after) == {(m.lender_id, m.borrower_id) for m in second}
+    for match in second:
+        key = (match.lender_id, match.borrower_id)
+        assert after[key][1] == match.match_score
+        kept = match.borrower_id % 2 == 0
+        assert (after[key] == before[key]) is kept
+        assert after[key][0] == before[key][0]
+    assert sorted(store.deleted_pairs) == [(LENDER_B, b) for b in range(6, 11)]
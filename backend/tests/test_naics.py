@@ -0,0 +1,51 @@
+"""NaicsTrie must answer exactly like the str.startswith scan it replaced."""
+import random
+
+import pytest
+
+from app.matching_engine.naics import NaicsTrie
+
+SEEDS = [4, 17, 31]
+
+
+def _code(r, length):
+    return "".join(r.choice("0123456789") for _ in range(length))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_trie_agrees_with_startswith_scan(seed):
+    r = random.Random(seed)
+    # (prefix, owner); ints as stored in policies, repeats and nested prefixes.
+    entries = []
+    for _ in range(300):
+        prefix = _code(r, r.randint(2, 6))
+        entries.append((int(prefix) if r.random() < 0.2 and prefix[0] != "0" else prefix, r.randrange(40)))
+    entries += [(prefix[:2], owner + 1) for prefix, owner in entries[:20] if isinstance(prefix, str)]
+
+    trie = NaicsTrie()
+    for prefix, owner in entries:
+        trie.add(prefix, owner)
+
+    codes = [_code(r, r.randint(0, 6)) for _ in range(3_000)] + [str(prefix) for prefix, _ in entries]
+    for code in codes:
+        owners = {owner for prefix, owner in entries if code.startswith(str(prefix))}
+        assert trie.owners_of(code) == owners, code
+        assert trie.matches(code) == bool(owners), code
+
+    for owner in range(40):
+        prefixes = [prefix for prefix, who in entries if who == owner]
+        single = NaicsTrie(prefixes)
+        for code in codes[:500]:
+            assert single.matches(code) == any(code.startswith(str(prefix)) for prefix in prefixes), (owner, code)
+
+    assert len(trie) == len({str(prefix) for prefix, _ in entries})
+
+
+def test_empty_trie_and_empty_prefix():
+    assert not NaicsTrie()
+    assert not NaicsTrie().matches("484121")
+    assert NaicsTrie().owners_of("484121") == set()
+
+    everything = NaicsTrie([""], owner="all")
+    assert everything.matches("") and everything.matches("7225")
+    assert everything.owners_of("7225") == {"all"}
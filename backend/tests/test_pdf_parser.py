@@ -0,0 +1,84 @@
+"""The PyMuPDF backend, with its pdfplumber fallback, must return the tables
+pdfplumber returns."""
+import pymupdf
+import pytest
+
+from app.services import pdf_parser
+
+ROWS = [
+    ["Program", "Min FICO", "Max Loan"],
+    ["A Tier", "720", "500000"],
+    ["B Tier", "680", "250000"],
+    ["C Tier", "640", "100000"],
+]
+LEFT, TOP, CELL_WIDTH, CELL_HEIGHT = 72, 100, 120, 20
+
+
+def _cells(page):
+    for i, row in enumerate(ROWS):
+        for j, cell in enumerate(row):
+            page.insert_text((LEFT + j * CELL_WIDTH + 4, TOP + i * CELL_HEIGHT + 14), cell)
+
+
+def _ruled(page):
+    """Grid of line segments."""
+    _cells(page)
+    right, bottom = LEFT + 3 * CELL_WIDTH, TOP + len(ROWS) * CELL_HEIGHT
+    for i in range(len(ROWS) + 1):
+        page.draw_line((LEFT, TOP + i * CELL_HEIGHT), (right, TOP + i * CELL_HEIGHT))
+    for j in range(4):
+        page.draw_line((LEFT + j * CELL_WIDTH, TOP), (LEFT + j * CELL_WIDTH, bottom))
+
+
+def _boxed(page):
+    """One outlined rectangle per cell."""
+    for i in range(len(ROWS)):
+        for j in range(3):
+            x, y = LEFT + j * CELL_WIDTH, TOP + i * CELL_HEIGHT
+            page.draw_rect(pymupdf.Rect(x, y, x + CELL_WIDTH, y + CELL_HEIGHT), color=(0, 0, 0))
+    _cells(page)
+
+
+def _header_rule(page):
+    """Columns aligned with whitespace, one rule under the header."""
+    _cells(page)
+    page.draw_line((LEFT, TOP + CELL_HEIGHT), (LEFT + 3 * CELL_WIDTH, TOP + CELL_HEIGHT))
+
+
+def _prose(page):
+    page.insert_textbox(pymupdf.Rect(72, 72, 520, 400), "Borrowers must have been in business for two years. " * 12)
+
+
+# Page layouts, in page order.
+LAYOUTS = [_ruled, _boxed, _cells, _header_rule, _prose]
+
+
+@pytest.fixture
+def guidelines(tmp_path):
+    path = tmp_path / "guidelines.pdf"
+    doc = pymupdf.open()
+    for number, layout in enumerate(LAYOUTS, start=1):
+        page = doc.new_page()
+        page.insert_text((72, 60), f"Page {number}: {layout.__name__.strip('_')}")
+        layout(page)
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def test_backends_return_the_same_tables(guidelines):
+    fast = pdf_parser.extract_text_and_tables(guidelines, backend="pymupdf")
+    steady = pdf_parser.extract_text_and_tables(guidelines, backend="pdfplumber")
+
+    assert fast["tables"] == steady["tables"]
+    assert [table["page"] for table in fast["tables"]] == [1, 2]
+    assert all(table["rows"] == ROWS for table in fast["tables"])
+    assert [block["page"] for block in fast["pages"]] == [1, 2, 3, 4, 5]
+
+
+def test_pymupdf_finds_ruled_tables_and_flags_aligned_text(guidelines):
+    _, tables, flagged = pdf_parser.parse_pages(guidelines, backend="pymupdf")
+
+    assert [(table["page"], table["rows"]) for table in tables] == [(1, ROWS), (2, ROWS)]
+    # Columns without a grid go to pdfplumber; prose does not.
+    assert flagged == [3, 4]
@@ -0,0 +1,182 @@
+"""ActivePolicyCache: local invalidation from the CRUD writes, per-lender
+reloads from pub/sub messages and a full reload after the subscription
+drops."""
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.models.model import LenderPolicy
+from app.schemas.lender import LenderPolicyCreate
+from app.services import crud
+from app.services.crud import LenderCRUD
+from app.services.policy_cache import POLICY_CHANNEL, ActivePolicyCache, listen_for_policy_changes
+
+
+def _policy_data(name, min_fico=680):
+    return LenderPolicyCreate.model_validate({
+        "lender_name": name,
+        "programs": [{
+            "program_name": "A Tier",
+            "max_loan_amount": 500_000,
+            "rules": [{"field_name": "guarantor_fico", "operator": ">=", "value": min_fico, "failure_reason": "FICO", "strict": True}],
+        }],
+    })
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ActivePolicyCache()
+    monkeypatch.setattr(crud, "active_policy_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def lenders(db, cache):
+    """Two lenders with one active policy each, the cache loaded."""
+    lender_crud = LenderCRUD(db)
+    ids = []
+    for name in ("Acme Capital", "Birch Leasing"):
+        lender = lender_crud.register_lender(name, f"{name.split()[0].lower()}@example.com")
+        lender_crud.update_policy(lender.id, _policy_data(name))
+        ids.append(lender.id)
+    cache.load(db)
+    return ids
+
+
+def _by_lender(cache, db):
+    return {policy.lender_id: policy for policy in cache.get_active_policies(db)}
+
+
+def _replace_policy(db, lender_id, min_fico):
+    """A policy change made by another process: no local invalidation."""
+    db.query(LenderPolicy).filter(LenderPolicy.lender_id == lender_id).update({"is_active": False})
+    policy = crud._new_policy(lender_id, _policy_data("other worker", min_fico))
+    db.add(policy)
+    db.commit()
+    return policy.id
+
+
+def test_update_policy_reloads_only_that_lender(db, cache, lenders):
+    acme, birch = lenders
+    before = _by_lender(cache, db)
+
+    new_policy = LenderCRUD(db).update_policy(acme, _policy_data("Acme Capital", min_fico=720))
+    after = _by_lender(cache, db)
+
+    assert after[acme].id == new_policy.id
+    assert after[birch] is before[birch]
+    assert len(cache) == 2
+
+
+def test_delete_lender_drops_its_policies(db, cache, lenders):
+    acme, birch = lenders
+    index = cache.get_index(db)
+
+    assert LenderCRUD(db).delete_lender(acme)
+
+    assert set(_by_lender(cache, db)) == {birch}
+    assert cache.get_index(db) is not index
+
+
+def test_stale_cache_is_served_until_invalidated(db, cache, lenders):
+    acme, _ = lenders
+    old_id = _by_lender(cache, db)[acme].id
+    new_id = _replace_policy(db, acme, 700)
+
+    assert _by_lender(cache, db)[acme].id == old_id
+    cache.invalidate(str(acme))
+    assert _by_lender(cache, db)[acme].id == new_id
+
+
+async def _until(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_message_reloads_only_the_named_lender(db, cache, lenders):
+    acme, birch = lenders
+    before = _by_lender(cache, db)
+    new_acme = _replace_policy(db, acme, 700)
+    new_birch = _replace_policy(db, birch, 700)
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        subscribed = asyncio.Event()
+        listener = asyncio.create_task(listen_for_policy_changes(redis, cache, subscribed))
+        try:
+            await asyncio.wait_for(subscribed.wait(), 5)
+            await redis.publish(POLICY_CHANNEL, str(acme))
+            await _until(lambda: _by_lender(cache, db)[acme].id == new_acme)
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+    asyncio.run(scenario())
+    after = _by_lender(cache, db)
+    assert after[birch] is before[birch]
+    assert after[birch].id != new_birch
+
+
+class _DroppableRedis:
+    """Async fakeredis whose open subscriptions fail on drop(), like a lost
+    connection; fakeredis pub/sub does not follow FakeServer.connected."""
+
+    def __init__(self):
+        self.redis = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        self.subscriptions = []
+
+    def pubsub(self):
+        subscription = _Subscription(self.redis.pubsub())
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def drop(self):
+        for subscription in self.subscriptions:
+            subscription.dropped = True
+
+
+class _Subscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+        self.dropped = False
+
+    async def subscribe(self, *channels):
+        await self.pubsub.subscribe(*channels)
+
+    async def listen(self):
+        while not self.dropped:
+            message = await self.pubsub.get_message(timeout=0.01)
+            if message is not None:
+                yield message
+        raise ConnectionError("connection lost")
+
+    async def aclose(self):
+        await self.pubsub.aclose()
+
+
+def test_dropped_subscription_reloads_everything(db, cache, lenders):
+    acme, birch = lenders
+
+    async def scenario():
+        redis = _DroppableRedis()
+        subscribed = asyncio.Event()
+        listener = asyncio.create_task(listen_for_policy_changes(redis, cache, subscribed))
+        try:
+            await asyncio.wait_for(subscribed.wait(), 5)
+            subscribed.clear()
+            redis.drop()
+            # Published while the subscription is down: never delivered.
+            ids = {acme: _replace_policy(db, acme, 700), birch: _replace_policy(db, birch, 710)}
+            await redis.redis.publish(POLICY_CHANNEL, str(acme))
+            await asyncio.wait_for(subscribed.wait(), 5)
+            assert len(redis.subscriptions) == 2
+            return ids
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+    new_ids = asyncio.run(scenario())
+    assert {lender: policy.id for lender, policy in _by_lender(cache, db).items()} == new_ids
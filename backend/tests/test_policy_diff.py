@@ -0,0 +1,184 @@
+"""An incremental rematch (stored matches of the previous version plus the
+borrowers diff_policies lets in) must end with the same matches as a full
+rematch, whatever the edit."""
+import copy
+import random
+import uuid
+
+import pytest
+from sqlalchemy import insert
+
+from app.matching_engine.compiler import get_compiled_policy
+from app.matching_engine.engine import CreditMatchingEngine
+from app.matching_engine.policy_diff import diff_policies
+from app.matching_engine.rule_order import RuleOrderer
+from app.models.model import Borrower, LenderPolicy, LoanMatch
+from app.services.match_store import MatchStore
+from benchmarks.generator import DataGenerator
+
+SEEDS = [3, 11, 29]
+BORROWERS = 1_000
+EDITS_PER_POLICY = 6
+
+
+def _numeric_rules(program):
+    return [rule for rule in program["rules"] if rule["operator"] in (">=", "<=") and isinstance(rule["value"], (int, float))]
+
+
+def _shift(rule, factor):
+    """Moves a threshold; factor > 1 tightens it, < 1 loosens it."""
+    if rule["operator"] == "<=":
+        factor = 1 / factor
+    value = rule["value"] * factor
+    rule["value"] = int(round(value)) if isinstance(rule["value"], int) else round(value, 2)
+
+
+def _tighten(r, policy):
+    program = r.choice(policy["programs"])
+    choice = r.randrange(4)
+    if choice == 0 and _numeric_rules(program):
+        _shift(r.choice(_numeric_rules(program)), r.uniform(1.02, 1.3))
+    elif choice == 1:
+        program["min_loan_amount"] = program["min_loan_amount"] + r.randint(1_000, 50_000)
+    elif choice == 2:
+        policy["restricted_states"] = sorted(set(policy["restricted_states"]) | {r.choice(["CA", "TX", "NY", "FL"])})
+    else:
+        policy["excluded_industries"] = sorted(set(policy["excluded_industries"]) | {r.choice(["23", "3323", "811"])})
+
+
+def _loosen(r, policy):
+    program = r.choice(policy["programs"])
+    choice = r.randrange(4)
+    if choice == 0 and _numeric_rules(program):
+        _shift(r.choice(_numeric_rules(program)), r.uniform(0.7, 0.98))
+    elif choice == 1 and program["rules"]:
+        program["rules"].pop(r.randrange(len(program["rules"])))
+    elif choice == 2 and policy["restricted_states"]:
+        policy["restricted_states"] = policy["restricted_states"][1:]
+    else:
+        program["max_loan_amount"] = program["max_loan_amount"] * 2
+
+
+def _soften(r, policy):
+    """Flips a rule between strict and soft, or moves a soft threshold."""
+    program = r.choice(policy["programs"])
+    if not program["rules"]:
+        return
+    rule = r.choice(program["rules"])
+    if not rule["strict"] and rule in _numeric_rules(program) and r.random() < 0.5:
+        _shift(rule, r.uniform(0.8, 1.2))
+    else:
+        rule["strict"] = not rule["strict"]
+
+
+def _reweigh(r, policy):
+    program = r.choice(policy["programs"])
+    fico = round(r.uniform(0.2, 0.6), 2)
+    program["weights"] = {"fico": fico, "revenue": round((1 - fico) / 2, 2), "time_in_business": round((1 - fico) / 2, 2)}
+
+
+def _rename(r, policy):
+    program = r.choice(policy["programs"])
+    program["program_name"] = f"{program['program_name']} (renamed)"
+
+
+def _duplicate(r, policy):
+    program = copy.deepcopy(r.choice(policy["programs"]))
+    if _numeric_rules(program):
+        _shift(r.choice(_numeric_rules(program)), 0.9)
+    policy["programs"].append(program)
+
+
+def _add_program(r, policy):
+    program = copy.deepcopy(r.choice(policy["programs"]))
+    program["program_name"] = f"Program {r.randrange(1_000)}"
+    program["rules"] = program["rules"][:1]
+    policy["programs"].append(program)
+
+
+def _drop_program(r, policy):
+    if len(policy["programs"]) > 1:
+        policy["programs"].pop(r.randrange(len(policy["programs"])))
+
+
+EDITS = [_tighten, _loosen, _soften, _reweigh, _rename, _duplicate, _add_program, _drop_program]
+
+
+def _fields(policy: LenderPolicy):
+    return {
+        "restricted_states": list(policy.restricted_states or []),
+        "excluded_industries": list(policy.excluded_industries or []),
+        "programs": copy.deepcopy(policy.programs),
+    }
+
+
+def _edited(r, policy: LenderPolicy):
+    """A new version of the policy with one to three random edits."""
+    fields = _fields(policy)
+    applied = r.sample(EDITS, r.randint(1, 3))
+    for edit in applied:
+        edit(r, fields)
+    version = LenderPolicy(
+        id=uuid.UUID(int=r.getrandbits(128)),
+        lender_id=policy.lender_id,
+        version_name=policy.version_name,
+        is_active=True,
+        **fields,
+    )
+    return version, [edit.__name__ for edit in applied]
+
+
+@pytest.fixture
+def borrowers(db, request):
+    generator = DataGenerator(request.param)
+    db.execute(insert(Borrower), list(generator.borrower_rows(BORROWERS)))
+    db.commit()
+    return generator
+
+
+def _engine() -> CreditMatchingEngine:
+    engine = CreditMatchingEngine()
+    engine.rule_order = RuleOrderer()
+    return engine
+
+
+def _result(matches):
+    return {(m.borrower_id, round(m.match_score, 6), m.match_tier, m.matched_program_name) for m in matches}
+
+
+def _stored(db, lender_id):
+    db.expire_all()
+    return _result(db.query(LoanMatch).filter(LoanMatch.lender_id == lender_id))
+
+
+@pytest.mark.parametrize("borrowers", SEEDS, indirect=True)
+def test_incremental_rematch_equals_full_rematch(db, borrowers):
+    r = random.Random(borrowers.seed)
+    engine = _engine()
+    bounded = 0
+
+    for policy in borrowers.policies(6):
+        for _ in range(EDITS_PER_POLICY):
+            edited, applied = _edited(r, policy)
+            label = f"{policy.version_name} after {', '.join(applied)}"
+
+            MatchStore(db).replace_for_lender(policy.lender_id, engine.run_engine_for_lender(policy, db))
+            db.commit()
+
+            incremental = engine.run_engine_for_lender(edited, db, previous_policy=policy)
+            full = engine.run_engine_for_lender(edited, db)
+            assert _result(incremental) == _result(full), label
+            columnar = engine.run_engine_for_lender(edited, db, columnar=True, previous_policy=policy)
+            assert _result(columnar) == _result(full), label
+
+            MatchStore(db).replace_for_lender(policy.lender_id, incremental)
+            db.commit()
+            assert _stored(db, policy.lender_id) == _result(full), label
+
+            if diff_policies(get_compiled_policy(policy), get_compiled_policy(edited)) is not None:
+                bounded += 1
+            db.query(LoanMatch).delete()
+            db.commit()
+
+    # Most edits keep the programs paired and go through the bounded path.
+    assert bounded > EDITS_PER_POLICY * 3
@@ -0,0 +1,71 @@
+"""PolicyIndex.candidates must keep every (policy, program) pair the engine
+can match, and only the pairs that pass the global filters and loan bounds."""
+import random
+
+import pytest
+
+from app.core.constants import IndustryTier
+from app.matching_engine.engine import CreditMatchingEngine
+from app.matching_engine.policy_index import PolicyIndex
+from app.matching_engine.rule_order import RuleOrderer
+from benchmarks.generator import DataGenerator
+
+SEEDS = [2, 13, 58]
+
+
+def _engine() -> CreditMatchingEngine:
+    engine = CreditMatchingEngine()
+    engine.rule_order = RuleOrderer()
+    return engine
+
+
+def _edge_borrowers(generator, index, seed):
+    """Loan amounts on program bounds or NaN, missing industry fields."""
+    r = random.Random(seed)
+    bounds = sorted({
+        amount
+        for plan in index.plans
+        for program in plan.programs
+        for amount in (program.min_loan_amount, program.max_loan_amount)
+        if amount != float("inf")
+    })
+    borrowers = generator.borrowers(len(bounds) + 40, start_id=100_000)
+    for borrower, amount in zip(borrowers, bounds):
+        borrower.loan_amount = amount
+    for borrower in borrowers[len(bounds):]:
+        borrower.industry_naics = r.choice([None, "", "48", "4841"])
+        borrower.industry_tier = r.choice([None, *IndustryTier])
+        borrower.loan_amount = r.choice([float("nan"), 0, 2_000_000])
+    return borrowers
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_candidates_cover_every_engine_match(seed):
+    generator = DataGenerator(seed)
+    policies = generator.policies(40)
+    index = PolicyIndex(policies)
+    engine = _engine()
+    borrowers = generator.borrowers(1_500) + _edge_borrowers(generator, index, seed)
+
+    matched = 0
+    for borrower in borrowers:
+        candidates = {
+            (plan.lender_id, program.name)
+            for plan, programs in index.candidates(borrower)
+            for program in programs
+        }
+        for plan in index.plans:
+            passes_global = engine._check_global_policy(borrower, plan)
+            for program in plan.programs:
+                # NaN passes the engine's bounds check, as it fails both comparisons.
+                in_bounds = not (
+                    borrower.loan_amount > program.max_loan_amount or borrower.loan_amount < program.min_loan_amount
+                )
+                assert ((plan.lender_id, program.name) in candidates) == (passes_global and in_bounds), (
+                    borrower.id, plan.lender_id, program.name
+                )
+
+        for match in engine.run_engine_for_borrower(borrower, policies):
+            assert (match.lender_id, match.matched_program_name) in candidates
+            matched += 1
+    assert matched, "the seeded data should produce some matches"
@@ -0,0 +1,105 @@
+"""Adaptive strict-rule ordering must never change what the engine decides."""
+import pytest
+
+from app.matching_engine.compiler import get_compiled_policy
+from app.matching_engine.engine import CreditMatchingEngine
+from app.matching_engine.policy_index import PolicyIndex
+from app.matching_engine.rule_order import rule_orderer
+from benchmarks.generator import DataGenerator
+
+
+class _FixedOrder:
+    def __init__(self, reverse=False):
+        self.reverse = reverse
+
+    def order(self, rules):
+        return tuple(reversed(rules)) if self.reverse else rules
+
+
+@pytest.fixture
+def orderer():
+    # EngineStats.flush feeds the shared orderer, so the test warms that one.
+    rule_orderer.reset()
+    yield rule_orderer
+    rule_orderer.reset()
+
+
+def _data(seed):
+    generator = DataGenerator(seed)
+    return generator.borrowers(1_500), generator.policies(15)
+
+
+def _decisions(engine, borrowers, plans):
+    """(accepted, soft multiplier) for every borrower and program."""
+    return [
+        (engine._check_hard_constraints(b, program), engine._calculate_soft_penalty(b, program.soft_rules))
+        for plan in plans
+        for program in plan.programs
+        for b in borrowers
+    ]
+
+
+def _matches(engine, borrowers, policies):
+    single = [
+        (m.lender_id, m.borrower_id, m.match_score, m.match_tier, m.matched_program_name)
+        for b in borrowers
+        for m in engine.run_engine_for_borrower(b, policies)
+    ]
+    batch = [
+        (m.lender_id, m.borrower_id, m.match_score, m.match_tier, m.matched_program_name)
+        for m in engine.run_engine_for_borrowers(borrowers, PolicyIndex(policies))
+    ]
+    return sorted(single, key=repr), sorted(batch, key=repr)
+
+
+@pytest.mark.parametrize("seed", [3, 42])
+def test_learned_order_keeps_decisions_and_penalties(orderer, seed):
+    borrowers, policies = _data(seed)
+    plans = [get_compiled_policy(p) for p in policies]
+
+    declared = CreditMatchingEngine()
+    declared.rule_order = _FixedOrder()
+    expected_decisions = _decisions(declared, borrowers, plans)
+    expected_matches = _matches(declared, borrowers, policies)
+
+    # Warm the stats through the engine's own entry points, then rank.
+    adaptive = CreditMatchingEngine()
+    adaptive.run_engine_for_borrowers(borrowers, PolicyIndex(policies))
+    orderer.refresh()
+    reordered = [
+        program for plan in plans for program in plan.programs
+        if orderer.order(program.strict_rules) != program.strict_rules
+    ]
+    assert reordered, "the warmed orderer should move some rules"
+
+    assert _decisions(adaptive, borrowers, plans) == expected_decisions
+    assert _matches(adaptive, borrowers, policies) == expected_matches
+
+
+@pytest.mark.parametrize("seed", [3, 42])
+def test_reversed_order_keeps_decisions_and_penalties(orderer, seed):
+    borrowers, policies = _data(seed)
+    plans = [get_compiled_policy(p) for p in policies]
+
+    declared = CreditMatchingEngine()
+    declared.rule_order = _FixedOrder()
+    reversed_engine = CreditMatchingEngine()
+    reversed_engine.rule_order = _FixedOrder(reverse=True)
+
+    assert _decisions(reversed_engine, borrowers, plans) == _decisions(declared, borrowers, plans)
+    assert _matches(reversed_engine, borrowers, policies) == _matches(declared, borrowers, policies)
+
+
+def test_rejections_are_counted_once_per_check_in_any_order(orderer):
+    """Only the first failing rule is charged, so the total is order independent."""
+    borrowers, policies = _data(11)
+    plans = [get_compiled_policy(p) for p in policies]
+
+    totals = []
+    for order in (_FixedOrder(), _FixedOrder(reverse=True)):
+        engine = CreditMatchingEngine()
+        engine.rule_order = order
+        _decisions(engine, borrowers, plans)
+        totals.append(sum(engine.stats.rejections.values()))
+        engine.stats.reset()
+    assert totals[0] == totals[1]
@@ -63,6 +63,8 @@ const LenderDashboard = () => {
   const [isSaving, setIsSaving] = useState(false);
   const [isUploading, setIsUploading] = useState(false);
   const [matches, setMatches] = useState<any[]>([]);
+  const [matchesCursor, setMatchesCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [selectedBorrower, setSelectedBorrower] = useState<any>(null);
   const [isLoadingDetails, setIsLoadingDetails] = useState(false);
   
@@ -110,8 +112,9 @@ const LenderDashboard = () => {
         const historyData = await lenderService.getPolicyHistory(lender_id);
         setHistory(historyData || []);
 
-        const matchesData = await lenderService.getMatchedBorrowers(lender_id);
-        setMatches(matchesData || []);
+        const matchesPage = await lenderService.getMatchedBorrowers(lender_id);
+        setMatches(matchesPage.matches || []);
+        setMatchesCursor(matchesPage.nextCursor);
 
       } catch (err: any) {
         console.error("Failed to load policy", err);
@@ -122,13 +125,27 @@ const LenderDashboard = () => {
     fetchProfile();
   }, [lender_id, navigate]);
 
+  const handleLoadMoreMatches = async () => {
+    if (!lender_id || !matchesCursor) return;
+    setIsLoadingMore(true);
+    try {
+      const matchesPage = await lenderService.getMatchedBorrowers(lender_id, matchesCursor);
+      setMatches(prev => [...prev, ...(matchesPage.matches || [])]);
+      setMatchesCursor(matchesPage.nextCursor);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const handleFileUpload = async (e: React.ChangeEvent<HTMLInputElement>) => {
-    const file = e.target.files?.[0];
-    if (!file) return;
+    const files = Array.from(e.target.files || []);
+    if (files.length === 0) return;
 
     setIsUploading(true);
     try {
-        const extracted = await lenderService.uploadPolicyDoc(lender_id, file);
+        const extracted = files.length === 1
+            ? await lenderService.uploadPolicyDoc(lender_id, files[0])
+            : await lenderService.uploadPolicyDocs(lender_id, files);
         setPolicy(prev => ({
             ...prev,
             excluded_industries: [...new Set([...prev.excluded_industries, ...(extracted.excluded_industries || [])])],
@@ -247,7 +264,7 @@ const LenderDashboard = () => {
                 <p className="text-slate-400 text-sm">Define global knockouts and specific programs.</p>
               </div>
               <div className="relative">
-                  <input type="file" ref={fileInputRef} accept=".pdf" onChange={handleFileUpload} className="hidden" />
+                  <input type="file" ref={fileInputRef} accept=".pdf" multiple onChange={handleFileUpload} className="hidden" />
                   <button onClick={() => fileInputRef.current?.click()} disabled={isUploading} className="bg-white/10 hover:bg-white/20 text-white text-sm px-4 py-2 rounded-lg flex items-center gap-2 transition border border-white/10 shadow-lg">
                     {isUploading ? <span className="animate-pulse">Analyzing PDF...</span> : <><span>📄</span> Upload PDF Guidelines</>}
                   </button>
@@ -441,6 +458,15 @@ const LenderDashboard = () => {
                   </div>
                 ))
               )}
+              {matchesCursor && (
+                <button
+                  onClick={handleLoadMoreMatches}
+                  disabled={isLoadingMore}
+                  className="w-full text-sm font-bold text-blue-600 py-2 rounded-xl hover:bg-blue-50 transition disabled:text-slate-400"
+                >
+                  {isLoadingMore ? "Loading..." : "Load more matches"}
+                </button>
+              )}
             </div>
           </div>
         </div>
@@ -1,5 +1,20 @@
 import api from './api';
 
+const EXTRACTION_POLL_MS = 1500;
+const EXTRACTION_TIMEOUT_MS = 5 * 60 * 1000;
+
+// Extraction runs as a background job; poll it until the policy is ready.
+const waitForExtraction = async (job: { status_url: string }) => {
+    const deadline = Date.now() + EXTRACTION_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, EXTRACTION_POLL_MS));
+        const status = (await api.get(job.status_url)).data;
+        if (status.status === 'done') return status.result;
+        if (status.status === 'failed') throw new Error(status.error || 'Extraction failed');
+    }
+    throw new Error('Extraction timed out');
+};
+
 export const lenderService = {
   register: async (name: string, email: string) => {
     const response = await api.post('/lenders/register', { 
@@ -38,7 +53,19 @@ export const lenderService = {
         },
         });
 
-        return response.data;
+        return waitForExtraction(response.data);
+    },
+
+  // Several documents of one lender (rate sheet, guidelines, addenda), merged into one policy.
+  uploadPolicyDocs: async (lender_id: string, files: File[]) => {
+        const formData = new FormData();
+        files.forEach(file => formData.append('files', file));
+        const response = await api.post(`/lenders/${lender_id}/extract-clean-pdfs`, formData, {
+        headers: {
+            'Content-Type': 'multipart/form-data',
+        },
+        });
+        return waitForExtraction(response.data);
     },
 
   updateLenderPolicy: async (lender_id: string, policyData: any) => {
@@ -56,13 +83,15 @@ export const lenderService = {
       }
   },
 
-  getMatchedBorrowers: async (lender_id: string) => {
+  getMatchedBorrowers: async (lender_id: string, cursor?: string | null) => {
     try {
-        const response = await api.get(`/lenders/${lender_id}/matches`);
-        return response.data;
+        const response = await api.get(`/lenders/${lender_id}/matches`, {
+          params: cursor ? { cursor } : {}
+        });
+        return { matches: response.data, nextCursor: response.headers['x-next-cursor'] || null };
     } catch (error) {
         console.error("Matched borrowers fetch failed", error);
-        return [];
+        return { matches: [], nextCursor: null };
     }
   },
 